@@ -0,0 +1,133 @@
+from datetime import date, timedelta
+
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+import config
+import counters
+from cache import TTLCache
+from tables import BookTable, CommentTable, PurchaseTable, ReadingSessionTable, ReadingStatDailyTable
+
+# --- CREATOR ANALYTICS (GET /user/analytics) ---
+# One grouped query per figure over all of a creator's books (joined on
+# books.creator_id), so the cost does not grow with per-book round trips:
+#   readers, reading time, sessions, daily series   reading_stats_daily
+#   median session length                           reading_sessions, window functions
+#   purchases, revenue, purchases per day           purchases
+#   comments                                        comments
+# Results are cached per creator under counters "version:analytics:<creator>".
+# Finished sessions, purchases and comments on any of the creator's books
+# bump that version in their own transaction, so a cached page is never stale.
+
+analytics_cache = TTLCache(config.ANALYTICS_CACHE_MAX_CREATORS, config.ANALYTICS_CACHE_TTL_SECONDS)
+
+def touch_books(connection, book_ids):
+    # bump the analytics version of the creators owning these books
+    book_ids = list(set(book_ids))
+    if not book_ids:
+        return
+    creators = connection.execute(
+        select(BookTable.creator_id).where(BookTable.id.in_(book_ids)).distinct()
+    ).scalars()
+    counters.add(connection, {counters.analytics_version_key(c): 1 for c in creators if c})
+
+def _median_seconds(db: Session, creator_id: str):
+    # median finished-session length per book: rank sessions by length within
+    # each book and average the middle one or two
+    S = ReadingSessionTable
+    ranked = select(
+        S.book_id, S.duration_seconds,
+        func.row_number().over(partition_by=S.book_id, order_by=S.duration_seconds).label("n"),
+        func.count().over(partition_by=S.book_id).label("total"),
+    ).join(BookTable, BookTable.id == S.book_id)\
+        .where(BookTable.creator_id == creator_id, S.ended_at.is_not(None))\
+        .subquery()
+    middle = ranked.c.n.in_([(ranked.c.total + 1) // 2, (ranked.c.total + 2) // 2])
+    return dict(db.execute(
+        select(ranked.c.book_id, func.avg(ranked.c.duration_seconds)).where(middle).group_by(ranked.c.book_id)
+    ).all())
+
+def compute(db: Session, creator_id: str, days: int, today: date = None):
+    today = today or date.today()
+    first_day = today - timedelta(days=days - 1)
+    D, P, C = ReadingStatDailyTable, PurchaseTable, CommentTable
+    mine = BookTable.creator_id == creator_id
+
+    books = db.query(BookTable.id, BookTable.title, BookTable.status, BookTable.price)\
+        .filter(mine).order_by(BookTable.id).all()
+    reading = {
+        r.book_id: r for r in db.query(
+            D.book_id,
+            func.count(func.distinct(D.username)).label("readers"),
+            func.sum(D.total_seconds).label("seconds"),
+            func.sum(D.sessions).label("sessions"),
+        ).join(BookTable, BookTable.id == D.book_id).filter(mine).group_by(D.book_id)
+    }
+    medians = _median_seconds(db, creator_id)
+    sales = {
+        r.book_id: r for r in db.query(
+            P.book_id,
+            func.count(P.id).label("purchases"),
+            func.sum(func.coalesce(P.price, BookTable.price)).label("revenue"),
+        ).join(BookTable, BookTable.id == P.book_id).filter(mine).group_by(P.book_id)
+    }
+    comments = dict(
+        db.query(C.book_id, func.count(C.id)).join(BookTable, BookTable.id == C.book_id)
+        .filter(mine).group_by(C.book_id).all()
+    )
+
+    # daily series, only days with activity
+    series = {}
+    def point(book_id, day):
+        return series.setdefault(book_id, {}).setdefault(
+            str(day), {"day": str(day), "readers": 0, "seconds": 0, "purchases": 0})
+    for book_id, day, readers, seconds in db.query(
+        D.book_id, D.day, func.count(func.distinct(D.username)), func.sum(D.total_seconds),
+    ).join(BookTable, BookTable.id == D.book_id)\
+            .filter(mine, D.day >= first_day).group_by(D.book_id, D.day):
+        p = point(book_id, day)
+        p["readers"], p["seconds"] = readers, seconds or 0
+    bought_on = func.date(P.purchased_at)
+    for book_id, day, n in db.query(P.book_id, bought_on, func.count(P.id))\
+            .join(BookTable, BookTable.id == P.book_id)\
+            .filter(mine, P.purchased_at >= first_day).group_by(P.book_id, bought_on):
+        point(book_id, day)["purchases"] = n
+
+    rows = []
+    for b in books:
+        r, s = reading.get(b.id), sales.get(b.id)
+        rows.append({
+            "book_id": b.id, "title": b.title, "status": b.status, "price": b.price,
+            "readers": r.readers if r else 0,
+            "reading_seconds": (r.seconds or 0) if r else 0,
+            "sessions": (r.sessions or 0) if r else 0,
+            "median_session_seconds": round(float(medians.get(b.id) or 0), 1),
+            "purchases": s.purchases if s else 0,
+            "revenue": round(float(s.revenue or 0), 2) if s else 0.0,
+            "comments": comments.get(b.id, 0),
+            "daily": sorted(series.get(b.id, {}).values(), key=lambda p: p["day"]),
+        })
+    totals = {key: sum(row[key] for row in rows)
+              for key in ("reading_seconds", "sessions", "purchases", "revenue", "comments")}
+    totals["revenue"] = round(totals["revenue"], 2)
+    # a reader of several books counts once
+    totals["readers"] = db.query(func.count(func.distinct(D.username)))\
+        .join(BookTable, BookTable.id == D.book_id).filter(mine).scalar() or 0
+    return {"days": days, "since": str(first_day), "totals": totals, "books": rows}
+
+def creator_analytics(db: Session, creator_id: str, days: int):
+    key = counters.analytics_version_key(creator_id)
+    version = counters.get_many(db, [key])[key]
+    cache_key = (creator_id, days, date.today())
+    cached = analytics_cache.get(cache_key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    result = compute(db, creator_id, days)
+    analytics_cache.set(cache_key, (version, result))
+    return result
+
+# --- ORM HOOKS (sessions are touched from stats.record_sessions) ---
+@event.listens_for(PurchaseTable, "after_insert")
+@event.listens_for(CommentTable, "after_insert")
+def _activity_inserted(mapper, connection, row):
+    touch_books(connection, [row.book_id])
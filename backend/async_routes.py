@@ -0,0 +1,168 @@
+from datetime import date
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import get_async_db
+from dependencies import oauth2_scheme
+from models import BookPage, CatalogPage, CommentResponse, DashboardResponse
+from routers import comments as sync_comments
+from routers import user as sync_user
+from routers.auth import cached_principal, remember_principal, role_query
+from token_store import MemoryTokenStore, token_store
+import counters
+import entitlements
+import http_cache
+import reader
+import signed_tokens
+import stats
+
+# --- ASYNC MODE (DB_MODE=async) ---
+# Native async handlers for the hot reads: the catalog, the dashboard, book
+# pages and comment threads. Every query is awaited on an AsyncSession, so a
+# request waiting on the database suspends on the event loop instead of
+# holding a threadpool worker. The statements themselves (and the response
+# assembly) come from the sync routers, so both modes answer the same.
+# main.py mounts these routers ahead of the sync ones; all other routes,
+# including every write, stay sync.
+
+# same paths and parameters as the sync routes they shadow, which stay in the schema
+user_router = APIRouter(include_in_schema=False)
+comments_router = APIRouter(include_in_schema=False)
+
+async def _lookup(method, *args):
+    # the in-process store is a dict lookup; the sqlite and redis stores
+    # do blocking I/O, so they go to the threadpool
+    if isinstance(token_store, MemoryTokenStore):
+        return method(*args)
+    return await run_in_threadpool(method, *args)
+
+async def get_current_user_async(token: str | None = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    if not token:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="please register/login to view")
+    if signed_tokens.is_signed(token):
+        claims = await _lookup(signed_tokens.verify_access_token, token)
+        if not claims:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Session expired. Please login again.")
+        return {"username": claims["sub"], "role": claims["role"]}
+    username = await _lookup(token_store.get, token)
+    if not username:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Session expired. Please login again.")
+    principal = cached_principal(username)
+    if principal is None:
+        principal = remember_principal(username, (await db.execute(role_query(username))).scalar())
+    if not principal:
+        raise HTTPException(status_code=401, detail="User not found")
+    return principal
+
+async def _counter(db: AsyncSession, name: str) -> int:
+    rows = (await db.execute(counters.counters_query([name]))).all()
+    return counters.counter_values([name], rows)[name]
+
+async def _cached(key, build):
+    value = http_cache.response_cache.get(key)
+    if value is None:
+        value = await build()
+        http_cache.response_cache.set(key, value)
+    return value
+
+@user_router.get("/dashboard", response_model=DashboardResponse)
+async def get_user_dashboard(current_user: dict = Depends(get_current_user_async), db: AsyncSession = Depends(get_async_db)):
+    username = current_user["username"]
+    queries = sync_user.dashboard_queries(username)
+    user_name = (await db.execute(queries["name"])).scalar()
+    if user_name is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    periods, total = stats.reading_summary_queries(username, date.today())
+    return sync_user.dashboard_body(
+        user_name,
+        (await db.execute(queries["viewed"])).scalar(),
+        (await db.execute(queries["purchased"])).all(),
+        stats.summary_body((await db.execute(periods)).one(), (await db.execute(total)).scalar()),
+        (await db.execute(queries["recent"])).all(),
+    )
+
+@user_router.get("/books", response_model=CatalogPage)
+async def get_all_approved_books(
+    request: Request,
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    sort: str = Query("id", pattern="^(id|title)$"),
+    include_preview: bool = False,
+    current_user: dict = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
+):
+    version = await _counter(db, counters.CATALOG_VERSION)
+    not_modified = http_cache.conditional(request, response, http_cache.etag("catalog", version))
+    if not_modified:
+        return not_modified
+
+    async def build():
+        query, key = sync_user.catalog_query(limit, cursor, sort, include_preview)
+        return sync_user.catalog_body((await db.execute(query)).all(), limit, key)
+    return await _cached(("catalog", version, limit, cursor, sort, include_preview), build)
+
+async def _ensure_can_read(db: AsyncSession, book, current_user: dict):
+    # reader.ensure_can_read on the entitlement cache and AsyncSession
+    if not book.is_premium or current_user["role"] == "admin" or current_user["username"] == book.creator_id:
+        return
+    username = current_user["username"]
+    owned = entitlements.entitlement_cache.get(username)
+    if owned is None:
+        owned = entitlements.cache_entitlements(username, (await db.execute(entitlements.owned_query(username))).scalars())
+    if book.id in owned:
+        return
+    if (await db.execute(entitlements.purchase_query(username, book.id))).first() is None:
+        raise HTTPException(status_code=402, detail="Payment required to read this book")
+    owned.add(book.id)
+
+@user_router.get("/books/{book_id}/pages/{page_no}", response_model=BookPage)
+async def get_book_page(book_id: int, page_no: int, request: Request, response: Response, current_user: dict = Depends(get_current_user_async), db: AsyncSession = Depends(get_async_db)):
+    book = (await db.execute(sync_user.readable_book_query(book_id))).first()
+    if not book:
+        raise HTTPException(status_code=404, detail="Book not found")
+    await _ensure_can_read(db, book, current_user)
+    not_modified = sync_user.conditional_book(request, response, book, "page", page_no)
+    if not_modified:
+        return not_modified
+
+    async def build():
+        content = reader.page_text((await db.execute(reader.page_query(book_id, page_no))).first())
+        if content is None:
+            return None
+        return {
+            "book_id": book_id,
+            "page_no": page_no,
+            "page_count": (await db.execute(reader.page_count_query(book_id))).scalar() or 0,
+            "content": content,
+        }
+    page = await _cached(("page", book_id, book.revision, page_no), build)
+    if page is None:
+        raise HTTPException(status_code=404, detail="Page not found")
+    return page
+
+@comments_router.get("/{book_id}", response_model=List[CommentResponse])
+async def get_comments(
+    book_id: int,
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=200),
+    cursor: Optional[str] = None,
+    max_depth: int = Query(20, ge=0, le=50),
+    db: AsyncSession = Depends(get_async_db),
+):
+    version = await _counter(db, counters.comments_version_key(book_id))
+    not_modified = http_cache.conditional(request, response, http_cache.etag("comments", book_id, version))
+    if not_modified:
+        return not_modified
+
+    async def build():
+        rows = (await db.execute(sync_comments.comment_tree_query(book_id, limit, cursor, max_depth))).all()
+        return sync_comments.comment_tree(rows, limit)
+    roots, next_cursor = await _cached(("comments", book_id, version, limit, cursor, max_depth), build)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return roots
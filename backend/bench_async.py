@@ -0,0 +1,113 @@
+import argparse
+import asyncio
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+# Load test: the same API under DB_MODE=sync and DB_MODE=async.
+#   python bench_async.py --requests 3000 --concurrency 200
+# Each run serves a temporary copy of library.db, so the real file is untouched.
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+ENDPOINTS = [
+    "/user/books?limit=20",
+    "/user/dashboard",
+    "/user/books/5/pages/1",
+    "/comments/4",
+]
+
+def start_server(mode: str, port: int, workdir: str):
+    env = {**os.environ, "DB_MODE": mode}
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", BACKEND_DIR,
+         "--port", str(port), "--log-level", "warning",
+         # p99 runs to seconds at high concurrency; idle keep-alive connections
+         # must not be closed under the client meanwhile
+         "--timeout-keep-alive", "120"],
+        cwd=workdir, env=env,
+    )
+
+async def wait_ready(client: httpx.AsyncClient):
+    for _ in range(100):
+        try:
+            await client.get("/openapi.json")
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+async def run_load(base_url: str, total: int, concurrency: int, username: str, password: str):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        await wait_ready(client)
+        login = await client.post("/auth/login", data={"username": username, "password": password})
+        headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+        for path in ENDPOINTS:  # warm up caches and connections
+            await client.get(path, headers=headers)
+
+        latencies, errors = [], 0
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(i):
+            nonlocal errors
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    response = await client.get(ENDPOINTS[i % len(ENDPOINTS)], headers=headers)
+                except httpx.TransportError:
+                    errors += 1
+                    return
+                latencies.append(time.perf_counter() - started)
+                if response.status_code >= 400:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    pick = lambda q: latencies[min(int(q * len(latencies)), len(latencies) - 1)] * 1000
+    return {
+        "req/s": total / elapsed,
+        "p50 ms": statistics.median(latencies) * 1000,
+        "p95 ms": pick(0.95),
+        "p99 ms": pick(0.99),
+        "errors": errors,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="sync vs async DB mode load test")
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--username", default="USER001")
+    parser.add_argument("--password", default="1234")
+    args = parser.parse_args()
+
+    results = {}
+    for mode in ("sync", "async"):
+        with tempfile.TemporaryDirectory() as workdir:
+            shutil.copy(os.path.join(BACKEND_DIR, "library.db"), workdir)
+            server = start_server(mode, args.port, workdir)
+            try:
+                results[mode] = asyncio.run(run_load(
+                    f"http://127.0.0.1:{args.port}", args.requests, args.concurrency,
+                    args.username, args.password,
+                ))
+            finally:
+                server.terminate()
+                server.wait()
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}, endpoints: {', '.join(ENDPOINTS)}")
+    print(f"{'mode':<8}" + "".join(f"{k:>10}" for k in results["sync"]))
+    for mode, row in results.items():
+        print(f"{mode:<8}" + "".join(f"{v:>10.1f}" if isinstance(v, float) else f"{v:>10}" for v in row.values()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import timeit
+
+# Response size and serialization cost of the heavy read routes.
+#   python bench_responses.py --repeat 200
+# 1. bytes on the wire for identity / gzip / br (br needs the `brotli` package)
+# 2. CPU per response: FastAPI's generic path (jsonable_encoder + json.dumps,
+#    used for routes without a response model) against Pydantic's dump_json
+#    (routes with a response model), plus orjson when installed.
+# Runs in-process on a temporary copy of library.db.
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def main():
+    parser = argparse.ArgumentParser(description="response compression and serialization benchmark")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--username", default="USER001")
+    parser.add_argument("--password", default="1234")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    shutil.copy(os.path.join(BACKEND_DIR, "library.db"), workdir)
+    os.chdir(workdir)
+    sys.path.insert(0, BACKEND_DIR)
+
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.testclient import TestClient
+    from pydantic import TypeAdapter
+    from typing import List
+    from main import app
+    from models import BookDetail, CatalogPage, CommentResponse
+    import compression
+
+    try:
+        import orjson
+    except ImportError:
+        orjson = None
+
+    client = TestClient(app)
+    login = client.post("/auth/login", data={"username": args.username, "password": args.password})
+    headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+    catalog = client.get("/user/books?limit=200&include_preview=true", headers=headers).json()
+    book_id = catalog["books"][0]["id"]
+    endpoints = [
+        ("catalog", "/user/books?limit=200&include_preview=true", CatalogPage),
+        ("book", f"/user/books/{book_id}", BookDetail),
+        ("comments", f"/comments/{book_id}", List[CommentResponse]),
+    ]
+
+    encodings = ["identity", "gzip"] + (["br"] if compression.brotli else [])
+    print("bytes on the wire")
+    print(f"{'route':<10}" + "".join(f"{e:>12}" for e in encodings))
+    for name, path, _ in endpoints:
+        sizes = []
+        for encoding in encodings:
+            response = client.get(path, headers={**headers, "Accept-Encoding": encoding})
+            response.read()
+            sizes.append(response.num_bytes_downloaded)
+        print(f"{name:<10}" + "".join(f"{s:>12}" for s in sizes))
+
+    print(f"\nserialization, microseconds per response ({args.repeat} runs)")
+    columns = ["generic", "dump_json"] + (["orjson"] if orjson else [])
+    print(f"{'route':<10}" + "".join(f"{c:>12}" for c in columns))
+    for name, path, model in endpoints:
+        adapter = TypeAdapter(model)
+        data = adapter.validate_python(client.get(path, headers=headers).json())
+        payload = adapter.dump_python(data)  # what the handler returns: plain dicts
+        runs = {
+            "generic": lambda: json.dumps(jsonable_encoder(payload)).encode(),
+            "dump_json": lambda: adapter.dump_json(adapter.validate_python(payload)),
+        }
+        if orjson:
+            runs["orjson"] = lambda: orjson.dumps(payload)
+        times = [timeit.timeit(runs[c], number=args.repeat) / args.repeat * 1e6 for c in columns]
+        print(f"{name:<10}" + "".join(f"{t:>12.1f}" for t in times))
+
+    shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
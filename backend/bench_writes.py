@@ -0,0 +1,88 @@
+import argparse
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from database import create_db_engine
+from tables import BookTable, ReadingSessionTable
+
+# Write throughput of the SQLite profiles (SQLITE_PROFILE=default|production).
+#   python bench_writes.py --writers 8 --readers 4 --seconds 10
+# Writers insert reading sessions one commit at a time (like /start and /stop),
+# readers keep listing books. Runs on a temporary copy of library.db.
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def run_profile(profile: str, db_path: str, writers: int, readers: int, seconds: float):
+    engine = create_db_engine(f"sqlite:///{db_path}", profile=profile)
+    Session = sessionmaker(bind=engine)
+    counts = {"writes": 0, "reads": 0, "locked": 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def writer(n):
+        with Session() as db:
+            while time.perf_counter() < deadline:
+                try:
+                    db.add(ReadingSessionTable(username=f"bench{n}", book_id=1, started_at=datetime.utcnow()))
+                    db.commit()
+                    key = "writes"
+                except OperationalError:
+                    db.rollback()
+                    key = "locked"
+                with lock:
+                    counts[key] += 1
+
+    def reader():
+        with Session() as db:
+            while time.perf_counter() < deadline:
+                try:
+                    db.query(BookTable.id, BookTable.title).filter(BookTable.status == "approved").limit(20).all()
+                    db.rollback()
+                    key = "reads"
+                except OperationalError:
+                    db.rollback()
+                    key = "locked"
+                with lock:
+                    counts[key] += 1
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    threads += [threading.Thread(target=reader) for _ in range(readers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    engine.dispose()
+    return {
+        "writes/s": counts["writes"] / seconds,
+        "reads/s": counts["reads"] / seconds,
+        "locked": counts["locked"],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite write throughput per tuning profile")
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    results = {}
+    for profile in ("default", "production"):
+        with tempfile.TemporaryDirectory() as workdir:
+            db_path = os.path.join(workdir, "library.db")
+            shutil.copy(os.path.join(BACKEND_DIR, "library.db"), db_path)
+            results[profile] = run_profile(profile, db_path, args.writers, args.readers, args.seconds)
+
+    print(f"{args.writers} writers, {args.readers} readers, {args.seconds:g}s per profile")
+    print(f"{'profile':<12}" + "".join(f"{k:>12}" for k in results["default"]))
+    for profile, row in results.items():
+        print(f"{profile:<12}" + "".join(f"{v:>12.1f}" if isinstance(v, float) else f"{v:>12}" for v in row.values()))
+
+if __name__ == "__main__":
+    main()
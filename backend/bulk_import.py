@@ -0,0 +1,212 @@
+import csv
+import io
+import json
+import posixpath
+import zipfile
+from html.parser import HTMLParser
+from urllib.parse import unquote
+from xml.etree import ElementTree
+
+from pydantic import ValidationError
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from crud import add_books_content
+from models import BookCreate
+from tables import PREVIEW_LENGTH, BookTable
+
+# --- BULK BOOK IMPORT (POST /user/books/import, python manage.py import-books) ---
+# Records are streamed from NDJSON, CSV or EPUB, validated with BookCreate
+# and written in batches of BATCH_SIZE books per transaction. The books go
+# through the ORM (the counters hooks need them); their pages and search
+# index rows follow in one executemany INSERT per table.
+# Records are numbered from 1. When a batch commits, every record read so
+# far is settled (imported or reported as failed), so an interrupted import
+# resumes with start_at = last_record + 1. Failed rows keep their original
+# fields (see rejected_line) and can be imported again once fixed.
+
+BATCH_SIZE = 200
+FORMATS = ("ndjson", "csv", "epub")
+DEFAULTS = {"price": 0.0, "is_premium": False}
+
+def detect_format(filename: str):
+    ext = (filename or "").rsplit(".", 1)[-1].lower()
+    return {"ndjson": "ndjson", "jsonl": "ndjson", "csv": "csv", "epub": "epub"}.get(ext)
+
+# --- READERS: yield (record_no, raw dict) ---
+def read_ndjson(stream):
+    for record_no, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield record_no, json.loads(line)
+        except json.JSONDecodeError as e:
+            yield record_no, {"_error": f"invalid JSON: {e.msg}", "_line": line.rstrip("\n")}
+
+def read_csv(stream):
+    for record_no, row in enumerate(csv.DictReader(stream), start=1):
+        yield record_no, {k: v for k, v in row.items() if k and v != ""}
+
+def read_records(fmt: str, binary_stream, start_no: int = 1):
+    if fmt == "epub":
+        yield start_no, read_epub(binary_stream)
+        return
+    stream = io.TextIOWrapper(binary_stream, encoding="utf-8-sig", newline="")
+    yield from (read_ndjson if fmt == "ndjson" else read_csv)(stream)
+
+class _TextExtractor(HTMLParser):
+    BLOCKS = {"p", "div", "br", "li", "tr", "h1", "h2", "h3", "h4", "h5", "h6", "section", "blockquote"}
+
+    def __init__(self):
+        super().__init__()
+        self.parts, self._skip = [], 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in ("script", "style", "head"):
+            self._skip += 1
+        elif tag in self.BLOCKS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in ("script", "style", "head"):
+            self._skip = max(0, self._skip - 1)
+        elif tag in self.BLOCKS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self._skip:
+            self.parts.append(data)
+
+def html_to_text(markup: str) -> str:
+    parser = _TextExtractor()
+    parser.feed(markup)
+    lines = [" ".join(line.split()) for line in "".join(parser.parts).splitlines()]
+    paragraphs, current = [], []
+    for line in lines + [""]:
+        if line:
+            current.append(line)
+        elif current:
+            paragraphs.append(" ".join(current))
+            current = []
+    return "\n\n".join(paragraphs)
+
+def read_epub(source) -> dict:
+    # metadata from the OPF package, text from the spine documents in reading order
+    ns = {
+        "c": "urn:oasis:names:tc:opendocument:xmlns:container",
+        "opf": "http://www.idpf.org/2007/opf",
+        "dc": "http://purl.org/dc/elements/1.1/",
+    }
+    try:
+        with zipfile.ZipFile(source) as z:
+            container = ElementTree.fromstring(z.read("META-INF/container.xml"))
+            opf_path = container.find(".//c:rootfile", ns).get("full-path")
+            opf = ElementTree.fromstring(z.read(opf_path))
+            base = posixpath.dirname(opf_path)
+            manifest = {item.get("id"): item.get("href") for item in opf.find("opf:manifest", ns)}
+            chapters = []
+            for ref in opf.find("opf:spine", ns):
+                href = manifest.get(ref.get("idref"))
+                if href:
+                    path = posixpath.normpath(posixpath.join(base, unquote(href)))
+                    chapters.append(html_to_text(z.read(path).decode("utf-8", "replace")))
+    except (zipfile.BadZipFile, KeyError, AttributeError, TypeError, ElementTree.ParseError) as e:
+        return {"_error": f"unreadable EPUB: {e}"}
+    record = {
+        "title": opf.findtext(".//dc:title", default="", namespaces=ns).strip(),
+        "author": opf.findtext(".//dc:creator", default="", namespaces=ns).strip(),
+        "content": "\n\n".join(c for c in chapters if c),
+    }
+    subject = opf.findtext(".//dc:subject", default="", namespaces=ns).strip()
+    if subject:
+        record["theme"] = subject
+    return record
+
+# --- IMPORT ---
+def _error_text(e: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors())
+
+def _write_batch(db: Session, batch, creator_id: str, status: str, allow_creator: bool):
+    # the rows are complete when inserted (preview included), so there is
+    # no follow-up UPDATE, revision bump or search index delete
+    books = []
+    for _, raw, data in batch:
+        books.append(BookTable(
+            title=data.title, author=data.author, theme=data.theme,
+            price=data.price, is_premium=data.is_premium,
+            creator_id=(allow_creator and raw.get("creator_id")) or creator_id,
+            status=status, preview=data.content[:PREVIEW_LENGTH],
+        ))
+    db.add_all(books)
+    db.flush()
+    add_books_content(db, [(book, data.content) for book, (_, _, data) in zip(books, batch)])
+    db.commit()
+
+def import_books(db: Session, records, creator_id: str, status: str = "pending", *,
+                 defaults: dict = None, start_at: int = 1, batch_size: int = BATCH_SIZE,
+                 allow_creator: bool = False, on_failure=None, on_progress=None):
+    # allow_creator: take creator_id from the rows (admin imports)
+    defaults = {**DEFAULTS, **(defaults or {})}
+    summary = {"imported": 0, "failed": 0, "last_record": start_at - 1}
+    batch = []
+
+    def fail(record_no, raw, error):
+        summary["failed"] += 1
+        if on_failure:
+            on_failure({"record": record_no, "error": error, "row": raw})
+
+    def flush():
+        if not batch:
+            return
+        try:
+            _write_batch(db, batch, creator_id, status, allow_creator)
+            summary["imported"] += len(batch)
+        except SQLAlchemyError:
+            # find the bad rows: retry this batch one book per transaction
+            db.rollback()
+            for item in batch:
+                try:
+                    _write_batch(db, [item], creator_id, status, allow_creator)
+                    summary["imported"] += 1
+                except SQLAlchemyError as e:
+                    db.rollback()
+                    fail(item[0], item[1], f"database error: {getattr(e, 'orig', e)}")
+        batch.clear()
+        if on_progress:
+            on_progress(dict(summary))
+
+    for record_no, raw in records:
+        if record_no < start_at:
+            continue
+        if not isinstance(raw, dict):
+            fail(record_no, {"_line": json.dumps(raw)}, "record is not an object")
+        elif "_error" in raw:
+            fail(record_no, raw, raw["_error"])
+        else:
+            try:
+                batch.append((record_no, raw, BookCreate(**{**defaults, **raw})))
+            except ValidationError as e:
+                fail(record_no, raw, _error_text(e))
+        summary["last_record"] = max(summary["last_record"], record_no)
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+    return summary
+
+def rejected_line(failure: dict) -> str:
+    # the failed row as an NDJSON line that can be fed back to the importer
+    row = failure["row"]
+    if "_line" in row:
+        return row["_line"]
+    return json.dumps({k: v for k, v in row.items() if not k.startswith("_")})
+
+def finish_import(db: Session):
+    # refresh planner statistics and merge the FTS segments written by the
+    # import; whole-database work, so CLI only (import-books, optimize-db)
+    if db.get_bind().dialect.name == "sqlite":
+        db.execute(text("INSERT INTO books_fts(books_fts) VALUES ('optimize')"))
+        db.execute(text("ANALYZE"))
+    else:
+        db.execute(text("ANALYZE books"))
+    db.commit()
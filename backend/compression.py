@@ -0,0 +1,52 @@
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware, IdentityResponder
+
+import config
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+# --- RESPONSE COMPRESSION ---
+# Catalog pages, book text and comment threads are repetitive text that
+# compresses well. Starlette's GZipMiddleware does the work; when the
+# `brotli` package is installed and the client sends "br" in
+# Accept-Encoding, a brotli responder with the same size threshold and
+# streaming behaviour is used instead.
+
+def _accepts(accept_encoding: str, coding: str) -> bool:
+    for item in accept_encoding.split(","):
+        name, _, params = item.partition(";")
+        if name.strip().lower() == coding:
+            return params.replace(" ", "") not in ("q=0", "q=0.0")
+    return False
+
+class BrotliResponder(IdentityResponder):
+    content_encoding = "br"
+
+    def __init__(self, app, minimum_size: int, quality: int):
+        super().__init__(app, minimum_size)
+        self.quality = quality
+        self._compressor = None
+
+    async def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        if self._compressor is None:
+            self._compressor = brotli.Compressor(quality=self.quality)
+        data = self._compressor.process(body)
+        return data + (self._compressor.flush() if more_body else self._compressor.finish())
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = config.COMPRESSION_MINIMUM_SIZE,
+                 gzip_level: int = config.GZIP_LEVEL, brotli_quality: int = config.BROTLI_QUALITY):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.brotli_quality = brotli_quality
+        self.gzip = GZipMiddleware(app, minimum_size=minimum_size, compresslevel=gzip_level)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and brotli is not None \
+                and _accepts(Headers(scope=scope).get("accept-encoding", ""), "br"):
+            await BrotliResponder(self.app, self.minimum_size, self.brotli_quality)(scope, receive, send)
+            return
+        await self.gzip(scope, receive, send)
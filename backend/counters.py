@@ -0,0 +1,106 @@
+from collections import Counter
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.orm import Session
+from database import add_to_rows
+from tables import BookTable, CommentTable, CounterTable, UserTable
+
+# --- SUMMARY COUNTERS ---
+# counters holds one row per number a summary shows:
+#   books:<status>             all books with that status
+#   books:<status>:<creator>   one creator's books with that status
+#   users                      registered users
+#   version:catalog            bumped by any book write (catalog ETag)
+#   version:comments:<book>    bumped by a new or deleted comment on that book
+#   version:analytics:<creator> bumped by new activity on that creator's books
+# Single-row ORM writes keep them current through the mapper events below,
+# in the same transaction as the write. Set-based statements (batch
+# moderation) pass their deltas to add() themselves. rebuild() recomputes
+# the counts (python manage.py rebuild-counters); versions only ever grow,
+# so it leaves them alone.
+
+CATALOG_VERSION = "version:catalog"
+
+def comments_version_key(book_id: int) -> str:
+    return f"version:comments:{book_id}"
+
+def analytics_version_key(creator_id: str) -> str:
+    return f"version:analytics:{creator_id}"
+
+STATUSES = ("pending", "approved", "rejected")
+
+def book_keys(status: str, creator_id: str):
+    return [f"books:{status}", f"books:{status}:{creator_id}"]
+
+def add(connection, deltas: dict):
+    add_to_rows(connection, CounterTable, ["name"],
+                [{"name": name, "value": delta} for name, delta in deltas.items() if delta])
+
+def book_deltas(rows, sign: int):
+    # rows: (creator_id, status, count)
+    deltas = Counter()
+    for creator_id, status, count in rows:
+        for key in book_keys(status, creator_id):
+            deltas[key] += sign * count
+    return deltas
+
+def counters_query(names):
+    return select(CounterTable.name, CounterTable.value).where(CounterTable.name.in_(list(names)))
+
+def counter_values(names, rows):
+    values = dict(rows)
+    return {name: values.get(name, 0) for name in names}
+
+def get_many(db: Session, names):
+    return counter_values(names, db.execute(counters_query(names)).all())
+
+def status_counts(db: Session, creator_id: str = None):
+    suffix = f":{creator_id}" if creator_id is not None else ""
+    values = get_many(db, [f"books:{s}{suffix}" for s in STATUSES])
+    counts = {s: values[f"books:{s}{suffix}"] for s in STATUSES}
+    counts["total"] = sum(counts.values())
+    return counts
+
+def rebuild(db: Session):
+    db.query(CounterTable).filter(~CounterTable.name.startswith("version:")).delete(synchronize_session=False)
+    rows = db.execute(select(BookTable.creator_id, BookTable.status, func.count(BookTable.id))
+                      .group_by(BookTable.creator_id, BookTable.status)).all()
+    deltas = book_deltas(rows, 1)
+    deltas["users"] = db.query(func.count(UserTable.user_id)).scalar()
+    db.add_all(CounterTable(name=name, value=value) for name, value in deltas.items())
+
+# --- ORM HOOKS ---
+@event.listens_for(BookTable, "after_insert")
+def _book_inserted(mapper, connection, book):
+    deltas = book_deltas([(book.creator_id, book.status, 1)], 1)
+    deltas[CATALOG_VERSION] += 1
+    add(connection, deltas)
+
+@event.listens_for(BookTable, "after_update")
+def _book_updated(mapper, connection, book):
+    state = inspect(book)
+    status, creator = state.attrs.status.history, state.attrs.creator_id.history
+    deltas = Counter({CATALOG_VERSION: 1})
+    if status.deleted or creator.deleted:
+        old = ((creator.deleted or [book.creator_id])[0], (status.deleted or [book.status])[0], 1)
+        deltas.update(book_deltas([old], -1))
+        deltas.update(book_deltas([(book.creator_id, book.status, 1)], 1))
+    add(connection, deltas)
+
+@event.listens_for(BookTable, "after_delete")
+def _book_deleted(mapper, connection, book):
+    deltas = book_deltas([(book.creator_id, book.status, 1)], -1)
+    deltas[CATALOG_VERSION] += 1
+    add(connection, deltas)
+
+@event.listens_for(UserTable, "after_insert")
+def _user_inserted(mapper, connection, user):
+    add(connection, {"users": 1})
+
+@event.listens_for(UserTable, "after_delete")
+def _user_deleted(mapper, connection, user):
+    add(connection, {"users": -1})
+
+@event.listens_for(CommentTable, "after_insert")
+@event.listens_for(CommentTable, "after_delete")
+def _comment_changed(mapper, connection, comment):
+    add(connection, {comments_version_key(comment.book_id): 1})
@@ -1,9 +1,14 @@
 from fastapi import Depends, HTTPException,status
+from datetime import datetime
 from sqlalchemy.orm import Session
-from tables import UserTable
+from tables import PREVIEW_LENGTH, BookPageTable, UserTable
 from database import get_db
 from routers.auth import oauth2_scheme
-from routers.auth import default_users,active_tokens
+from routers.auth import default_users, load_principal
+from token_store import token_store
+import signed_tokens
+import reader
+import search
 
 def authenticate_user(username: str, password: str, db: Session):
     if username in default_users:
@@ -23,8 +28,19 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    # signed tokens carry the role: no user lookup, only the revocation check
+    if signed_tokens.is_signed(token):
+        claims = signed_tokens.verify_access_token(token)
+        if not claims:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Session expired. Please login again.",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        return {"username": claims["sub"], "role": claims["role"]}
+
     # updating tokens
-    username = active_tokens.get(token)
+    username = token_store.get(token)
     if not username:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -32,14 +48,11 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    if username in default_users:
-        return {"username": username, "role": default_users[username]["role"]}
-    
-    user = db.query(UserTable).filter(UserTable.user_id == username).first()
-    if not user:
+    principal = load_principal(username, db)
+    if not principal:
         raise HTTPException(status_code=401, detail="User not found")
     
-    return {"username": user.user_id, "role": user.role}
+    return principal
 
 def require_role(required_role: str):
     def role_checker(current_user: dict = Depends(get_current_user)):
@@ -47,3 +60,24 @@ def require_role(required_role: str):
             raise HTTPException(status_code=403, detail=f"Only {required_role} can access")
         return current_user
     return role_checker
+
+# book text is stored as compressed reader pages; the preview and the search
+# index are derived from it, so every content write goes through here
+def sync_book_content(db: Session, book, content: str):
+    book.preview = content[:PREVIEW_LENGTH]
+    book.updated_at = datetime.utcnow()  # always an UPDATE, so the revision moves with the text
+    search.index_book(db, book, content)  # first: removing the old entry reads the old pages
+    reader.save_book_pages(db, book.id, content)
+
+def add_books_content(db: Session, books):
+    # books: (book, content) of rows just inserted with their preview set, so
+    # nothing is updated: pages and search entries go in one statement each
+    reader.add_book_pages(db, [(book.id, content) for book, content in books])
+    search.index_books(db, books, new=True)
+
+def delete_book_content(db: Session, book_id: int):
+    delete_books_content(db, [book_id])
+
+def delete_books_content(db: Session, book_ids):
+    search.remove_books(db, book_ids)
+    db.query(BookPageTable).filter(BookPageTable.book_id.in_(book_ids)).delete(synchronize_session=False)
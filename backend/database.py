@@ -1,16 +1,100 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./library.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+import config
+
+SQLALCHEMY_DATABASE_URL = config.DATABASE_URL
+
+# --- ENGINE FACTORY ---
+def sqlite_pragmas(profile: str = config.SQLITE_PROFILE):
+    if profile != "production":
+        # WAL is persistent in the file, so switching back has to undo it
+        return {"journal_mode": "DELETE"}
+    return {
+        "journal_mode": "WAL",  # readers don't block the writer
+        "synchronous": "NORMAL",  # fsync at checkpoints, not every commit
+        "busy_timeout": config.SQLITE_BUSY_TIMEOUT_MS,  # wait for the lock instead of "database is locked"
+        "cache_size": -config.SQLITE_CACHE_SIZE_KB,  # negative = KiB
+        "mmap_size": config.SQLITE_MMAP_SIZE,
+        "temp_store": "MEMORY",
+    }
+
+def apply_sqlite_pragmas(engine, pragmas: dict):
+    # runs for every new pooled connection
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+def create_db_engine(url: str = SQLALCHEMY_DATABASE_URL, profile: str = config.SQLITE_PROFILE, create=create_engine):
+    if not url.startswith("sqlite"):
+        return create(
+            url,
+            pool_size=config.DB_POOL_SIZE,
+            max_overflow=config.DB_MAX_OVERFLOW,
+            pool_timeout=config.DB_POOL_TIMEOUT,
+            pool_recycle=config.DB_POOL_RECYCLE,
+            pool_pre_ping=True,
+        )
+    if ":memory:" in url or url.rstrip("/").endswith(":"):
+        # one shared connection, otherwise every checkout sees an empty database
+        return create(url, connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    engine = create(
+        url,
+        connect_args={"check_same_thread": False, "timeout": config.SQLITE_BUSY_TIMEOUT_MS / 1000},
+        pool_size=config.DB_POOL_SIZE,
+        max_overflow=config.DB_MAX_OVERFLOW,
+        pool_timeout=config.DB_POOL_TIMEOUT,
+    )
+    apply_sqlite_pragmas(getattr(engine, "sync_engine", engine), sqlite_pragmas(profile))
+    return engine
+
+engine = create_db_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 Base.metadata.create_all(bind=engine)
 
+# --- UPSERTS (SQLite and PostgreSQL) ---
+def dialect_insert(connection, table):
+    # INSERT with on_conflict_do_update / on_conflict_do_nothing
+    if connection.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(getattr(table, "__table__", table))
+
+def add_to_rows(connection, table, keys, rows):
+    # rows: dicts of the key columns plus amounts to add. One
+    # INSERT ... ON CONFLICT (keys) DO UPDATE SET amount = amount + excluded.amount,
+    # so two first writes to the same key can't both try to insert it
+    if not rows:
+        return
+    stmt = dialect_insert(connection, table)
+    amounts = [name for name in rows[0] if name not in keys]
+    connection.execute(stmt.on_conflict_do_update(
+        index_elements=keys,
+        set_={name: stmt.table.c[name] + stmt.excluded[name] for name in amounts},
+    ), rows)
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# --- ASYNC MODE (DB_MODE=async, needs aiosqlite or asyncpg) ---
+async_engine = None
+AsyncSessionLocal = None
+if config.DB_MODE == "async":
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    async_engine = create_db_engine(config.ASYNC_DATABASE_URL, create=create_async_engine)
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
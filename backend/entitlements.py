@@ -0,0 +1,63 @@
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+import config
+from cache import TTLCache
+from tables import PurchaseTable
+
+# --- ENTITLEMENTS ---
+# purchases has one row per (username, book_id). Each user's purchased ids
+# are cached as a set, loaded in one query on login or on first check, so
+# the paywall check for an owned book is a set lookup. A book missing from
+# the set is re-checked on the unique index before answering "not bought",
+# which covers purchases made through another worker.
+
+entitlement_cache = TTLCache(maxsize=config.ENTITLEMENT_CACHE_MAX_USERS, ttl=config.ENTITLEMENT_CACHE_TTL_SECONDS)
+
+def owned_query(username: str):
+    return select(PurchaseTable.book_id).where(PurchaseTable.username == username)
+
+def purchase_query(username: str, book_id: int):
+    return select(PurchaseTable.id).where(PurchaseTable.username == username, PurchaseTable.book_id == book_id)
+
+def load_entitlements(db: Session, username: str) -> set:
+    return cache_entitlements(username, db.execute(owned_query(username)).scalars())
+
+def cache_entitlements(username: str, book_ids) -> set:
+    owned = set(book_ids)
+    entitlement_cache.set(username, owned)
+    return owned
+
+def owned_books(db: Session, username: str) -> set:
+    owned = entitlement_cache.get(username)
+    if owned is None:
+        owned = load_entitlements(db, username)
+    return owned
+
+def has_entitlement(db: Session, username: str, book_id: int) -> bool:
+    if book_id in owned_books(db, username):
+        return True
+    bought = db.execute(purchase_query(username, book_id)).first() is not None
+    if bought:
+        _remember(username, book_id)
+    return bought
+
+def grant(db: Session, username: str, book_id: int, price: float) -> bool:
+    # returns False when the book was already bought; commits on success
+    if has_entitlement(db, username, book_id):
+        return False
+    db.add(PurchaseTable(username=username, book_id=book_id, price=price))
+    try:
+        db.commit()
+    except IntegrityError:  # a concurrent request bought it first
+        db.rollback()
+        _remember(username, book_id)
+        return False
+    _remember(username, book_id)
+    return True
+
+def _remember(username: str, book_id: int):
+    owned = entitlement_cache.get(username)
+    if owned is not None:
+        owned.add(book_id)
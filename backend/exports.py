@@ -0,0 +1,67 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from tables import BookTable, PurchaseTable, ReadingSessionTable, UserTable
+
+# --- STREAMING EXPORTS (GET /admin/export/{name}, python manage.py export) ---
+# Rows are read in id order with yield_per (a server-side cursor on
+# PostgreSQL; SQLite steps its cursor), and written out every YIELD_PER rows,
+# so memory use does not depend on the table size. Each row carries its id.
+# An interrupted download resumes with after=<id of the last complete row>.
+
+YIELD_PER = 1000
+FORMATS = ("csv", "ndjson")
+
+# name -> (table, exported columns, column for since/until or None)
+EXPORTS = {
+    "users": (UserTable, ["id", "user_id", "name", "email", "phone_number", "role"], None),
+    "books": (BookTable, ["id", "title", "author", "theme", "price", "is_premium", "status",
+                          "creator_id", "revision", "updated_at"], "updated_at"),
+    "sessions": (ReadingSessionTable, ["id", "username", "book_id", "started_at", "ended_at",
+                                       "last_seen_at", "duration_seconds"], "started_at"),
+    "purchases": (PurchaseTable, ["id", "username", "book_id", "price", "purchased_at"], "purchased_at"),
+}
+
+def export_query(name: str, since: datetime = None, until: datetime = None, after: int = None):
+    # since is inclusive, until exclusive
+    table, columns, date_column = EXPORTS[name]
+    query = select(*[getattr(table, c) for c in columns])
+    if (since or until) and date_column is None:
+        raise ValueError(f"{name} has no date column to filter on")
+    if since:
+        query = query.where(getattr(table, date_column) >= since)
+    if until:
+        query = query.where(getattr(table, date_column) < until)
+    if after is not None:
+        query = query.where(table.id > after)
+    return query.order_by(table.id).execution_options(yield_per=YIELD_PER)
+
+def _value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def stream_rows(db: Session, name: str, fmt: str, since: datetime = None,
+                until: datetime = None, after: int = None):
+    # yields text chunks of YIELD_PER rows; csv starts with a header line
+    # unless it resumes (after=...), so the parts can be concatenated
+    columns = EXPORTS[name][1]
+    result = db.execute(export_query(name, since, until, after))
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == "csv" else None
+    if writer and after is None:
+        writer.writerow(columns)
+    for partition in result.partitions():
+        for row in partition:
+            if writer:
+                writer.writerow([_value(v) for v in row])
+            else:
+                buffer.write(json.dumps(dict(zip(columns, map(_value, row)))) + "\n")
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
@@ -0,0 +1,79 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Request, Response
+
+import config
+from cache import TTLCache
+
+# --- HTTP CACHING (ETag / Last-Modified / 304) ---
+# Every cacheable read has a version that changes with any write to it:
+#   catalog           counters "version:catalog" (any book insert/update/delete)
+#   book and pages    books.revision (bumped by every UPDATE of the row)
+#   comments          counters "version:comments:<book_id>"
+# Clients revalidate with If-None-Match / If-Modified-Since and get a 304
+# without the body. Payloads are also kept in response_cache under a key
+# that contains the version, so a write makes the old entries unreachable
+# and they age out of the LRU.
+# Every one of these routes needs a bearer token, so responses are only
+# cacheable by the reader's browser (private, Vary: Authorization), never by
+# a shared cache. Premium books are checked against the paywall before any
+# 304 and are revalidated on every use (no-cache).
+
+response_cache = TTLCache(config.RESPONSE_CACHE_MAX_ENTRIES, config.RESPONSE_CACHE_TTL_SECONDS)
+
+def etag(*parts) -> str:
+    # weak: the compression middleware may re-encode the same payload
+    return 'W/"' + "-".join(str(p) for p in parts) + '"'
+
+def cache_control(revalidate: bool = False) -> str:
+    if revalidate:
+        return "private, no-cache"
+    return f"private, max-age={config.HTTP_CACHE_MAX_AGE_SECONDS}"
+
+def _etag_matches(header: str, tag: str) -> bool:
+    # weak comparison (RFC 9110 13.1.2)
+    if header.strip() == "*":
+        return True
+    bare = tag.removeprefix("W/")
+    return any(t.strip().removeprefix("W/") == bare for t in header.split(","))
+
+def _not_modified_since(header: str, last_modified: datetime) -> bool:
+    try:
+        since = parsedate_to_datetime(header)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return last_modified.replace(microsecond=0) <= since
+
+def _as_utc(moment: datetime) -> datetime:
+    # stored timestamps are naive UTC (datetime.utcnow)
+    return moment.replace(tzinfo=timezone.utc) if moment.tzinfo is None else moment
+
+def conditional(request: Request, response: Response, tag: str,
+                last_modified: datetime = None, revalidate: bool = False):
+    # Sets the validators on `response`. Returns a 304 Response when the
+    # client's copy is current, otherwise None and the handler builds the body.
+    headers = {"ETag": tag, "Cache-Control": cache_control(revalidate), "Vary": "Authorization"}
+    if last_modified is not None:
+        last_modified = _as_utc(last_modified)
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+    response.headers.update(headers)
+
+    # If-None-Match wins over If-Modified-Since when both are sent
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        fresh = _etag_matches(if_none_match, tag)
+    elif last_modified is not None and request.headers.get("if-modified-since"):
+        fresh = _not_modified_since(request.headers["if-modified-since"], last_modified)
+    else:
+        fresh = False
+    return Response(status_code=304, headers=headers) if fresh else None
+
+def cached(key, build):
+    value = response_cache.get(key)
+    if value is None:
+        value = build()
+        response_cache.set(key, value)
+    return value
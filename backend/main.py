@@ -1,11 +1,25 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware 
-from database import Base, engine
+from database import Base, async_engine, engine
 from routers import auth, admin, user, comments,creator 
+from migrations import run_migrations
+from session_events import session_events
+from compression import CompressionMiddleware
+import config
 
 Base.metadata.create_all(bind=engine)
+run_migrations(engine)
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app):
+    session_events.start()  # replays SESSION_EVENT_LOG, flushes and sweeps stale sessions
+    yield
+    session_events.stop()  # flush whatever is still queued
+    if async_engine is not None:
+        await async_engine.dispose()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -15,10 +29,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# gzip (or brotli) for responses over COMPRESSION_MINIMUM_SIZE bytes
+app.add_middleware(CompressionMiddleware)
+
+# DB_MODE=async: the hot reads are served by native async handlers
+# (async_routes.py), mounted first so they take those paths
+if config.DB_MODE == "async":
+    import async_routes
+    app.include_router(async_routes.user_router, prefix="/user", tags=["user"])
+    app.include_router(async_routes.comments_router, prefix="/comments", tags=["comments"])
+
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
 app.include_router(admin.router, prefix="/admin", tags=["admin"])
 app.include_router(user.router, prefix="/user", tags=["user"])
 app.include_router(creator.router, prefix="/user", tags=["creator"])
 app.include_router(comments.router, prefix="/comments", tags=["comments"])
-
-
@@ -0,0 +1,194 @@
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+from database import Base, SessionLocal, engine
+import tables  # noqa: F401  (registers the models on Base)
+from migrations import run_migrations
+import bulk_import
+import counters
+import exports
+import recommendations
+import stats
+import trending
+import storage
+from session_events import sweep_stale_sessions
+
+# Offline maintenance commands, e.g.  python manage.py migrate
+
+def cmd_migrate(args):
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    print("Database is up to date")
+
+def cmd_content_report(args):
+    with SessionLocal() as db:
+        print(json.dumps(storage.content_report(db), indent=2))
+
+def cmd_rebuild_stats(args):
+    with SessionLocal() as db:
+        stats.rebuild_reading_stats(db)
+        db.commit()
+    print("Reading stats rebuilt from reading_sessions")
+
+def cmd_check_stats(args):
+    with SessionLocal() as db:
+        mismatches = stats.check_reading_stats(db)
+    for m in mismatches:
+        print(json.dumps(m))
+    print(f"{len(mismatches)} mismatched rollup rows")
+    raise SystemExit(1 if mismatches else 0)
+
+def cmd_rebuild_counters(args):
+    with SessionLocal() as db:
+        counters.rebuild(db)
+        db.commit()
+    print("Summary counters rebuilt from books and users")
+
+def cmd_sweep_sessions(args):
+    with SessionLocal() as db:
+        swept = sweep_stale_sessions(db)
+        db.commit()
+    print(f"Closed {swept} stale reading sessions")
+
+def cmd_optimize_db(args):
+    with SessionLocal() as db:
+        bulk_import.finish_import(db)
+    print("Search index merged and planner statistics refreshed")
+
+def cmd_build_recommendations(args):
+    started = time.monotonic()
+    with SessionLocal() as db:
+        result = recommendations.refresh(db, full=args.full)
+    print(f"{result['mode']} build ({result['engine']}): {result['books']} books, "
+          f"{result['users']} users in {time.monotonic() - started:.1f}s")
+
+def cmd_rebuild_trending(args):
+    with SessionLocal() as db:
+        buckets = trending.rebuild(db)
+        db.commit()
+    print(f"Trending buckets rebuilt from raw history: {buckets} buckets")
+
+def cmd_prune_trending(args):
+    with SessionLocal() as db:
+        removed = trending.prune(db)
+        db.commit()
+    print(f"Removed {removed} expired trending buckets")
+
+def cmd_export(args):
+    # python manage.py export sessions --format csv --since 2026-01-01 > sessions.csv
+    out = open(args.output, "a" if args.after else "w", encoding="utf-8", newline="") if args.output else sys.stdout
+    try:
+        with SessionLocal() as db:
+            for chunk in exports.stream_rows(db, args.name, args.format, since=args.since,
+                                             until=args.until, after=args.after):
+                out.write(chunk)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+def cmd_import_books(args):
+    # python manage.py import-books catalog.ndjson --rejects failed.ndjson
+    paths = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            paths += sorted(os.path.join(path, f) for f in os.listdir(path) if f.lower().endswith(".epub"))
+        else:
+            paths.append(path)
+    fmt = args.format or (bulk_import.detect_format(paths[0]) if paths else None)
+    if fmt is None:
+        raise SystemExit("Unknown file type, pass --format ndjson|csv|epub")
+
+    def records():
+        if fmt == "epub":  # one book per file, numbered in path order
+            for record_no, path in enumerate(paths, start=1):
+                if record_no >= args.start_at:
+                    with open(path, "rb") as f:
+                        yield from bulk_import.read_records(fmt, f, start_no=record_no)
+            return
+        offset = 0  # records are numbered across all files
+        for path in paths:
+            last = 0
+            with open(path, "rb") as f:
+                for record_no, raw in bulk_import.read_records(fmt, f):
+                    last = record_no
+                    yield offset + record_no, raw
+            offset += last
+
+    rejects = open(args.rejects, "a", encoding="utf-8") if args.rejects else None
+    started = time.monotonic()
+
+    def on_failure(failure):
+        print(f"record {failure['record']}: {failure['error']}", file=sys.stderr)
+        if rejects:
+            rejects.write(bulk_import.rejected_line(failure) + "\n")
+            rejects.flush()
+
+    def on_progress(summary):
+        rate = summary["imported"] / max(time.monotonic() - started, 1e-9)
+        print(f"{summary['imported']} imported, {summary['failed']} failed, "
+              f"settled through record {summary['last_record']} ({rate:.0f} books/s)", file=sys.stderr)
+
+    defaults = {"price": args.price, "is_premium": args.premium}
+    if args.theme:
+        defaults["theme"] = args.theme
+    try:
+        with SessionLocal() as db:
+            summary = bulk_import.import_books(
+                db, records(), args.creator, status=args.status, defaults=defaults,
+                start_at=args.start_at, batch_size=args.batch_size, allow_creator=True,
+                on_failure=on_failure, on_progress=on_progress,
+            )
+            if summary["imported"]:
+                bulk_import.finish_import(db)
+    finally:
+        if rejects:
+            rejects.close()
+    print(json.dumps(summary))
+    raise SystemExit(1 if summary["failed"] else 0)
+
+def main():
+    parser = argparse.ArgumentParser(description="Library Management System maintenance")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("migrate", help="create tables and upgrade an existing library.db").set_defaults(func=cmd_migrate)
+    commands.add_parser("content-report", help="book content size and compression ratio").set_defaults(func=cmd_content_report)
+    commands.add_parser("rebuild-stats", help="recompute reading stats rollups from raw sessions").set_defaults(func=cmd_rebuild_stats)
+    commands.add_parser("check-stats", help="compare reading stats rollups with raw sessions").set_defaults(func=cmd_check_stats)
+    commands.add_parser("rebuild-counters", help="recompute the admin/creator summary counters").set_defaults(func=cmd_rebuild_counters)
+    commands.add_parser("sweep-sessions", help="close reading sessions that stopped sending heartbeats").set_defaults(func=cmd_sweep_sessions)
+    commands.add_parser("rebuild-trending", help="repopulate the trending buckets from sessions, purchases and comments").set_defaults(func=cmd_rebuild_trending)
+    commands.add_parser("optimize-db", help="merge the search index segments and run ANALYZE (after large API imports)").set_defaults(func=cmd_optimize_db)
+    commands.add_parser("prune-trending", help="drop trending buckets past their retention").set_defaults(func=cmd_prune_trending)
+    recs = commands.add_parser("build-recommendations", help="refresh the precomputed book and user recommendations")
+    recs.add_argument("--full", action="store_true", help="recompute everything instead of what changed since the last run")
+    recs.set_defaults(func=cmd_build_recommendations)
+    exporter = commands.add_parser("export", help="stream a table as CSV or NDJSON")
+    exporter.add_argument("name", choices=list(exports.EXPORTS))
+    exporter.add_argument("--format", choices=exports.FORMATS, default="ndjson")
+    exporter.add_argument("--since", type=datetime.fromisoformat, help="rows on or after this date (sessions: started_at, purchases: purchased_at, books: updated_at)")
+    exporter.add_argument("--until", type=datetime.fromisoformat, help="rows before this date")
+    exporter.add_argument("--after", type=int, help="resume after this id (appends to --output)")
+    exporter.add_argument("--output", help="file to write instead of stdout")
+    exporter.set_defaults(func=cmd_export)
+    importer = commands.add_parser("import-books", help="bulk import books from NDJSON, CSV or EPUB files")
+    importer.add_argument("paths", nargs="+", help="files (EPUB: files or folders, one book per file)")
+    importer.add_argument("--format", choices=bulk_import.FORMATS)
+    importer.add_argument("--creator", default="admin", help="creator_id for rows that don't set one")
+    importer.add_argument("--status", default="approved", choices=("approved", "pending"))
+    importer.add_argument("--price", type=float, default=0.0, help="default price")
+    importer.add_argument("--premium", action="store_true", help="default is_premium")
+    importer.add_argument("--theme", help="default theme")
+    importer.add_argument("--batch-size", type=int, default=bulk_import.BATCH_SIZE)
+    importer.add_argument("--start-at", type=int, default=1, help="resume: first record number to import")
+    importer.add_argument("--rejects", help="append failed rows here as NDJSON")
+    importer.set_defaults(func=cmd_import_books)
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
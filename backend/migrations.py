@@ -0,0 +1,125 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from database import Base
+from tables import PREVIEW_LENGTH, BookTable, CounterTable, ReadingStatTotalTable
+from search import create_search_index
+import counters
+import reader
+import search
+import stats
+
+# create_all() only creates missing tables, so existing library.db files
+# need the new columns and indexes added here.
+
+def add_missing_columns(engine):
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+
+def create_missing_indexes(engine):
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+# SQLite reflection skips expression indexes, so index.create(checkfirst=True)
+# would try to build them again on every start; they live outside the models
+EXPRESSION_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS ix_users_name_lower ON users (lower(name))",
+    "CREATE INDEX IF NOT EXISTS ix_users_email_lower ON users (lower(email))",
+]
+
+def create_expression_indexes(engine):
+    with engine.begin() as conn:
+        for statement in EXPRESSION_INDEXES:
+            conn.execute(text(statement))
+
+def move_book_content(engine):
+    # books.content predates compressed page storage: move it into
+    # book_pages in batches, then drop the column
+    if "content" not in {c["name"] for c in inspect(engine).get_columns("books")}:
+        return
+    with Session(engine) as db:
+        last_id = 0
+        while True:
+            rows = db.execute(
+                text("SELECT id, content FROM books WHERE content IS NOT NULL AND id > :last ORDER BY id LIMIT 100"),
+                {"last": last_id},
+            ).all()
+            if not rows:
+                break
+            for book_id, content in rows:
+                db.query(BookTable).filter(BookTable.id == book_id).update({"preview": content[:PREVIEW_LENGTH]})
+                reader.save_book_pages(db, book_id, content)
+            last_id = rows[-1][0]
+        db.commit()
+    with engine.begin() as conn:
+        try:
+            conn.execute(text("ALTER TABLE books DROP COLUMN content"))
+        except OperationalError:
+            # SQLite < 3.35 can't drop columns; emptying it frees the space too
+            conn.execute(text("UPDATE books SET content = NULL"))
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("VACUUM"))
+
+def move_purchases(engine):
+    # "buy" rows in user_progress become purchases (one per user and book),
+    # then duplicate progress rows are dropped so the unique index can be built
+    indexes = {i["name"] for i in inspect(engine).get_indexes("user_progress")}
+    if "uq_user_progress_username_action_book" in indexes:
+        return
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO purchases (username, book_id, price) "
+            "SELECT p.username, p.book_id, COALESCE(MAX(b.price), 0) FROM user_progress p "
+            "LEFT JOIN books b ON b.id = p.book_id "
+            "WHERE p.action_type = 'buy' AND NOT EXISTS ("
+            "SELECT 1 FROM purchases x WHERE x.username = p.username AND x.book_id = p.book_id) "
+            "GROUP BY p.username, p.book_id"
+        ))
+        conn.execute(text("DELETE FROM user_progress WHERE action_type = 'buy'"))
+        conn.execute(text(
+            "DELETE FROM user_progress WHERE id NOT IN ("
+            "SELECT MIN(id) FROM user_progress GROUP BY username, action_type, book_id)"
+        ))
+        conn.execute(text("DROP INDEX IF EXISTS ix_user_progress_username_action_book"))
+
+def backfill_book_revisions(engine):
+    # rows from before books.revision / updated_at existed
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE books SET revision = 1 WHERE revision IS NULL"))
+        conn.execute(text("UPDATE books SET updated_at = CURRENT_TIMESTAMP WHERE updated_at IS NULL"))
+
+def backfill_counters(engine):
+    with Session(engine) as db:
+        if db.query(CounterTable.name).first() is None:
+            counters.rebuild(db)
+            db.commit()
+
+def backfill_reading_stats(engine):
+    with Session(engine) as db:
+        if db.query(ReadingStatTotalTable.username).first() is None:
+            stats.rebuild_reading_stats(db)
+            db.commit()
+
+def run_migrations(engine):
+    add_missing_columns(engine)
+    backfill_book_revisions(engine)
+    move_purchases(engine)
+    create_missing_indexes(engine)
+    create_expression_indexes(engine)
+    move_book_content(engine)
+    if create_search_index(engine):
+        with Session(engine) as db:
+            search.rebuild_index(db)
+            db.commit()
+    backfill_reading_stats(engine)
+    backfill_counters(engine)
@@ -1,6 +1,6 @@
 from datetime import datetime
-from typing import List, Optional
-from pydantic import BaseModel, EmailStr
+from typing import List, Literal, Optional
+from pydantic import BaseModel, EmailStr, Field
 
 class UserRegister(BaseModel):
     name: str
@@ -33,6 +33,117 @@ class BookUpdate(BaseModel):
     is_premium: bool
     theme: Optional[str] = None
 
+# --- BOOK RESPONSES ---
+# Routes with a response model are serialized straight to JSON bytes by
+# Pydantic (no jsonable_encoder pass), so the large listings declare one.
+class BookSummary(BaseModel):
+    id: int
+    title: str
+    author: str
+    theme: Optional[str] = None
+    price: float
+    is_premium: bool
+    preview: Optional[str] = None
+
+class CatalogPage(BaseModel):
+    books: List[BookSummary]
+    next_cursor: Optional[str] = None
+
+class BookResponse(BookSummary):
+    status: str
+    creator_id: Optional[str] = None
+    class Config:
+        from_attributes = True
+
+class BookDetail(BookResponse):
+    content: str
+
+class BookPage(BaseModel):
+    book_id: int
+    page_no: int
+    page_count: int
+    content: str
+
+class UserPage(BaseModel):
+    users: List[UserResponse]
+    next_cursor: Optional[str] = None
+    total: int
+    # True when total comes from a cached count of a filtered list
+    total_is_estimate: bool = False
+
+class BookListPage(BaseModel):
+    books: List[BookResponse]
+    next_cursor: Optional[str] = None
+
+class AdminBook(BookResponse):
+    content: str
+
+class RecommendedBook(BookSummary):
+    score: float
+
+class RecommendationsResponse(BaseModel):
+    source: Literal["personal", "popular"]
+    books: List[RecommendedBook]
+
+class TrendingBook(BookSummary):
+    score: float
+
+class TrendingResponse(BaseModel):
+    window: str
+    theme: Optional[str] = None
+    books: List[TrendingBook]
+
+class DailyActivity(BaseModel):
+    day: str
+    readers: int
+    seconds: int
+    purchases: int
+
+class BookAnalytics(BaseModel):
+    book_id: int
+    title: str
+    status: str
+    price: float
+    readers: int
+    reading_seconds: int
+    sessions: int
+    median_session_seconds: float
+    purchases: int
+    revenue: float
+    comments: int
+    daily: List[DailyActivity]
+
+class AnalyticsTotals(BaseModel):
+    readers: int
+    reading_seconds: int
+    sessions: int
+    purchases: int
+    revenue: float
+    comments: int
+
+class CreatorAnalytics(BaseModel):
+    days: int
+    since: str
+    totals: AnalyticsTotals
+    books: List[BookAnalytics]
+
+class RecentReading(BaseModel):
+    title: str
+    author: str
+    duration_seconds: Optional[int] = None
+    ended_at: Optional[datetime] = None
+
+class DashboardResponse(BaseModel):
+    name: str
+    total_purchased: int
+    purchased_books: List[BookSummary]
+    total_viewed: int
+    total_reading_seconds: int
+    today_reading_seconds: int
+    week_reading_seconds: int
+    month_reading_seconds: int
+    recent_reading: List[RecentReading]
+
 class Payment(BaseModel):
     amount: float
 
@@ -47,8 +158,18 @@ class TokenResponse(BaseModel):
     token_type: str
     role: str
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+class LogoutRequest(BaseModel):
+    refresh_token: Optional[str] = None
+
+class BatchModeration(BaseModel):
+    action: Literal["approve", "reject", "delete"]
+    ids: List[int] = Field(..., min_length=1, max_length=500)
+
 class StopReadingBody(BaseModel):
-    duration_seconds: int
+    duration_seconds: Optional[int] = None  # ignored, the server measures the session
 
 class CommentCreate(BaseModel):
     book_id: int
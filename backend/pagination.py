@@ -0,0 +1,37 @@
+import base64
+import json
+from datetime import datetime
+from fastapi import HTTPException
+
+# Opaque keyset cursors: the sort key values of the last row on a page.
+
+def encode_cursor(*values):
+    raw = json.dumps(list(values), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str, *types):
+    # types: the type of each sort key value, e.g. (str, int) for title, id
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError("wrong number of values")
+        return [_typed(value, kind) for value, kind in zip(values, types)]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _typed(value, kind):
+    if kind is datetime:  # encoded with str()
+        if not isinstance(value, str):
+            raise ValueError("not a datetime")
+        return datetime.fromisoformat(value)
+    if type(value) is not kind:  # exact: True is an int too
+        raise ValueError(f"not a {kind.__name__}")
+    return value
+
+def split_page(rows, limit: int, key):
+    # callers fetch limit + 1 rows so we know whether another page exists
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(*key(rows[-1]))
@@ -0,0 +1,84 @@
+from fastapi import HTTPException
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+from tables import BookPageTable
+import entitlements
+import storage
+
+# --- PAGINATED READER ---
+# Pages are computed once when a book is saved and stored compressed in
+# book_pages, so reading a page is a single indexed lookup and one small
+# decompress -- never the whole text.
+
+PAGE_SIZE = 3000  # target characters per page
+
+def split_pages(content: str, page_size: int = PAGE_SIZE):
+    offsets = []
+    start, length = 0, len(content)
+    while start < length:
+        end = min(start + page_size, length)
+        if end < length:
+            # prefer to break on a paragraph, then a line, then a word
+            for sep in ("\n\n", "\n", " "):
+                cut = content.rfind(sep, start + page_size // 2, end)
+                if cut != -1:
+                    end = cut + len(sep)
+                    break
+        offsets.append((start, end))
+        start = end
+    return offsets or [(0, 0)]
+
+def page_rows(book_id: int, content: str):
+    for page_no, (start, end) in enumerate(split_pages(content), start=1):
+        text = content[start:end]
+        yield {
+            "book_id": book_id, "page_no": page_no, "start_offset": start, "end_offset": end,
+            "codec": storage.DEFAULT_CODEC, "raw_size": len(text.encode("utf-8")),
+            "data": storage.compress(text),
+        }
+
+def save_book_pages(db: Session, book_id: int, content: str):
+    db.query(BookPageTable).filter(BookPageTable.book_id == book_id).delete()
+    add_book_pages(db, [(book_id, content)])
+
+def add_book_pages(db: Session, books):
+    # books: (book_id, content) of books without pages; one executemany
+    db.execute(insert(BookPageTable), [row for book_id, content in books for row in page_rows(book_id, content)])
+
+def ensure_can_read(db: Session, book, current_user: dict):
+    if not book.is_premium:
+        return
+    if current_user["role"] == "admin" or current_user["username"] == book.creator_id:
+        return
+    if not entitlements.has_entitlement(db, current_user["username"], book.id):
+        raise HTTPException(status_code=402, detail="Payment required to read this book")
+
+# statements are shared with the async handlers (async_routes.py)
+def page_count_query(book_id: int):
+    return select(func.max(BookPageTable.page_no)).where(BookPageTable.book_id == book_id)
+
+def page_query(book_id: int, page_no: int):
+    return select(BookPageTable.codec, BookPageTable.data)\
+        .where(BookPageTable.book_id == book_id, BookPageTable.page_no == page_no)
+
+def page_text(page):
+    if not page:
+        return None
+    return storage.decompress(page.data, page.codec) if page.data else ""
+
+def get_page_count(db: Session, book_id: int) -> int:
+    return db.execute(page_count_query(book_id)).scalar() or 0
+
+def read_page(db: Session, book_id: int, page_no: int):
+    return page_text(db.execute(page_query(book_id, page_no)).first())
+
+def iter_pages(db: Session, book_id: int):
+    # page texts in order, decompressed one at a time
+    pages = db.query(BookPageTable.codec, BookPageTable.data)\
+        .filter(BookPageTable.book_id == book_id)\
+        .order_by(BookPageTable.page_no)\
+        .all()
+    return (storage.decompress(p.data, p.codec) for p in pages if p.data)
+
+def read_content(db: Session, book_id: int) -> str:
+    return "".join(iter_pages(db, book_id))
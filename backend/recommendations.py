@@ -0,0 +1,240 @@
+import heapq
+import math
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import delete, func, insert, or_
+from sqlalchemy.orm import Session
+
+import config
+from tables import (
+    BookSimilarityTable, BookTable, PurchaseTable, ReadingSessionTable,
+    ReadingStatDailyTable, UserProgressTable, UserRecommendationTable,
+)
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:  # optional, the pure-Python path gives the same results
+    np = sparse = None
+
+# --- RECOMMENDATIONS (python manage.py build-recommendations) ---
+# Every (user, book) pair gets an affinity weight:
+#   OPENED_WEIGHT for opening it, + log(1 + minutes read), + PURCHASE_WEIGHT if bought
+# Two books are similar when the same users spent time on both. This is the
+# cosine of their user-weight columns, i.e. the item-item co-occurrence
+# matrix M.T @ M normalised. It is blended with sharing a theme:
+#   score = (1 - RECOMMENDATION_THEME_WEIGHT) * cosine + RECOMMENDATION_THEME_WEIGHT * same_theme
+# The top-K approved neighbours per book go to book_similarities. A user's
+# candidates are the neighbours of their books, weighted by their affinity;
+# the top K they have not opened go to user_recommendations, so the endpoint
+# reads K rows.
+#
+# Incremental runs only recompute what new activity can change. Since the
+# last run, some books were read, bought or edited. Those books and every
+# book that shares a reader with them get new neighbours; their readers get
+# new recommendations. A full run (--full) also picks up slower drift, such
+# as the most-read books of a theme.
+
+OPENED_WEIGHT = 0.5
+PURCHASE_WEIGHT = 1.0
+POPULAR_KEY = "*"
+CHUNK = 512
+
+def load_affinity(db: Session):
+    weights = defaultdict(float)
+    D = ReadingStatDailyTable
+    for username, book_id, seconds in db.query(D.username, D.book_id, func.sum(D.total_seconds))\
+            .group_by(D.username, D.book_id):
+        weights[(username, book_id)] += math.log1p((seconds or 0) / 60)
+    for username, book_id in db.query(UserProgressTable.username, UserProgressTable.book_id)\
+            .filter(UserProgressTable.action_type == "read"):
+        weights[(username, book_id)] += OPENED_WEIGHT
+    for username, book_id in db.query(PurchaseTable.username, PurchaseTable.book_id):
+        weights[(username, book_id)] += PURCHASE_WEIGHT
+    return weights
+
+def load_books(db: Session):
+    # book_id -> (theme key, approved)
+    return {
+        book_id: ((theme or "").strip().lower(), status == "approved")
+        for book_id, theme, status in db.query(BookTable.id, BookTable.theme, BookTable.status)
+    }
+
+def theme_candidates(books, popularity, per_theme: int):
+    # the most-read approved books of each theme
+    by_theme = defaultdict(list)
+    for book_id, (theme, approved) in books.items():
+        if theme and approved:
+            by_theme[theme].append(book_id)
+    return {
+        theme: heapq.nlargest(per_theme, ids, key=lambda b: (popularity.get(b, 0.0), -b))
+        for theme, ids in by_theme.items()
+    }
+
+# --- ITEM-ITEM NEIGHBOURS: {book_id: [(similar_book_id, score), ...]} ---
+def _neighbours_python(weights, books, sources, k, theme_weight, by_theme):
+    by_user, by_book = defaultdict(dict), defaultdict(dict)
+    for (username, book_id), w in weights.items():
+        by_user[username][book_id] = w
+        by_book[book_id][username] = w
+    norms = {b: math.sqrt(sum(w * w for w in users.values())) for b, users in by_book.items()}
+
+    result = {}
+    for i in sources:
+        dots = defaultdict(float)
+        for username, wi in by_book.get(i, {}).items():
+            for j, wj in by_user[username].items():
+                dots[j] += wi * wj
+        scores = defaultdict(float)
+        for j, dot in dots.items():
+            if j != i and books.get(j, ("", False))[1] and dot:
+                scores[j] += (1 - theme_weight) * dot / (norms[i] * norms[j])
+        for j in by_theme.get(books.get(i, ("", False))[0], ()):
+            if j != i:
+                scores[j] += theme_weight
+        result[i] = heapq.nlargest(k, scores.items(), key=lambda kv: (kv[1], -kv[0]))
+    return result
+
+def _neighbours_numpy(weights, books, sources, k, theme_weight, by_theme):
+    users = {u: n for n, u in enumerate({u for u, _ in weights})}
+    book_ids = np.array(sorted(set(books) | {b for _, b in weights}))
+    column = {b: n for n, b in enumerate(book_ids.tolist())}
+    rows = np.fromiter((users[u] for u, _ in weights), dtype=np.int64, count=len(weights))
+    cols = np.fromiter((column[b] for _, b in weights), dtype=np.int64, count=len(weights))
+    vals = np.fromiter(weights.values(), dtype=np.float64, count=len(weights))
+    M = sparse.csc_matrix((vals, (rows, cols)), shape=(len(users), len(book_ids)))
+    norms = np.sqrt(np.asarray(M.multiply(M).sum(axis=0)).ravel())
+    approved = np.array([books.get(b, ("", False))[1] for b in book_ids.tolist()])
+    theme_cols = {t: np.array([column[b] for b in ids], dtype=np.int64) for t, ids in by_theme.items()}
+    empty = np.array([], dtype=np.int64)
+
+    result = {}
+    sources = list(sources)
+    for start in range(0, len(sources), CHUNK):
+        chunk = sources[start:start + CHUNK]
+        C = (M[:, [column[i] for i in chunk]].T @ M).tocsr()  # co-occurrence rows of this chunk
+        for r, i in enumerate(chunk):
+            ci = column[i]
+            lo, hi = C.indptr[r], C.indptr[r + 1]
+            co_cols, dots = C.indices[lo:hi], C.data[lo:hi]
+            cosine = (1 - theme_weight) * dots / np.maximum(norms[ci] * norms[co_cols], 1e-12)
+            t_cols = theme_cols.get(books.get(i, ("", False))[0], empty)
+            all_cols = np.concatenate([co_cols, t_cols])
+            all_vals = np.concatenate([cosine, np.full(len(t_cols), theme_weight)])
+            cand, inverse = np.unique(all_cols, return_inverse=True)
+            scores = np.bincount(inverse, weights=all_vals)
+            keep = approved[cand] & (cand != ci) & (scores > 0)
+            cand, scores = cand[keep], scores[keep]
+            top = np.lexsort((book_ids[cand], -scores))[:k]  # best first, ties by id
+            result[i] = [(int(book_ids[c]), float(s)) for c, s in zip(cand[top], scores[top])]
+    return result
+
+def item_neighbours(weights, books, sources, k: int, theme_weight: float, by_theme):
+    neighbours = _neighbours_numpy if np is not None and weights else _neighbours_python
+    return neighbours(weights, books, sources, k, theme_weight, by_theme)
+
+def recommend_for_user(items: dict, neighbours: dict, k: int):
+    # items: book_id -> affinity of one user; skips books they already opened
+    scores = defaultdict(float)
+    for i, w in items.items():
+        for j, sim in neighbours.get(i, ()):
+            if j not in items:
+                scores[j] += w * sim
+    return heapq.nlargest(k, scores.items(), key=lambda kv: (kv[1], -kv[0]))
+
+# --- REFRESH ---
+def _changed_since(db: Session, since: datetime):
+    # (users, books) with new reading time, purchases, or book edits since `since`
+    S = ReadingSessionTable
+    pairs = set(db.query(S.username, S.book_id).filter(or_(S.started_at > since, S.ended_at > since)).distinct())
+    pairs |= set(db.query(PurchaseTable.username, PurchaseTable.book_id).filter(PurchaseTable.purchased_at > since))
+    books = {b for _, b in pairs}
+    books |= {b for (b,) in db.query(BookTable.id).filter(BookTable.updated_at > since)}
+    return {u for u, _ in pairs}, books
+
+def _load_neighbours(db: Session, book_ids):
+    result = defaultdict(list)
+    book_ids = list(book_ids)
+    for start in range(0, len(book_ids), CHUNK):
+        rows = db.query(BookSimilarityTable.book_id, BookSimilarityTable.similar_book_id, BookSimilarityTable.score)\
+            .filter(BookSimilarityTable.book_id.in_(book_ids[start:start + CHUNK]))\
+            .order_by(BookSimilarityTable.book_id, BookSimilarityTable.rank)
+        for book_id, similar_id, score in rows:
+            result[book_id].append((similar_id, score))
+    return result
+
+def _replace_rows(db: Session, table, key_column, keys, rows):
+    keys = list(keys)
+    for start in range(0, len(keys), CHUNK):
+        db.execute(delete(table).where(key_column.in_(keys[start:start + CHUNK])))
+    if rows:
+        db.execute(insert(table), rows)
+
+def refresh(db: Session, full: bool = False, k: int = None, theme_weight: float = None):
+    k = k or config.RECOMMENDATION_TOP_K
+    theme_weight = config.RECOMMENDATION_THEME_WEIGHT if theme_weight is None else theme_weight
+    started = datetime.utcnow()
+    last_run = None if full else db.query(func.max(BookSimilarityTable.computed_at)).scalar()
+
+    weights = load_affinity(db)
+    books = load_books(db)
+    by_user = defaultdict(dict)
+    popularity = defaultdict(float)
+    for (username, book_id), w in weights.items():
+        by_user[username][book_id] = w
+        popularity[book_id] += w
+    by_theme = theme_candidates(books, popularity, 2 * k)
+
+    if last_run is None:
+        sources = set(books) | set(popularity)
+        usernames = set(by_user)
+    else:
+        usernames, touched = _changed_since(db, last_run)
+        readers = {u for u, items in by_user.items() if touched & items.keys()}
+        usernames |= readers
+        sources = set(touched)
+        for username in readers:
+            sources |= by_user[username].keys()
+        sources &= books.keys() | popularity.keys()  # drops deleted books
+
+    neighbours = item_neighbours(weights, books, sources, k, theme_weight, by_theme)
+    _replace_rows(db, BookSimilarityTable, BookSimilarityTable.book_id, sources, [
+        {"book_id": i, "similar_book_id": j, "score": score, "rank": rank, "computed_at": started}
+        for i, pairs in neighbours.items() for rank, (j, score) in enumerate(pairs, start=1)
+    ])
+
+    needed = {b for u in usernames for b in by_user[u]} - neighbours.keys()
+    neighbours.update(_load_neighbours(db, needed))
+    rows = []
+    for username in usernames:
+        for rank, (book_id, score) in enumerate(recommend_for_user(by_user[username], neighbours, k), start=1):
+            rows.append({"username": username, "book_id": book_id, "score": score, "rank": rank, "computed_at": started})
+    popular = heapq.nlargest(k, (b for b in popularity if books.get(b, ("", False))[1]),
+                             key=lambda b: (popularity[b], -b))
+    rows += [{"username": POPULAR_KEY, "book_id": b, "score": popularity[b], "rank": rank, "computed_at": started}
+             for rank, b in enumerate(popular, start=1)]
+    _replace_rows(db, UserRecommendationTable, UserRecommendationTable.username, usernames | {POPULAR_KEY}, rows)
+    db.commit()
+    return {
+        "mode": "full" if last_run is None else "incremental",
+        "engine": "numpy" if np is not None else "python",
+        "books": len(sources),
+        "users": len(usernames),
+    }
+
+def get_recommendations(db: Session, username: str, limit: int):
+    # personal rows first, the most-read books for users without any
+    R = UserRecommendationTable
+    for key in (username, POPULAR_KEY):
+        rows = db.query(
+            BookTable.id, BookTable.title, BookTable.author, BookTable.theme,
+            BookTable.price, BookTable.is_premium, R.score,
+        ).join(BookTable, BookTable.id == R.book_id)\
+            .filter(R.username == key, BookTable.status == "approved")\
+            .order_by(R.rank)\
+            .limit(limit)\
+            .all()
+        if rows:
+            return {"source": "personal" if key == username else "popular", "books": [dict(r._mapping) for r in rows]}
+    return {"source": "popular", "books": []}
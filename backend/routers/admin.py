@@ -1,48 +1,202 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, or_
 from sqlalchemy.orm import Session
-from typing import List
-from database import get_db
+from datetime import datetime
+import string
+from typing import List, Optional
+from database import SessionLocal, get_db
 from tables import BookTable, UserTable
-from models import UserResponse
-from crud import require_role
+from models import AdminBook, BatchModeration, BookListPage, UserPage
+from crud import require_role, delete_book_content, delete_books_content
+from pagination import decode_cursor, split_page
+from routers.auth import principal_cache
+from entitlements import entitlement_cache
+from session_events import session_events
+from http_cache import response_cache
+from cache import TTLCache
+import config
+import counters
+import exports
+import storage
 
 router = APIRouter()
 
 # --- ADMIN DASHBOARD STATS ---
+# read from the counters table (see counters.py), no table scans
 @router.get("/summary")
 def admin_summary(current_user: dict = Depends(require_role("admin")), db: Session = Depends(get_db)):
-    total_books = db.query(BookTable).count()
-    pending_books = db.query(BookTable).filter(BookTable.status == "pending").count()
-    total_users = db.query(UserTable).count()
+    books = counters.status_counts(db)
+    total_users = counters.get_many(db, ["users"])["users"]
     
     return {
         "stats": {
-            "total_books": total_books, 
-            "pending_books": pending_books, 
+            "total_books": books["total"], 
+            "pending_books": books["pending"], 
             "total_users": total_users
         }
     }
 
+# --- CONTENT STORAGE ---
+@router.get("/storage")
+def storage_report(current_user: dict = Depends(require_role("admin")), db: Session = Depends(get_db)):
+    return storage.content_report(db)
+
+# --- CACHE STATS ---
+@router.get("/cache")
+def cache_stats(current_user: dict = Depends(require_role("admin"))):
+    return {
+        "principals": principal_cache.stats(),
+        "entitlements": entitlement_cache.stats(),
+        "responses": response_cache.stats(),
+        "user_counts": user_count_cache.stats(),
+    }
+
+# --- WRITE-BEHIND QUEUE (batch sizes, lag) ---
+@router.get("/session-events")
+def session_event_stats(current_user: dict = Depends(require_role("admin"))):
+    return session_events.stats()
+
 # --- MANAGE USERS ---
-@router.get("/users", response_model=List[UserResponse])
-def get_all_users(current_user: dict = Depends(require_role("admin")), db: Session = Depends(get_db)):
-    users = db.query(UserTable).all()
-    return users
+# Keyset on id (ix_users_role_id when filtered by role). q is a
+# case-insensitive prefix of the name or email, matched as a range on the
+# lower(name) / lower(email) indexes. The unfiltered total is the users
+# counter; filtered totals are counted once per USER_COUNT_CACHE_SECONDS.
+# SQLite's lower() only folds A-Z, so on SQLite the search term is folded
+# the same way and other letters match case-sensitively.
+user_count_cache = TTLCache(1000, config.USER_COUNT_CACHE_SECONDS)
+ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+def fold_case(db: Session, value: str):
+    return value.translate(ASCII_LOWER) if db.get_bind().dialect.name == "sqlite" else value.lower()
+
+def prefix_range(column, prefix: str):
+    value = func.lower(column)
+    return (value >= prefix) & (value < prefix + "\U0010ffff")
+
+@router.get("/users", response_model=UserPage)
+def get_all_users(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    role: Optional[str] = Query(None, pattern="^(user|creator|admin)$"),
+    q: Optional[str] = Query(None, max_length=100),
+    current_user: dict = Depends(require_role("admin")),
+    db: Session = Depends(get_db),
+):
+    q = fold_case(db, (q or "").strip())
+    query = db.query(UserTable)
+    if role:
+        query = query.filter(UserTable.role == role)
+    if q:
+        query = query.filter(or_(prefix_range(UserTable.name, q), prefix_range(UserTable.email, q)))
+
+    if role or q:
+        total = user_count_cache.get((role, q))
+        if total is None:
+            total = query.with_entities(func.count(UserTable.id)).scalar()
+            user_count_cache.set((role, q), total)
+    else:
+        total = counters.get_many(db, ["users"])["users"]
+
+    if cursor:
+        (last_id,) = decode_cursor(cursor, int)
+        query = query.filter(UserTable.id > last_id)
+    rows, next_cursor = split_page(query.order_by(UserTable.id).limit(limit + 1).all(), limit, lambda u: (u.id,))
+    return {"users": rows, "next_cursor": next_cursor, "total": total, "total_is_estimate": bool(role or q)}
+
+# --- STREAMING EXPORTS (constant memory; resume with after=<last id>) ---
+@router.get("/export/{name}")
+def export_table(
+    name: str,
+    format: str = Query("ndjson", pattern="^(csv|ndjson)$"),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    after: Optional[int] = Query(None, ge=0),
+    current_user: dict = Depends(require_role("admin")),
+):
+    if name not in exports.EXPORTS:
+        raise HTTPException(status_code=404, detail=f"Unknown export, use one of: {', '.join(exports.EXPORTS)}")
+    if (since or until) and exports.EXPORTS[name][2] is None:
+        raise HTTPException(status_code=400, detail=f"{name} cannot be filtered by date")
+
+    # the generator outlives the request, so it opens its own session
+    def rows():
+        db = SessionLocal()
+        try:
+            yield from exports.stream_rows(db, name, format, since=since, until=until, after=after)
+        finally:
+            db.close()
+
+    return StreamingResponse(
+        rows(),
+        media_type="text/csv; charset=utf-8" if format == "csv" else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{name}.{format}"'},
+    )
 
 # --- MANAGE BOOKS (ALL) ---
-@router.get("/books")
-def get_all_books_admin(current_user: dict = Depends(require_role("admin")), db: Session = Depends(get_db)):
-    books = db.query(BookTable).all()
+ADMIN_PREVIEW_CHARS = 100
+
+def admin_book_columns():
+    # metadata plus the first characters of the stored preview, cut in SQL
     return [
-        
-            {
-                "id": b.id, "title": b.title, "author": b.author, 
-                "price": b.price, "is_premium": b.is_premium, 
-                "status": b.status, "content": b.content[:100] + "..." # Preview only
-            } 
-            for b in books
-        
+        BookTable.id, BookTable.title, BookTable.author, BookTable.theme,
+        BookTable.price, BookTable.is_premium, BookTable.status, BookTable.creator_id,
+        func.substr(func.coalesce(BookTable.preview, ""), 1, ADMIN_PREVIEW_CHARS).label("preview"),
+    ]
+
+@router.get("/books", response_model=List[AdminBook])
+def get_all_books_admin(current_user: dict = Depends(require_role("admin")), db: Session = Depends(get_db)):
+    books = db.query(*admin_book_columns()).all()
+    return [{**b._mapping, "content": b.preview + "..."} for b in books]
+
+# --- PENDING QUEUE (oldest first, keyset on ix_books_status_id) ---
+@router.get("/books/pending", response_model=BookListPage)
+def get_pending_books(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(require_role("admin")),
+    db: Session = Depends(get_db),
+):
+    query = db.query(*admin_book_columns()).filter(BookTable.status == "pending")
+    if cursor:
+        (last_id,) = decode_cursor(cursor, int)
+        query = query.filter(BookTable.id > last_id)
+    rows, next_cursor = split_page(query.order_by(BookTable.id).limit(limit + 1).all(), limit, lambda b: (b.id,))
+    return {"books": [dict(b._mapping) for b in rows], "next_cursor": next_cursor}
+
+# --- BATCH MODERATION ---
+# One UPDATE (or one DELETE per table) for the whole selection; every
+# requested id gets its own result.
+@router.post("/books/batch")
+def moderate_books(body: BatchModeration, current_user: dict = Depends(require_role("admin")), db: Session = Depends(get_db)):
+    ids = list(dict.fromkeys(body.ids))
+    found = {book_id for (book_id,) in db.query(BookTable.id).filter(BookTable.id.in_(ids))}
+    if found:
+        matched = db.query(BookTable).filter(BookTable.id.in_(found))
+        # set-based statements skip the ORM hooks, so counters get the deltas here
+        before = db.query(BookTable.creator_id, BookTable.status, func.count(BookTable.id))\
+            .filter(BookTable.id.in_(found))\
+            .group_by(BookTable.creator_id, BookTable.status)\
+            .all()
+        deltas = counters.book_deltas(before, -1)
+        if body.action == "delete":
+            delete_books_content(db, found)
+            matched.delete(synchronize_session=False)
+        else:
+            status = "approved" if body.action == "approve" else "rejected"
+            matched.update({BookTable.status: status}, synchronize_session=False)
+            deltas.update(counters.book_deltas([(creator, status, n) for creator, _, n in before], 1))
+        deltas[counters.CATALOG_VERSION] += 1
+        counters.add(db.connection(), deltas)
+        db.commit()
+
+    done = {"approve": "approved", "reject": "rejected", "delete": "deleted"}[body.action]
+    results = [
+        {"id": book_id, "ok": True, "result": done} if book_id in found
+        else {"id": book_id, "ok": False, "error": "Book not found"}
+        for book_id in ids
     ]
+    return {"action": body.action, "updated": len(found), "results": results}
 
 # --- ACTIONS ---
 @router.post("/books/{book_id}/approve")
@@ -68,6 +222,7 @@ def delete_book_admin(book_id: int, current_user: dict = Depends(require_role("a
     book = db.query(BookTable).filter(BookTable.id == book_id).first()
     if not book: raise HTTPException(404, "Book not found")
     
+    delete_book_content(db, book_id)
     db.delete(book)
     db.commit()
     return {"message": "Book deleted permanently"}
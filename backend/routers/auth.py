@@ -1,11 +1,18 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import event, inspect, select
 from sqlalchemy.orm import Session
 import secrets
 
+import config
+import entitlements
+import signed_tokens
+from cache import TTLCache
 from database import get_db
 from dependencies import oauth2_scheme
+from models import LogoutRequest, RefreshRequest
 from tables import UserTable
+from token_store import token_store
 
 router = APIRouter()
 
@@ -14,7 +21,6 @@ default_users = {
     "creator": {"password": "creator", "role": "creator"},
     "user": {"password": "user", "role": "user"},
 }
-active_tokens: dict[str, str] = {} 
 
 def authenticate_user(username: str, password: str, db: Session):
     if username in default_users and default_users[username]["password"] == password:
@@ -29,35 +35,110 @@ def authenticate_user(username: str, password: str, db: Session):
 
     return None
 
+# username -> role, so repeat requests skip the UserTable lookup
+principal_cache = TTLCache(maxsize=config.PRINCIPAL_CACHE_MAX_ENTRIES, ttl=config.PRINCIPAL_CACHE_TTL_SECONDS)
+
+def role_query(username: str):
+    return select(UserTable.role).where(UserTable.user_id == username)
+
+def cached_principal(username: str):
+    # None on a cache miss: the caller looks the role up with role_query
+    if username in default_users:
+        return {"username": username, "role": default_users[username]["role"]}
+    role = principal_cache.get(username)
+    return {"username": username, "role": role} if role is not None else None
+
+def remember_principal(username: str, role):
+    if role is None:
+        return None
+    principal_cache.set(username, role)
+    return {"username": username, "role": role}
+
+def load_principal(username: str, db: Session):
+    return cached_principal(username) or remember_principal(username, db.execute(role_query(username)).scalar())
+
+def invalidate_principal(username: str):
+    principal_cache.pop(username)
+
+@event.listens_for(UserTable, "after_update")
+@event.listens_for(UserTable, "after_delete")
+def _user_changed(mapper, connection, target):
+    # drop the old user_id too if it was renamed
+    history = inspect(target).attrs.user_id.history
+    for username in {target.user_id, *history.deleted}:
+        invalidate_principal(username)
+
+def issue_signed_tokens(username: str, role: str):
+    refresh_token = signed_tokens.new_refresh_token()
+    token_store.issue(signed_tokens.REFRESH_PREFIX + refresh_token, username)
+    return {
+        "access_token": signed_tokens.create_access_token(username, role),
+        "refresh_token": refresh_token,
+        "expires_in": config.ACCESS_TOKEN_TTL_SECONDS,
+    }
+
 @router.post("/login")
 def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     user = authenticate_user(form_data.username, form_data.password, db)
     if not user:
         raise HTTPException(status_code=401, detail="Wrong credentials")
     
-    token = secrets.token_urlsafe(32)
-    active_tokens[token] = user["username"]
+    # warm the paywall cache for this user
+    entitlements.load_entitlements(db, user["username"])
+
+    if config.AUTH_TOKEN_MODE == "signed":
+        tokens = issue_signed_tokens(user["username"], user["role"])
+    else:
+        token = secrets.token_urlsafe(32)
+        token_store.issue(token, user["username"])
+        tokens = {"access_token": token, "expires_in": config.TOKEN_TTL_SECONDS}
     
     return {
-        "access_token": token, 
+        **tokens,
         "token_type": "bearer", 
         "username": user["username"], # Keep this as unique ID
         "role": user["role"],
         "name": user["name"]          # <--- SEND NAME TO FRONTEND
     }
 
+# signed mode: trade a refresh token for a new access token (the refresh token rotates)
+@router.post("/refresh")
+def refresh(body: RefreshRequest, db: Session = Depends(get_db)):
+    # consumed atomically: two concurrent calls can't both redeem it
+    username = token_store.consume(signed_tokens.REFRESH_PREFIX + body.refresh_token)
+    principal = load_principal(username, db) if username else None
+    if not principal:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Session expired. Please login again.")
+    return {**issue_signed_tokens(principal["username"], principal["role"]), "token_type": "bearer", "role": principal["role"]}
+
+@router.post("/logout")
+def logout(body: LogoutRequest | None = None, token: str | None = Depends(oauth2_scheme)):
+    if token and signed_tokens.is_signed(token):
+        claims = signed_tokens.verify_access_token(token)
+        if claims:
+            signed_tokens.revoke_access_token(claims)
+    elif token:
+        token_store.revoke(token)
+    if body and body.refresh_token:
+        token_store.revoke(signed_tokens.REFRESH_PREFIX + body.refresh_token)
+    return {"message": "Logged out"}
+
 def get_current_user(token: str | None = Depends(oauth2_scheme), db: Session = Depends(get_db)):
     if not token:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="please register/login to view")
-    username = active_tokens.get(token)
+    # signed tokens carry the role: no user lookup, only the revocation check
+    if signed_tokens.is_signed(token):
+        claims = signed_tokens.verify_access_token(token)
+        if not claims:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Session expired. Please login again.")
+        return {"username": claims["sub"], "role": claims["role"]}
+    username = token_store.get(token)
     if not username:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Session expired. Please login again.")
-    if username in default_users:
-        return {"username": username, "role": default_users[username]["role"]}
-    user = db.query(UserTable).filter(UserTable.user_id == username).first()
-    if not user:
+    principal = load_principal(username, db)
+    if not principal:
         raise HTTPException(status_code=401, detail="User not found")
-    return {"username": user.user_id, "role": user.role}
+    return principal
 
 def require_role(role: str):
     def checker(current_user: dict = Depends(get_current_user)):
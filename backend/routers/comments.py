@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import and_, literal, or_, select
 from sqlalchemy.orm import Session
 from models import CommentCreate, CommentResponse
 from database import get_db
@@ -7,26 +8,89 @@ from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime
 from crud import get_current_user
+from pagination import decode_cursor, split_page
+import counters
+import http_cache
 
 router = APIRouter()
 
+# Whole thread in one round trip: a recursive CTE walks down from one page
+# of top-level comments, authors are joined in, and the tree is assembled
+# in memory. Threads are cached per comment version of the book, which
+# every new or deleted comment bumps.
 @router.get("/{book_id}", response_model=List[CommentResponse])
-def get_comments(book_id: int, db: Session = Depends(get_db)):
-    comments = db.query(CommentTable).filter(
-        CommentTable.book_id == book_id, 
-        CommentTable.parent_id == None
-    ).order_by(CommentTable.created_at.desc()).all()
-    
-    def map_comment(c):
-        return {
-            "id": c.id,
-            "user_name": c.user.name if c.user else "Unknown",
-            "content": c.content,
-            "created_at": c.created_at,
-            "replies": [map_comment(r) for r in c.replies]
+def get_comments(
+    book_id: int,
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=200),
+    cursor: Optional[str] = None,
+    max_depth: int = Query(20, ge=0, le=50),
+    db: Session = Depends(get_db),
+):
+    version_key = counters.comments_version_key(book_id)
+    version = counters.get_many(db, [version_key])[version_key]
+    not_modified = http_cache.conditional(request, response, http_cache.etag("comments", book_id, version))
+    if not_modified:
+        return not_modified
+    roots, next_cursor = http_cache.cached(
+        ("comments", book_id, version, limit, cursor, max_depth),
+        lambda: _comment_page(db, book_id, limit, cursor, max_depth),
+    )
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return roots
+
+def _comment_page(db: Session, book_id: int, limit: Optional[int], cursor: Optional[str], max_depth: int):
+    rows = db.execute(comment_tree_query(book_id, limit, cursor, max_depth)).all()
+    return comment_tree(rows, limit)
+
+# statement and tree assembly are shared with the async handler (async_routes.py)
+def comment_tree_query(book_id: int, limit: Optional[int], cursor: Optional[str], max_depth: int):
+    C = CommentTable
+    top_level = select(C.id).where(C.book_id == book_id, C.parent_id.is_(None))
+    if cursor:
+        last_created, last_id = decode_cursor(cursor, datetime, int)
+        top_level = top_level.where(or_(
+            C.created_at < last_created,
+            and_(C.created_at == last_created, C.id < last_id),
+        ))
+    top_level = top_level.order_by(C.created_at.desc(), C.id.desc())
+    if limit:
+        top_level = top_level.limit(limit + 1)
+
+    tree = select(C.id, literal(0).label("depth")).where(C.id.in_(top_level)).cte("tree", recursive=True)
+    tree = tree.union_all(
+        select(C.id, tree.c.depth + 1).join(tree, C.parent_id == tree.c.id).where(tree.c.depth < max_depth)
+    )
+    return select(C.id, C.parent_id, C.content, C.created_at, tree.c.depth, UserTable.name)\
+        .join(tree, tree.c.id == C.id)\
+        .outerjoin(UserTable, UserTable.user_id == C.user_id)\
+        .order_by(C.created_at, C.id)
+
+def comment_tree(rows, limit: Optional[int]):
+    nodes = {}
+    roots = []
+    for r in rows:
+        nodes[r.id] = {
+            "id": r.id,
+            "user_name": r.name or "Unknown",
+            "content": r.content,
+            "created_at": r.created_at,
+            "replies": [],
         }
-    
-    return [map_comment(c) for c in comments]
+    for r in rows:
+        if r.depth == 0:
+            roots.append(nodes[r.id])
+        elif r.parent_id in nodes:
+            nodes[r.parent_id]["replies"].append(nodes[r.id])
+        # else: its parent isn't in this result (deleted or cut off), leave it out
+    roots.reverse()  # newest thread first
+
+    next_cursor = None
+    if limit:
+        roots, next_cursor = split_page(roots, limit, lambda c: (c["created_at"], c["id"]))
+    return roots, next_cursor
 
 # @router.post("")
 @router.post("/")
@@ -1,50 +1,63 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
 from sqlalchemy.orm import Session
+from typing import Optional
 from database import get_db
 from tables import BookTable
-from models import BookCreate, BookUpdate
-from crud import require_role
+from models import BookCreate, BookListPage, BookUpdate, CreatorAnalytics
+from crud import get_current_user, require_role, sync_book_content
+import analytics
+import bulk_import
+import counters
+from pagination import decode_cursor, split_page
 
 router = APIRouter()
 
 # --- DASHBOARD / SUMMARY ---
+# counts come from the counters table; the books are listed by /my-books
 @router.get("/summary")
 def creator_summary(current_user: dict = Depends(require_role("creator")), db: Session = Depends(get_db)):
-    my_books = db.query(BookTable).filter(BookTable.creator_id == current_user["username"]).all()
-    
-    total_books = len(my_books)
-    pending = sum(1 for b in my_books if b.status == "pending")
-    approved = sum(1 for b in my_books if b.status == "approved")
-    rejected = sum(1 for b in my_books if b.status == "rejected")
-
-    # Return stats + list of books for the dashboard
     return {
         "page": "creator",
         "current_user": current_user,
-        "stats": {
-            "total": total_books,
-            "pending": pending,
-            "approved": approved,
-            "rejected": rejected
-        },
-        # We include the books list here so dashboard can show them immediately
-        "books": [
-            {
-                "id": b.id, "title": b.title, "author": b.author, 
-                "price": b.price, "is_premium": b.is_premium, 
-                "status": b.status, "content": b.content  # Send content so they can edit
-            } 
-            for b in my_books
-        ]
+        "stats": counters.status_counts(db, current_user["username"]),
     }
 
+# --- MY BOOKS (metadata and preview only, keyset by id) ---
+@router.get("/my-books", response_model=BookListPage)
+def list_my_books(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    status: Optional[str] = Query(None, pattern="^(pending|approved|rejected)$"),
+    current_user: dict = Depends(require_role("creator")),
+    db: Session = Depends(get_db),
+):
+    query = db.query(
+        BookTable.id, BookTable.title, BookTable.author, BookTable.theme,
+        BookTable.price, BookTable.is_premium, BookTable.status, BookTable.preview,
+    ).filter(BookTable.creator_id == current_user["username"])
+    if status:
+        query = query.filter(BookTable.status == status)
+    if cursor:
+        (last_id,) = decode_cursor(cursor, int)
+        query = query.filter(BookTable.id > last_id)
+    rows, next_cursor = split_page(query.order_by(BookTable.id).limit(limit + 1).all(), limit, lambda b: (b.id,))
+    return {"books": [dict(b._mapping) for b in rows], "next_cursor": next_cursor}
+
+# --- PER-BOOK ANALYTICS (cached until the creator's books get new activity) ---
+@router.get("/analytics", response_model=CreatorAnalytics)
+def get_creator_analytics(
+    days: int = Query(30, ge=1, le=365),
+    current_user: dict = Depends(require_role("creator")),
+    db: Session = Depends(get_db),
+):
+    return analytics.creator_analytics(db, current_user["username"], days)
+
 # --- CREATE BOOK ---
 @router.post("/books/")
 def create_book(book: BookCreate, current_user: dict = Depends(require_role("creator")), db: Session = Depends(get_db)):
     db_book = BookTable(
         title=book.title,
         author=book.author,
-        content=book.content,
         price=book.price,
         is_premium=book.is_premium,
         status="pending",
@@ -52,6 +65,8 @@ def create_book(book: BookCreate, current_user: dict = Depends(require_role("cre
         creator_id=current_user["username"]
     )
     db.add(db_book)
+    db.flush()
+    sync_book_content(db, db_book, book.content)
     db.commit()
     db.refresh(db_book)
     return {"message": "Book created successfully! Sent to Admin for approval.", "book_id": db_book.id}
@@ -70,7 +85,6 @@ def update_book(book_id: int, book: BookUpdate, current_user: dict = Depends(req
     # Update fields
     db_book.title = book.title
     db_book.author = book.author
-    db_book.content = book.content
     db_book.price = book.price
     db_book.is_premium = book.is_premium
     
@@ -80,5 +94,40 @@ def update_book(book_id: int, book: BookUpdate, current_user: dict = Depends(req
         db_book.theme = book.theme 
     db_book.status = "pending" 
     
+    sync_book_content(db, db_book, book.content)
     db.commit()
     return {"message": "Book updated! Status reset to Pending for review."}
+
+# --- BULK IMPORT (NDJSON / CSV / EPUB) ---
+# Creators import into their own pending queue; admins import approved books
+# and may set creator_id per row. Failed rows come back with their record
+# number; re-send them, or resume a cut-off upload with start_at.
+MAX_REPORTED_FAILURES = 100
+
+@router.post("/books/import")
+def import_books(
+    file: UploadFile = File(...),
+    fmt: Optional[str] = Query(None, alias="format", pattern="^(ndjson|csv|epub)$"),
+    start_at: int = Query(1, ge=1),
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    if current_user["role"] not in ("creator", "admin"):
+        raise HTTPException(status_code=403, detail="Only creators and admins can import books")
+    fmt = fmt or bulk_import.detect_format(file.filename)
+    if fmt is None:
+        raise HTTPException(status_code=400, detail="Unknown file type, pass format=ndjson|csv|epub")
+
+    is_admin = current_user["role"] == "admin"
+    failures = []
+    result = bulk_import.import_books(
+        db, bulk_import.read_records(fmt, file.file), current_user["username"],
+        status="approved" if is_admin else "pending",
+        start_at=start_at, allow_creator=is_admin,
+        on_failure=lambda f: len(failures) < MAX_REPORTED_FAILURES and failures.append(
+            {"record": f["record"], "error": f["error"]}),
+    )
+    # no FTS optimize / ANALYZE here: both scale with the whole database,
+    # they run from python manage.py import-books or optimize-db
+    return {**result, "failures": failures}
+
@@ -1,193 +1,320 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, func, or_, select
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
-from database import get_db
-from tables import BookTable, ReadingSessionTable, UserProgressTable, UserTable
-from crud import get_current_user
-from models import BookCreate, StopReadingBody, Payment
-from datetime import datetime,date
+from database import SessionLocal, get_db
+from tables import BookTable, PurchaseTable, ReadingSessionTable, UserProgressTable, UserTable
+from crud import get_current_user, sync_book_content
+from models import BookCreate, BookDetail, BookPage, BookResponse, CatalogPage, DashboardResponse, RecommendationsResponse, StopReadingBody, Payment, TrendingResponse
+from pagination import decode_cursor, split_page
+from session_events import Event, record_event, session_events
+import counters
+import entitlements
+import http_cache
+import reader
+import recommendations
+import search
+import stats
+import trending
+import config
+from datetime import datetime, date
 
 router = APIRouter()
 
-@router.get("/summary")
-def get_creator_summary(current_user: dict = Depends(get_current_user), db: Session = Depends(get_db)):
-    if current_user["role"] != "creator":
-        raise HTTPException(status_code=403, detail="Not authorized")
-    
-    books = db.query(BookTable).filter(BookTable.creator_id == current_user["username"]).all()
-    
-    total = len(books)
-    approved = len([b for b in books if b.status == "approved"])
-    pending = len([b for b in books if b.status == "pending"])
-    rejected = len([b for b in books if b.status == "rejected"])
-    
-    return {
-        "stats": {
-            "total": total,
-            "approved": approved,
-            "pending": pending,
-            "rejected": rejected
-        },
-        "books": books
-    }
+# Listing columns only -- the catalog never loads book content
+CATALOG_COLUMNS = [
+    BookTable.id, BookTable.title, BookTable.author,
+    BookTable.theme, BookTable.price, BookTable.is_premium,
+]
 
 # --- CRITICAL FIX: Include Purchased Books in Dashboard ---
-@router.get("/dashboard")
+# Fixed number of queries, all aggregation done in SQL.
+@router.get("/dashboard", response_model=DashboardResponse)
 def get_user_dashboard(current_user: dict = Depends(get_current_user), db: Session = Depends(get_db)):
-    user = db.query(UserTable).filter(UserTable.user_id == current_user["username"]).first()
-    if not user:
+    username = current_user["username"]
+    queries = dashboard_queries(username)
+    user_name = db.execute(queries["name"]).scalar()
+    if user_name is None:
         raise HTTPException(status_code=404, detail="User not found")
+    return dashboard_body(
+        user_name,
+        db.execute(queries["viewed"]).scalar(),
+        db.execute(queries["purchased"]).all(),
+        stats.reading_summary(db, username, date.today()),
+        db.execute(queries["recent"]).all(),
+    )
 
-    # 1. Total Purchased
-    purchases = db.query(UserProgressTable).filter(
-        UserProgressTable.username == current_user["username"], 
-        UserProgressTable.action_type == "buy"
-    ).all()
-    
-    # 2. Purchased Book Details
-    purchased_book_ids = [p.book_id for p in purchases]
-    purchased_books_details = db.query(BookTable).filter(BookTable.id.in_(purchased_book_ids)).all()
-
-    # 3. Reading Stats (ALL TIME)
-    all_sessions = db.query(ReadingSessionTable).filter(
-        ReadingSessionTable.username == current_user["username"]
-    ).all()
-    total_seconds_all_time = sum(s.duration_seconds for s in all_sessions if s.duration_seconds)
-    
-    # --- NEW: Reading Stats (TODAY ONLY) ---
-    today_date = date.today() # Gets YYYY-MM-DD
-    
-    today_sessions = [
-        s for s in all_sessions 
-        if s.started_at and s.started_at.date() == today_date
-    ]
-    
-    # Sum seconds for today's sessions
-    today_seconds = sum(s.duration_seconds for s in today_sessions if s.duration_seconds)
-
-    # 4. View Count
-    viewed_count = db.query(UserProgressTable).filter(
-        UserProgressTable.username == current_user["username"], 
-        UserProgressTable.action_type == "read"
-    ).count()
-
-    # 5. Recent Activity
-    recent_sessions = db.query(ReadingSessionTable)\
-        .filter(ReadingSessionTable.username == current_user["username"])\
-        .order_by(ReadingSessionTable.started_at.desc())\
-        .limit(10)\
-        .all()
-        
-    recent_data = []
-    for s in recent_sessions:
-        book = db.query(BookTable).filter(BookTable.id == s.book_id).first()
-        if book:
-            recent_data.append({
-                "title": book.title,
-                "author": book.author,
-                "duration_seconds": s.duration_seconds,
-                "ended_at": s.ended_at
-            })
+# statements are shared with the async handlers (async_routes.py)
+def dashboard_queries(username: str):
+    return {
+        "name": select(UserTable.name).where(UserTable.user_id == username),
+        # 1. View count
+        "viewed": select(func.count(UserProgressTable.id)).where(
+            UserProgressTable.username == username,
+            UserProgressTable.action_type == "read",
+        ),
+        # 2. Purchased Book Details (metadata only)
+        "purchased": select(*CATALOG_COLUMNS)
+            .join(PurchaseTable, PurchaseTable.book_id == BookTable.id)
+            .where(PurchaseTable.username == username)
+            .order_by(PurchaseTable.id),
+        # 3. Reading Stats come from the reading_stats_* rollups (stats.py)
+        # 4. Recent Activity, titles joined in
+        "recent": select(
+            BookTable.title, BookTable.author,
+            ReadingSessionTable.duration_seconds, ReadingSessionTable.ended_at,
+        ).join(BookTable, BookTable.id == ReadingSessionTable.book_id)
+            .where(ReadingSessionTable.username == username)
+            .order_by(ReadingSessionTable.started_at.desc())
+            .limit(10),
+    }
 
+def dashboard_body(user_name, total_viewed, purchased_books, reading, recent_sessions):
     return {
-        "name": user.name,
-        "total_purchased": len(purchases),
-        "purchased_books": purchased_books_details,
-        "total_viewed": viewed_count,
-        "total_reading_seconds": total_seconds_all_time, # Keep for total stats
-        "today_reading_seconds": today_seconds,          # <--- NEW FIELD FOR GOAL
-        "recent_reading": recent_data
+        "name": user_name,
+        "total_purchased": len(purchased_books),
+        "purchased_books": [dict(b._mapping) for b in purchased_books],
+        "total_viewed": total_viewed,
+        "total_reading_seconds": reading["total"], # Keep for total stats
+        "today_reading_seconds": reading["today"], # <--- NEW FIELD FOR GOAL
+        "week_reading_seconds": reading["week"],
+        "month_reading_seconds": reading["month"],
+        "recent_reading": [dict(s._mapping) for s in recent_sessions]
     }
 
-@router.get("/books")
-def get_all_approved_books(current_user: dict = Depends(get_current_user), db: Session = Depends(get_db)):
-    return db.query(BookTable).filter(BookTable.status == "approved").all()
+# precomputed by python manage.py build-recommendations (see recommendations.py)
+@router.get("/recommendations", response_model=RecommendationsResponse)
+def get_recommendations(
+    limit: int = Query(10, ge=1, le=50),
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    return recommendations.get_recommendations(db, current_user["username"], limit)
 
-@router.get("/books/{book_id}")
-def get_book_details(book_id: int, current_user: dict = Depends(get_current_user), db: Session = Depends(get_db)):
-    book = db.query(BookTable).filter(BookTable.id == book_id).first()
+# decayed read/purchase/comment counts, ranked at most once a minute (see trending.py)
+@router.get("/trending", response_model=TrendingResponse)
+def get_trending(
+    window: str = Query("week", pattern="^(day|week|month)$"),
+    limit: int = Query(10, ge=1, le=100),
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    return {"window": window, "books": trending.trending_books(db, window, limit)}
+
+@router.get("/themes/{theme}/trending", response_model=TrendingResponse)
+def get_trending_in_theme(
+    theme: str,
+    window: str = Query("week", pattern="^(day|week|month)$"),
+    limit: int = Query(10, ge=1, le=100),
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    return {"window": window, "theme": theme, "books": trending.trending_books(db, window, limit, theme)}
+
+@router.get("/books", response_model=CatalogPage)
+def get_all_approved_books(
+    request: Request,
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    sort: str = Query("id", pattern="^(id|title)$"),
+    include_preview: bool = False,
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    # same listing for every user; its version moves with any book write
+    version = counters.get_many(db, [counters.CATALOG_VERSION])[counters.CATALOG_VERSION]
+    not_modified = http_cache.conditional(request, response, http_cache.etag("catalog", version))
+    if not_modified:
+        return not_modified
+    key = ("catalog", version, limit, cursor, sort, include_preview)
+    return http_cache.cached(key, lambda: _catalog_page(db, limit, cursor, sort, include_preview))
+
+def _catalog_page(db: Session, limit: int, cursor: Optional[str], sort: str, include_preview: bool):
+    query, key = catalog_query(limit, cursor, sort, include_preview)
+    return catalog_body(db.execute(query).all(), limit, key)
+
+def catalog_query(limit: int, cursor: Optional[str], sort: str, include_preview: bool):
+    # the statement for one page (limit + 1 rows) and its cursor key
+    columns = CATALOG_COLUMNS + ([BookTable.preview] if include_preview else [])
+    query = select(*columns).where(BookTable.status == "approved")
+
+    # Keyset pagination, served by ix_books_status_id / ix_books_status_title_id
+    if sort == "title":
+        if cursor:
+            last_title, last_id = decode_cursor(cursor, str, int)
+            query = query.where(or_(
+                BookTable.title > last_title,
+                and_(BookTable.title == last_title, BookTable.id > last_id),
+            ))
+        query = query.order_by(BookTable.title, BookTable.id)
+        key = lambda b: (b.title, b.id)
+    else:
+        if cursor:
+            (last_id,) = decode_cursor(cursor, int)
+            query = query.where(BookTable.id > last_id)
+        query = query.order_by(BookTable.id)
+        key = lambda b: (b.id,)
+    return query.limit(limit + 1), key
+
+def catalog_body(rows, limit: int, key):
+    rows, next_cursor = split_page(rows, limit, key)
+    return {
+        "books": [dict(row._mapping) for row in rows],
+        "next_cursor": next_cursor,
+    }
+
+@router.get("/books/search")
+def search_approved_books(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=1000),
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    # fetch one extra hit to know whether there is a next page
+    hits = search.search_books(db, q, limit + 1, offset)
+    return {
+        "results": hits[:limit],
+        "next_offset": offset + limit if len(hits) > limit else None,
+    }
+
+@router.get("/books/{book_id}", response_model=BookDetail)
+def get_book_details(book_id: int, request: Request, response: Response, current_user: dict = Depends(get_current_user), db: Session = Depends(get_db)):
+    # If premium, check if user bought it (before any 304)
+    book = get_readable_book(book_id, current_user, db)
+    not_modified = conditional_book(request, response, book, "book")
+    if not_modified:
+        return not_modified
+
+    def build():
+        full = db.query(BookTable).filter(BookTable.id == book_id).first()
+        return {
+            "id": full.id, "title": full.title, "author": full.author,
+            "theme": full.theme, "price": full.price, "is_premium": full.is_premium,
+            "status": full.status, "creator_id": full.creator_id,
+            "content": reader.read_content(db, full.id),
+        }
+    return http_cache.cached(("book", book_id, book.revision), build)
+
+def readable_book_query(book_id: int):
+    # metadata only -- page reads never load the whole content
+    return select(BookTable.id, BookTable.is_premium, BookTable.creator_id, BookTable.status,
+                  BookTable.revision, BookTable.updated_at)\
+        .where(BookTable.id == book_id)
+
+def get_readable_book(book_id: int, current_user: dict, db: Session):
+    book = db.execute(readable_book_query(book_id)).first()
     if not book:
         raise HTTPException(status_code=404, detail="Book not found")
-    
-    # If premium, check if user bought it
-    if book.is_premium:
-        has_bought = db.query(UserProgressTable).filter(
-            UserProgressTable.username == current_user["username"],
-            UserProgressTable.book_id == book_id,
-            UserProgressTable.action_type == "buy"
-        ).first()
-        
-        if not has_bought and current_user["role"] != "admin" and current_user["username"] != book.creator_id:
-            raise HTTPException(status_code=402, detail="Payment required to read this book")
-            
+    reader.ensure_can_read(db, book, current_user)
     return book
 
+def conditional_book(request: Request, response: Response, book, kind: str, *extra):
+    # premium and unpublished books are revalidated on every use
+    revalidate = book.is_premium or book.status != "approved"
+    tag = http_cache.etag(kind, book.id, book.revision or 0, *extra)
+    return http_cache.conditional(request, response, tag, book.updated_at, revalidate=revalidate)
+
+@router.get("/books/{book_id}/pages/{page_no}", response_model=BookPage)
+def get_book_page(book_id: int, page_no: int, request: Request, response: Response, current_user: dict = Depends(get_current_user), db: Session = Depends(get_db)):
+    book = get_readable_book(book_id, current_user, db)
+    not_modified = conditional_book(request, response, book, "page", page_no)
+    if not_modified:
+        return not_modified
+
+    def build():
+        content = reader.read_page(db, book_id, page_no)
+        if content is None:
+            return None
+        return {
+            "book_id": book_id,
+            "page_no": page_no,
+            "page_count": reader.get_page_count(db, book_id),
+            "content": content,
+        }
+    page = http_cache.cached(("page", book_id, book.revision, page_no), build)
+    if page is None:
+        raise HTTPException(status_code=404, detail="Page not found")
+    return page
+
+@router.get("/books/{book_id}/content")
+def stream_book_content(
+    book_id: int,
+    start_page: int = Query(1, ge=1),
+    end_page: Optional[int] = Query(None, ge=1),
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    get_readable_book(book_id, current_user, db)
+    if end_page is not None and start_page > end_page:
+        raise HTTPException(status_code=416, detail="start_page is after end_page")
+    page_count = reader.get_page_count(db, book_id)
+    if start_page > page_count:
+        raise HTTPException(status_code=404, detail="Page not found", headers={"X-Page-Count": str(page_count)})
+    last_page = min(end_page or page_count, page_count)
+
+    # the generator outlives the request-scoped session, so it opens its own
+    def pages():
+        stream_db = SessionLocal()
+        try:
+            for page_no in range(start_page, last_page + 1):
+                yield reader.read_page(stream_db, book_id, page_no) or ""
+        finally:
+            stream_db.close()
+
+    return StreamingResponse(
+        pages(),
+        media_type="text/plain; charset=utf-8",
+        headers={"X-Page-Count": str(page_count)},
+    )
+
 @router.post("/books/{book_id}/pay")
 def pay_for_book(book_id: int, payment: Payment, current_user: dict = Depends(get_current_user), db: Session = Depends(get_db)):
     book = db.query(BookTable).filter(BookTable.id == book_id).first()
     if not book:
         raise HTTPException(status_code=404, detail="Book not found")
         
-    # Check if already bought
-    existing = db.query(UserProgressTable).filter(
-        UserProgressTable.username == current_user["username"],
-        UserProgressTable.book_id == book_id,
-        UserProgressTable.action_type == "buy"
-    ).first()
-    
-    if existing:
+    # Record purchase (unique per user and book)
+    if not entitlements.grant(db, current_user["username"], book_id, book.price):
         return {"message": "Already purchased"}
-        
-    # Record purchase
-    new_progress = UserProgressTable(
-        username=current_user["username"],
-        book_id=book_id,
-        action_type="buy"
-    )
-    db.add(new_progress)
-    db.commit()
     
     return {"message": "Payment successful"}
 
 @router.post("/books/{book_id}/start")
 def start_reading(book_id: int, current_user: dict = Depends(get_current_user), db: Session = Depends(get_db)):
-    # Log 'read' action if not exists
-    existing = db.query(UserProgressTable).filter(
-        UserProgressTable.username == current_user["username"],
-        UserProgressTable.book_id == book_id,
-        UserProgressTable.action_type == "read"
-    ).first()
-    
-    if not existing:
-        db.add(UserProgressTable(username=current_user["username"], book_id=book_id, action_type="read"))
-    
-    # Create session
-    session = ReadingSessionTable(username=current_user["username"], book_id=book_id)
-    db.add(session)
-    db.commit()
-    return {"message": "Session started"}
+    # Logs the 'read' action and opens a session (written behind, see session_events.py)
+    record_event(db, Event("start", current_user["username"], book_id, datetime.utcnow()))
+    return {"message": "Session started", "heartbeat_seconds": config.READING_HEARTBEAT_SECONDS}
+
+# Liveness ping from the open reader; only queued in memory, no query
+@router.post("/books/{book_id}/heartbeat")
+def reading_heartbeat(book_id: int, current_user: dict = Depends(get_current_user), db: Session = Depends(get_db)):
+    record_event(db, Event("beat", current_user["username"], book_id, datetime.utcnow()))
+    return {"message": "Heartbeat received"}
 
 @router.post("/books/{book_id}/stop")
-def stop_reading(book_id: int, body: StopReadingBody, current_user: dict = Depends(get_current_user), db: Session = Depends(get_db)):
-    # Find latest open session
-    session = db.query(ReadingSessionTable).filter(
-        ReadingSessionTable.username == current_user["username"],
+def stop_reading(book_id: int, body: Optional[StopReadingBody] = None, current_user: dict = Depends(get_current_user), db: Session = Depends(get_db)):
+    username = current_user["username"]
+    # Open sessions in the table plus the queued starts, minus queued stops
+    open_rows = db.query(func.count(ReadingSessionTable.id)).filter(
+        ReadingSessionTable.username == username,
         ReadingSessionTable.book_id == book_id,
         ReadingSessionTable.ended_at == None
-    ).order_by(ReadingSessionTable.started_at.desc()).first()
-    
-    if session:
-        from datetime import datetime
-        session.ended_at = datetime.utcnow()
-        session.duration_seconds = body.duration_seconds
-        db.commit()
+    ).scalar()
+    has_open = open_rows + session_events.queued_balance(username, book_id) > 0
+
+    if has_open:
+        # duration is computed from start, heartbeats and now; body.duration_seconds is ignored
+        record_event(db, Event("stop", username, book_id, datetime.utcnow()))
         return {"message": "Session saved"}
     
     return {"message": "No active session found"}
 
 # --- Creator Book Management (Create/Update) ---
-@router.post("/books/")
+@router.post("/books/", response_model=BookResponse)
 def create_book(book: BookCreate, current_user: dict = Depends(get_current_user), db: Session = Depends(get_db)):
     if current_user["role"] != "creator":
         raise HTTPException(status_code=403, detail="Only creators can publish")
@@ -195,7 +322,6 @@ def create_book(book: BookCreate, current_user: dict = Depends(get_current_user)
     new_book = BookTable(
         title=book.title,
         author=book.author,
-        content=book.content,
         price=book.price,
         is_premium=book.is_premium,
         creator_id=current_user["username"],
@@ -203,12 +329,14 @@ def create_book(book: BookCreate, current_user: dict = Depends(get_current_user)
         theme=book.theme # Ensure theme is saved
     )
     db.add(new_book)
+    db.flush()
+    sync_book_content(db, new_book, book.content)
     db.commit()
     db.refresh(new_book)
     return new_book
 
 from models import BookUpdate
-@router.put("/books/{book_id}")
+@router.put("/books/{book_id}", response_model=BookResponse)
 def update_book(book_id: int, book: BookUpdate, current_user: dict = Depends(get_current_user), db: Session = Depends(get_db)):
     db_book = db.query(BookTable).filter(BookTable.id == book_id).first()
     if not db_book:
@@ -219,7 +347,6 @@ def update_book(book_id: int, book: BookUpdate, current_user: dict = Depends(get
         
     db_book.title = book.title
     db_book.author = book.author
-    db_book.content = book.content
     db_book.price = book.price
     db_book.is_premium = book.is_premium
     
@@ -230,5 +357,6 @@ def update_book(book_id: int, book: BookUpdate, current_user: dict = Depends(get
     # Reset status to pending on update
     db_book.status = "pending"
     
+    sync_book_content(db, db_book, book.content)
     db.commit()
     return db_book
@@ -0,0 +1,176 @@
+import re
+from sqlalchemy import bindparam, or_, text
+from sqlalchemy.orm import Session
+from tables import BookTable
+import reader
+
+# --- FULL-TEXT INDEX (SQLite FTS5) ---
+# books_fts is contentless (content=''): it holds the index only, keyed by
+# rowid = books.id, and no copy of the text. The text stays compressed in
+# book_pages, and search_books builds snippets and highlights from it.
+# Removing an entry needs the exact values that were indexed: the title,
+# author and theme are kept in books_fts_docs (the books row may already
+# hold the new ones), and the text is read back from book_pages, so an
+# entry must be removed before its pages are rewritten (crud.py does).
+# Status is not indexed: the search query joins books and filters on it, so
+# approve/reject never has to touch the index.
+
+SNIPPET_TOKENS = 16
+
+# FTS5 is SQLite-only; on other databases the index is skipped and
+# search_books falls back to a LIKE match on title/author/theme.
+def fts_enabled(bind) -> bool:
+    return bind.dialect.name == "sqlite"
+
+def create_search_index(engine):
+    # returns True when the index is new and still has to be filled
+    if not fts_enabled(engine):
+        return False
+    with engine.begin() as conn:
+        tables = set(conn.execute(text(
+            "SELECT name FROM sqlite_master WHERE name IN ('books_fts', 'books_fts_docs')"
+        )).scalars())
+        if tables == {"books_fts", "books_fts_docs"}:
+            return False
+        # an index from before books_fts_docs stored its own copy of the text
+        conn.execute(text("DROP TABLE IF EXISTS books_fts"))
+        conn.execute(text(
+            "CREATE VIRTUAL TABLE books_fts USING fts5("
+            "title, author, theme, content, content = '', tokenize = 'porter unicode61')"
+        ))
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS books_fts_docs ("
+            "id INTEGER PRIMARY KEY, title TEXT NOT NULL, author TEXT NOT NULL, theme TEXT NOT NULL)"
+        ))
+        conn.execute(text("DELETE FROM books_fts_docs"))
+        return True
+
+def rebuild_index(db: Session):
+    if not fts_enabled(db.get_bind()):
+        return
+    db.execute(text("INSERT INTO books_fts (books_fts) VALUES ('delete-all')"))
+    db.execute(text("DELETE FROM books_fts_docs"))
+    for book in db.query(BookTable).all():
+        index_books(db, [(book, reader.read_content(db, book.id))], new=True)
+
+def index_book(db: Session, book, content: str):
+    index_books(db, [(book, content)])
+
+def index_books(db: Session, books, new: bool = False):
+    # books: (book, content); new=True skips removing entries that can't exist yet
+    if not books or not fts_enabled(db.get_bind()):
+        return
+    if not new:
+        remove_books(db, [book.id for book, _ in books])
+    docs = [{"id": book.id, "title": book.title, "author": book.author, "theme": book.theme or ""} for book, _ in books]
+    db.execute(text("INSERT INTO books_fts_docs (id, title, author, theme) VALUES (:id, :title, :author, :theme)"), docs)
+    db.execute(
+        text("INSERT INTO books_fts (rowid, title, author, theme, content) VALUES (:id, :title, :author, :theme, :content)"),
+        [{**doc, "content": content or ""} for doc, (_, content) in zip(docs, books)],
+    )
+
+def remove_book(db: Session, book_id: int):
+    remove_books(db, [book_id])
+
+def remove_books(db: Session, book_ids):
+    # call while the book's pages still hold the indexed text
+    if not book_ids or not fts_enabled(db.get_bind()):
+        return
+    ids = {"ids": list(book_ids)}
+    docs = db.execute(text("SELECT id, title, author, theme FROM books_fts_docs WHERE id IN :ids")
+                      .bindparams(bindparam("ids", expanding=True)), ids).all()
+    if not docs:
+        return
+    db.execute(
+        text("INSERT INTO books_fts (books_fts, rowid, title, author, theme, content) "
+             "VALUES ('delete', :id, :title, :author, :theme, :content)"),
+        [{**doc._mapping, "content": reader.read_content(db, doc.id)} for doc in docs],
+    )
+    db.execute(text("DELETE FROM books_fts_docs WHERE id IN :ids").bindparams(bindparam("ids", expanding=True)), ids)
+
+def index_size(db: Session):
+    # payload bytes: the metadata kept for removals, and the index itself
+    if not fts_enabled(db.get_bind()):
+        return {"text_copy_bytes": 0, "index_bytes": 0}
+    text_copy = db.execute(text(
+        "SELECT COALESCE(SUM(LENGTH(CAST(title AS BLOB)) + LENGTH(CAST(author AS BLOB)) "
+        "+ LENGTH(CAST(theme AS BLOB))), 0) FROM books_fts_docs"
+    )).scalar()
+    index = db.execute(text("SELECT COALESCE(SUM(LENGTH(block)), 0) FROM books_fts_data")).scalar()
+    return {"text_copy_bytes": text_copy, "index_bytes": index}
+
+# --- SNIPPETS ---
+# Built in Python from the decompressed pages, which the contentless index
+# can't quote. A word is a hit when it starts with a query term, like the
+# prefix match; words that only matched through porter stemming aren't marked.
+def _is_hit(word: str, terms) -> bool:
+    word = word.lower()
+    return any(word.startswith(t) for t in terms)
+
+def highlight(value: str, terms) -> str:
+    return re.sub(r"\w+", lambda m: f"<mark>{m.group()}</mark>" if _is_hit(m.group(), terms) else m.group(), value)
+
+def snippet(pages, terms, tokens: int = SNIPPET_TOKENS):
+    # a window of `tokens` words around the first hit; the book's opening
+    # words when no page has one
+    first = None
+    for page in pages:
+        words = list(re.finditer(r"\w+", page))
+        if first is None and words:
+            first = (page, words, 0)
+        hit = next((i for i, w in enumerate(words) if _is_hit(w.group(), terms)), None)
+        if hit is not None:
+            first = (page, words, hit)
+            break
+    if first is None:
+        return None
+    page, words, hit = first
+    start = max(0, min(hit - tokens // 4, len(words) - tokens))
+    window = words[start:start + tokens]
+    quoted = highlight(page[window[0].start():window[-1].end()], terms)
+    return ("..." if start > 0 else "") + quoted + ("..." if start + tokens < len(words) else "")
+
+def build_match_query(q: str):
+    # Quote every term so user input can't inject FTS5 syntax; prefix-match the terms
+    terms = re.findall(r"\w+", q)
+    return " ".join(f'"{t}"*' for t in terms)
+
+def search_books(db: Session, q: str, limit: int, offset: int):
+    match = build_match_query(q)
+    if not match:
+        return []
+    if not fts_enabled(db.get_bind()):
+        return search_books_like(db, q, limit, offset)
+    # bm25 weights: title > author > theme > content.
+    rows = db.execute(text(
+        "SELECT b.id, b.title, b.author, b.theme, b.price, b.is_premium, "
+        "bm25(books_fts, 10.0, 5.0, 3.0, 1.0) AS score "
+        "FROM books_fts JOIN books b ON b.id = books_fts.rowid "
+        "WHERE books_fts MATCH :match AND b.status = 'approved' "
+        "ORDER BY score LIMIT :limit OFFSET :offset"
+    ), {"match": match, "limit": limit, "offset": offset})
+    terms = [t.lower() for t in re.findall(r"\w+", q)]
+    # Premium content is never quoted in snippets.
+    return [
+        {**row._mapping, "is_premium": bool(row.is_premium),
+         "title_highlight": highlight(row.title, terms),
+         "snippet": None if row.is_premium else snippet(reader.iter_pages(db, row.id), terms)}
+        for row in rows
+    ]
+
+def search_books_like(db: Session, q: str, limit: int, offset: int):
+    terms = re.findall(r"\w+", q)
+    query = db.query(
+        BookTable.id, BookTable.title, BookTable.author, BookTable.theme,
+        BookTable.price, BookTable.is_premium,
+    ).filter(BookTable.status == "approved")
+    for term in terms:
+        pattern = f"%{term}%"
+        query = query.filter(or_(
+            BookTable.title.ilike(pattern), BookTable.author.ilike(pattern), BookTable.theme.ilike(pattern),
+        ))
+    rows = query.order_by(BookTable.title, BookTable.id).limit(limit).offset(offset).all()
+    return [
+        {**row._mapping, "is_premium": bool(row.is_premium), "title_highlight": row.title, "snippet": None, "score": None}
+        for row in rows
+    ]
@@ -0,0 +1,403 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict, namedtuple
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, update
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.orm import Session
+
+import config
+import stats
+import trending
+from database import SessionLocal, dialect_insert
+from tables import ReadingSessionTable, UserProgressTable
+
+# --- WRITE-BEHIND READING SESSIONS ---
+# start/stop calls only append an event here; a background thread writes
+# them in one transaction per batch (every SESSION_FLUSH_INTERVAL_MS or
+# SESSION_FLUSH_MAX_EVENTS events). Within a batch a start followed by its
+# stop becomes a single finished row, "read" progress rows are deduplicated
+# and the stats rollups get one update per key. Heartbeats only refresh the
+# queued liveness of a session (consecutive ones are coalesced) and reach
+# the table as one last_seen_at update per batch.
+#
+# Durability: the queue is flushed on shutdown. With SESSION_EVENT_LOG set,
+# events are also appended to a local log first and replayed on startup, so
+# a crash loses nothing (a crash right after a commit can replay that batch
+# once more -- delivery is at-least-once). Heartbeats are not logged: losing
+# them can only shorten the recorded reading time.
+#
+# Failures: a failed batch goes back to the head of the queue, and the
+# flusher retries it with exponential backoff (up to
+# SESSION_FLUSH_MAX_BACKOFF_MS). An outage ("database is locked", a lost
+# connection) is retried for as long as it lasts. Only when the rows
+# themselves are rejected (IntegrityError / DataError) SESSION_FLUSH_MAX_RETRIES
+# times in a row is the batch bisected: the events that can be written are,
+# and the ones that fail on their own go to SESSION_DEAD_LETTER_LOG (same
+# line format as the event log; append them to SESSION_EVENT_LOG to replay them).
+
+Event = namedtuple("Event", "kind username book_id at")  # kind: start | beat | stop
+
+# errors caused by the rows of a batch; anything else is retried as is
+ROW_ERRORS = (IntegrityError, DataError)
+
+def session_duration(started_at: datetime, last_seen: datetime, ended_at: datetime) -> int:
+    # Server-side reading time: wall time from start to stop, but a session
+    # only counts until READING_IDLE_TIMEOUT_SECONDS after its last heartbeat.
+    alive_until = max(started_at, last_seen or started_at) + timedelta(seconds=config.READING_IDLE_TIMEOUT_SECONDS)
+    return max(0, int((min(ended_at, alive_until) - started_at).total_seconds()))
+
+def apply_events(db: Session, events):
+    S = ReadingSessionTable
+
+    # 1. "read" progress, one row per user/book; ON CONFLICT DO NOTHING on
+    # the unique index, so concurrent first starts can't both insert it
+    started = {(e.username, e.book_id) for e in events if e.kind == "start"}
+    if started:
+        connection = db.connection()
+        connection.execute(
+            dialect_insert(connection, UserProgressTable)
+            .on_conflict_do_nothing(index_elements=["username", "action_type", "book_id"]),
+            [{"username": u, "book_id": b, "action_type": "read"} for u, b in sorted(started)],
+        )
+
+    # 2. Open sessions already in the table, newest first (partial index)
+    open_db = defaultdict(list)
+    pending_keys = {(e.username, e.book_id) for e in events if e.kind != "start"}
+    if pending_keys:
+        rows = db.query(S.id, S.username, S.book_id, S.started_at, S.last_seen_at)\
+            .filter(S.username.in_({u for u, _ in pending_keys}), S.ended_at == None)\
+            .order_by(S.started_at.desc())
+        for row in rows:
+            open_db[(row.username, row.book_id)].append(
+                {"id": row.id, "started_at": row.started_at, "last_seen_at": row.last_seen_at})
+
+    # 3. Replay the batch in order; sessions opened in this batch are inserted
+    # as rows, sessions from the table are updated by id
+    new_rows, open_new, updates, finished = [], defaultdict(list), {}, []
+    for e in events:
+        key = (e.username, e.book_id)
+        if e.kind == "start":
+            row = {"username": e.username, "book_id": e.book_id, "started_at": e.at,
+                   "last_seen_at": e.at, "ended_at": None, "duration_seconds": 0}
+            open_new[key].append(row)
+            new_rows.append(row)
+            continue
+        # latest open session, as the old per-request lookup did
+        if open_new[key]:
+            row = open_new[key][-1]
+        elif open_db[key]:
+            row = open_db[key][0]
+            updates.setdefault(row["id"], {"id": row["id"]})
+        else:
+            continue  # nothing open: stale heartbeat or duplicate stop
+        if e.kind == "beat":
+            row["last_seen_at"] = e.at
+            if "id" in row:
+                updates[row["id"]]["last_seen_at"] = e.at
+            continue
+        duration = session_duration(row["started_at"], row["last_seen_at"], e.at)
+        row.update(ended_at=e.at, duration_seconds=duration)
+        finished.append((e.username, e.book_id, row["started_at"].date(), duration))
+        if "id" in row:
+            updates[row["id"]].update(ended_at=e.at, duration_seconds=duration)
+            open_db[key].pop(0)
+        else:
+            open_new[key].pop()
+
+    if updates:
+        db.execute(update(S), list(updates.values()))
+    if new_rows:
+        db.execute(insert(S), new_rows)
+        trending.record(db.connection(), [(row["book_id"], row["started_at"], "reads") for row in new_rows])
+    stats.record_sessions(db, finished)
+
+def sweep_stale_sessions(db: Session, now: datetime = None):
+    # Close sessions without a heartbeat for READING_IDLE_TIMEOUT_SECONDS;
+    # they end at their last heartbeat.
+    S = ReadingSessionTable
+    now = now or datetime.utcnow()
+    cutoff = now - timedelta(seconds=config.READING_IDLE_TIMEOUT_SECONDS)
+    stale = db.query(S.id, S.username, S.book_id, S.started_at, S.last_seen_at)\
+        .filter(S.ended_at == None, func.coalesce(S.last_seen_at, S.started_at) < cutoff)\
+        .all()
+    closed, finished = [], []
+    for row in stale:
+        ended_at = max(row.started_at, row.last_seen_at or row.started_at)
+        duration = session_duration(row.started_at, row.last_seen_at, ended_at)
+        closed.append({"id": row.id, "ended_at": ended_at, "duration_seconds": duration})
+        finished.append((row.username, row.book_id, row.started_at.date(), duration))
+    if closed:
+        db.execute(update(S), closed)
+        stats.record_sessions(db, finished)
+    return len(closed)
+
+class SessionEventQueue:
+    def __init__(self, interval_ms: int, max_events: int, log_path: str = "", fsync: bool = False,
+                 max_retries: int = 3, dead_letter_path: str = "", max_backoff_ms: int = 30000):
+        self.interval = interval_ms / 1000
+        self.max_events = max_events
+        self.log_path = log_path
+        self.fsync = fsync
+        self.max_retries = max_retries
+        self.dead_letter_path = dead_letter_path
+        self.max_backoff = max_backoff_ms / 1000
+        self._failures = 0  # failed flushes in a row
+        self._row_failures = 0  # of those, rejected rows in a row
+        self._retry_at = 0.0  # monotonic time before which the flusher waits
+        self._events = []
+        self._inflight = []  # batch being written right now
+        self._last = {}  # (username, book_id) -> index of its latest queued event
+        self._next_sweep = 0.0
+        self._oldest = None  # monotonic time of the oldest queued event
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._metrics = {
+            "batches": 0, "events": 0, "errors": 0,
+            "last_batch_size": 0, "max_batch_size": 0,
+            "last_lag_ms": 0.0, "max_lag_ms": 0.0,
+            "last_flush_ms": 0.0, "coalesced": 0, "swept": 0, "dead_lettered": 0,
+            "sweep_errors": 0,
+        }
+
+    # --- producers ---
+    def submit(self, event: Event):
+        key = (event.username, event.book_id)
+        with self._lock:
+            last = self._last.get(key)
+            if event.kind == "beat" and last is not None and self._events[last].kind == "beat":
+                self._events[last] = event
+                self._metrics["coalesced"] += 1
+                return
+            if self.log_path and event.kind != "beat":
+                self._append_log([event])
+            if not self._events:
+                self._oldest = time.monotonic()
+            self._last[key] = len(self._events)
+            self._events.append(event)
+            full = len(self._events) >= self.max_events
+        self.start()
+        if full:
+            self._wake.set()
+
+    def queued_balance(self, username: str, book_id: int) -> int:
+        # queued starts minus queued stops for one user/book
+        balance = 0
+        with self._lock:
+            for e in self._inflight + self._events:
+                if e.username == username and e.book_id == book_id:
+                    balance += {"start": 1, "stop": -1}.get(e.kind, 0)
+        return balance
+
+    # --- background flusher ---
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._replay_log()
+                    self._stop.clear()
+                    self._thread = threading.Thread(target=self._run, name="session-events", daemon=True)
+                    self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if time.monotonic() < self._retry_at:
+                continue  # backing off; a full queue doesn't cut it short
+            try:
+                self.flush()
+            except Exception:
+                # counted in metrics ("errors"); the batch is back in the queue
+                self._retry_at = time.monotonic() + self.backoff()
+                continue
+            if time.monotonic() >= self._next_sweep:
+                try:
+                    self.sweep()
+                except Exception:
+                    with self._lock:
+                        self._metrics["sweep_errors"] += 1
+
+    def backoff(self) -> float:
+        # seconds to wait after the latest failed flush
+        return min(self.interval * 2 ** max(self._failures - 1, 0), self.max_backoff)
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                if not self._events:
+                    return 0
+                batch, oldest = self._events, self._oldest
+                self._events, self._oldest, self._last = [], None, {}
+                self._inflight = batch
+                if self.log_path:
+                    self._seal_log()
+            started = time.monotonic()
+            try:
+                self._write(batch)
+            except Exception as e:
+                self._failures += 1
+                self._row_failures = self._row_failures + 1 if isinstance(e, ROW_ERRORS) else 0
+                with self._lock:
+                    self._metrics["errors"] += 1
+                if self._row_failures < self.max_retries:
+                    self._requeue(batch, oldest)
+                    raise
+                # the rows keep being rejected: write what can be written
+                failed, unwritten, error = self._isolate(batch)
+                self._dead_letter(failed)
+                if error is not None:  # the database went away while bisecting
+                    self._requeue(unwritten, oldest)
+                    raise error
+            self._failures = self._row_failures = 0
+            if self.log_path and os.path.exists(self._sealed_path):
+                os.remove(self._sealed_path)
+            done = time.monotonic()
+            with self._lock:
+                self._inflight = []
+                m = self._metrics
+                m["batches"] += 1
+                m["events"] += len(batch)
+                m["last_batch_size"] = len(batch)
+                m["max_batch_size"] = max(m["max_batch_size"], len(batch))
+                m["last_lag_ms"] = round((done - oldest) * 1000, 1)
+                m["max_lag_ms"] = max(m["max_lag_ms"], m["last_lag_ms"])
+                m["last_flush_ms"] = round((done - started) * 1000, 1)
+            return len(batch)
+
+    def _requeue(self, events, oldest):
+        with self._lock:
+            self._inflight = []
+            self._events = events + self._events
+            self._oldest = oldest
+            self._reindex()
+
+    def _write(self, events):
+        with SessionLocal() as db:
+            apply_events(db, events)
+            db.commit()
+
+    def _isolate(self, events):
+        # Bisects until the events whose rows are rejected on their own are
+        # found; the others are written, in order. Returns (failed, unwritten,
+        # error): any other error stops the bisection and comes back with the
+        # events not written yet, to be retried.
+        pieces, failed = [events], []
+        while pieces:
+            piece = pieces.pop(0)
+            try:
+                self._write(piece)
+            except ROW_ERRORS:
+                if len(piece) == 1:
+                    failed += piece
+                else:
+                    middle = len(piece) // 2
+                    pieces[:0] = [piece[:middle], piece[middle:]]
+            except Exception as e:
+                return failed, piece + [event for rest in pieces for event in rest], e
+        return failed, [], None
+
+    def _dead_letter(self, events):
+        if not events:
+            return
+        if self.dead_letter_path:
+            self._append_log(events, self.dead_letter_path)
+        with self._lock:
+            self._metrics["dead_lettered"] += len(events)
+
+    def sweep(self):
+        # runs after a flush, so queued heartbeats are already in the table
+        self._next_sweep = time.monotonic() + config.SESSION_SWEEP_INTERVAL_SECONDS
+        with SessionLocal() as db:
+            swept = sweep_stale_sessions(db)
+            db.commit()
+        with self._lock:
+            self._metrics["swept"] += swept
+        return swept
+
+    def _reindex(self):
+        self._last = {(e.username, e.book_id): i for i, e in enumerate(self._events)}
+
+    def stats(self):
+        with self._lock:
+            queued = len(self._events)
+            lag = round((time.monotonic() - self._oldest) * 1000, 1) if self._oldest else 0.0
+            m = dict(self._metrics)
+        m["avg_batch_size"] = round(m["events"] / m["batches"], 1) if m["batches"] else 0.0
+        return {"mode": config.SESSION_WRITE_MODE, "queued": queued, "oldest_queued_ms": lag, **m}
+
+    # --- append-only log ---
+    # New events go to log_path; a flush moves its lines to log_path + ".flushing"
+    # and deletes that file after the commit. Both are replayed on startup.
+    @property
+    def _sealed_path(self):
+        return self.log_path + ".flushing"
+
+    def _append_log(self, events, path: str = None):
+        with open(path or self.log_path, "a", encoding="utf-8") as f:
+            for e in events:
+                f.write(json.dumps([e.kind, e.username, e.book_id, e.at.isoformat()]) + "\n")
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+
+    def _seal_log(self):
+        if not os.path.exists(self.log_path):
+            return
+        # appending keeps the lines of an earlier failed flush, which is retried too
+        with open(self.log_path, "rb") as src, open(self._sealed_path, "ab") as dst:
+            dst.write(src.read())
+            dst.flush()
+            if self.fsync:
+                os.fsync(dst.fileno())
+        os.truncate(self.log_path, 0)
+
+    def _replay_log(self):
+        if not self.log_path:
+            return
+        replayed = []
+        for path in (self._sealed_path, self.log_path):
+            if os.path.exists(path):
+                with open(path, encoding="utf-8") as f:
+                    for line in f:
+                        if line.strip():
+                            kind, username, book_id, at = json.loads(line)
+                            replayed.append(Event(kind, username, book_id, datetime.fromisoformat(at)))
+        if replayed:
+            if not self._events:
+                self._oldest = time.monotonic()
+            self._events = replayed + self._events
+            self._reindex()
+            self._seal_log()
+
+session_events = SessionEventQueue(
+    config.SESSION_FLUSH_INTERVAL_MS,
+    config.SESSION_FLUSH_MAX_EVENTS,
+    config.SESSION_EVENT_LOG,
+    config.SESSION_EVENT_LOG_FSYNC,
+    config.SESSION_FLUSH_MAX_RETRIES,
+    config.SESSION_DEAD_LETTER_LOG,
+    config.SESSION_FLUSH_MAX_BACKOFF_MS,
+)
+
+def record_event(db: Session, event: Event):
+    # direct mode also commits every heartbeat
+    if config.SESSION_WRITE_MODE == "direct":
+        apply_events(db, [event])
+        db.commit()
+    else:
+        session_events.submit(event)
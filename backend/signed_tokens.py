@@ -0,0 +1,69 @@
+import base64
+import hashlib
+import hmac
+import json
+import secrets
+import time
+
+import config
+from token_store import token_store
+
+# --- SIGNED ACCESS TOKENS (JWT, HS256) ---
+# Carry username and role so the auth path needs no user lookup. Revoked
+# token ids (logout) are kept in TOKEN_STORE, so every worker sees them: one
+# store read per request. Access tokens are short-lived, refresh tokens live
+# in TOKEN_STORE too.
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+def _unb64(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+def _sign(signing_input: str) -> str:
+    return _b64(hmac.new(config.TOKEN_SECRET.encode(), signing_input.encode(), hashlib.sha256).digest())
+
+# a per-process random key would make every other worker reject the token
+# and log everyone out on restart, so there is no default
+if config.AUTH_TOKEN_MODE == "signed" and not config.TOKEN_SECRET:
+    raise RuntimeError("AUTH_TOKEN_MODE=signed needs TOKEN_SECRET (the same value for every worker)")
+
+HEADER = _b64(json.dumps({"alg": "HS256", "typ": "JWT"}, separators=(",", ":")).encode())
+REFRESH_PREFIX = "refresh:"
+REVOKED_PREFIX = "revoked:"
+
+def is_signed(token: str) -> bool:
+    # in opaque mode a dotted bearer token is just an unknown session id
+    return config.AUTH_TOKEN_MODE == "signed" and token.count(".") == 2
+
+def create_access_token(username: str, role: str, ttl: int = config.ACCESS_TOKEN_TTL_SECONDS) -> str:
+    now = int(time.time())
+    claims = {"sub": username, "role": role, "iat": now, "exp": now + ttl, "jti": secrets.token_hex(8)}
+    signing_input = HEADER + "." + _b64(json.dumps(claims, separators=(",", ":")).encode())
+    return signing_input + "." + _sign(signing_input)
+
+def verify_access_token(token: str):
+    # returns the claims, or None if the token is malformed, forged, expired or revoked
+    if not config.TOKEN_SECRET:  # anyone can sign with an empty key
+        return None
+    try:
+        header, payload, signature = token.split(".")
+    except ValueError:
+        return None
+    # only accept our own header, so "alg" can't be swapped
+    if header != HEADER or not hmac.compare_digest(signature, _sign(header + "." + payload)):
+        return None
+    try:
+        claims = json.loads(_unb64(payload))
+    except ValueError:
+        return None
+    if claims.get("exp", 0) <= time.time() or token_store.get(REVOKED_PREFIX + str(claims.get("jti"))):
+        return None
+    return claims
+
+def revoke_access_token(claims: dict):
+    # kept for TOKEN_TTL_SECONDS, which outlasts an access token by default
+    token_store.issue(REVOKED_PREFIX + claims["jti"], claims["sub"])
+
+def new_refresh_token() -> str:
+    return secrets.token_urlsafe(32)
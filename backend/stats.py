@@ -0,0 +1,109 @@
+from datetime import date, timedelta
+from sqlalchemy import case, func, insert, select
+from sqlalchemy.orm import Session
+from database import add_to_rows
+from tables import ReadingSessionTable, ReadingStatDailyTable, ReadingStatTotalTable
+import analytics
+
+# --- READING STATS ROLLUPS ---
+# Per user/day/book and per-user totals of finished sessions. Closing a
+# session adds to them in the same transaction, so the dashboard never has
+# to sum raw reading_sessions.
+
+
+def record_session(db: Session, username: str, book_id: int, day: date, seconds: int):
+    record_sessions(db, [(username, book_id, day, seconds)])
+
+def record_sessions(db: Session, finished):
+    # finished: (username, book_id, day, seconds) tuples; one bump per rollup row
+    daily, totals = {}, {}
+    for username, book_id, day, seconds in finished:
+        seconds = seconds or 0
+        row = daily.setdefault((username, day, book_id), [0, 0])
+        row[0] += seconds
+        row[1] += 1
+        row = totals.setdefault(username, [0, 0])
+        row[0] += seconds
+        row[1] += 1
+    connection = db.connection()
+    add_to_rows(connection, ReadingStatDailyTable, ["username", "day", "book_id"], [
+        {"username": username, "day": day, "book_id": book_id, "total_seconds": seconds, "sessions": sessions}
+        for (username, day, book_id), (seconds, sessions) in daily.items()
+    ])
+    add_to_rows(connection, ReadingStatTotalTable, ["username"], [
+        {"username": username, "total_seconds": seconds, "sessions": sessions}
+        for username, (seconds, sessions) in totals.items()
+    ])
+    analytics.touch_books(db.connection(), {book_id for _, book_id, _, _ in finished})
+
+def reading_summary_queries(username: str, today: date):
+    # (today / week / month seconds, total seconds)
+    week_start = today - timedelta(days=today.weekday())
+    month_start = today.replace(day=1)
+    D = ReadingStatDailyTable
+
+    def since(start):
+        return func.coalesce(func.sum(case((D.day >= start, D.total_seconds), else_=0)), 0)
+
+    periods = select(since(today), since(week_start), since(month_start))\
+        .where(D.username == username, D.day >= min(week_start, month_start))
+    total = select(ReadingStatTotalTable.total_seconds).where(ReadingStatTotalTable.username == username)
+    return periods, total
+
+def reading_summary(db: Session, username: str, today: date):
+    periods, total = reading_summary_queries(username, today)
+    return summary_body(db.execute(periods).one(), db.execute(total).scalar())
+
+def summary_body(periods, total_seconds):
+    today_seconds, week_seconds, month_seconds = periods
+    return {
+        "total": total_seconds or 0,
+        "today": today_seconds,
+        "week": week_seconds,
+        "month": month_seconds,
+    }
+
+# --- REBUILD / CHECK (python manage.py rebuild-stats | check-stats) ---
+
+def _raw_daily():
+    S = ReadingSessionTable
+    return select(
+        S.username, func.date(S.started_at).label("day"), S.book_id,
+        func.coalesce(func.sum(S.duration_seconds), 0).label("total_seconds"),
+        func.count(S.id).label("sessions"),
+    ).where(S.ended_at.is_not(None)).group_by(S.username, func.date(S.started_at), S.book_id)
+
+def _raw_totals():
+    S = ReadingSessionTable
+    return select(
+        S.username,
+        func.coalesce(func.sum(S.duration_seconds), 0).label("total_seconds"),
+        func.count(S.id).label("sessions"),
+    ).where(S.ended_at.is_not(None)).group_by(S.username)
+
+def rebuild_reading_stats(db: Session):
+    db.query(ReadingStatDailyTable).delete()
+    db.query(ReadingStatTotalTable).delete()
+    columns = ["username", "day", "book_id", "total_seconds", "sessions"]
+    db.execute(insert(ReadingStatDailyTable).from_select(columns, _raw_daily()))
+    columns = ["username", "total_seconds", "sessions"]
+    db.execute(insert(ReadingStatTotalTable).from_select(columns, _raw_totals()))
+
+def check_reading_stats(db: Session):
+    # returns the rows where the rollups disagree with raw sessions
+    mismatches = []
+    expected = {(r.username, str(r.day), r.book_id): (r.total_seconds, r.sessions) for r in db.execute(_raw_daily())}
+    actual = {
+        (r.username, str(r.day), r.book_id): (r.total_seconds, r.sessions)
+        for r in db.query(ReadingStatDailyTable).all()
+    }
+    for key in expected.keys() | actual.keys():
+        if expected.get(key) != actual.get(key):
+            mismatches.append({"table": "daily", "key": key, "expected": expected.get(key), "actual": actual.get(key)})
+
+    expected = {r.username: (r.total_seconds, r.sessions) for r in db.execute(_raw_totals())}
+    actual = {r.username: (r.total_seconds, r.sessions) for r in db.query(ReadingStatTotalTable).all()}
+    for key in expected.keys() | actual.keys():
+        if expected.get(key) != actual.get(key):
+            mismatches.append({"table": "total", "key": key, "expected": expected.get(key), "actual": actual.get(key)})
+    return mismatches
@@ -0,0 +1,51 @@
+import zlib
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from tables import BookPageTable
+import search
+
+try:
+    import zstandard
+except ImportError:  # optional, zlib is always available
+    zstandard = None
+
+# --- COMPRESSED CONTENT STORAGE ---
+# Book text lives in book_pages as one compressed blob per reader page;
+# the codec is stored per row so old pages stay readable if it changes.
+
+DEFAULT_CODEC = "zstd" if zstandard else "zlib"
+
+def compress(text: str, codec: str = DEFAULT_CODEC) -> bytes:
+    raw = text.encode("utf-8")
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=9).compress(raw)
+    return zlib.compress(raw, 9)
+
+def decompress(data: bytes, codec: str) -> str:
+    if codec == "zstd":
+        return zstandard.ZstdDecompressor().decompress(data).decode("utf-8")
+    return zlib.decompress(data).decode("utf-8")
+
+def content_report(db: Session):
+    row = db.query(
+        func.count(func.distinct(BookPageTable.book_id)),
+        func.count(BookPageTable.id),
+        func.coalesce(func.sum(BookPageTable.raw_size), 0),
+        func.coalesce(func.sum(func.length(BookPageTable.data)), 0),
+    ).one()
+    books, pages, raw_bytes, stored_bytes = row
+    codecs = dict(db.query(BookPageTable.codec, func.count(BookPageTable.id)).group_by(BookPageTable.codec).all())
+    # the contentless search index adds the index and its metadata copy
+    fts = search.index_size(db)
+    with_fts = stored_bytes + fts["text_copy_bytes"] + fts["index_bytes"]
+    return {
+        "books": books,
+        "pages": pages,
+        "raw_bytes": raw_bytes,
+        "stored_bytes": stored_bytes,
+        "ratio": round(raw_bytes / stored_bytes, 2) if stored_bytes else None,
+        "codecs": codecs,
+        "search_index": fts,
+        "stored_bytes_with_search_index": with_fts,
+        "ratio_with_search_index": round(raw_bytes / with_fts, 2) if with_fts else None,
+    }
@@ -1,8 +1,12 @@
 from datetime import datetime
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Boolean, Float, Text
+from sqlalchemy import Column, Date, DateTime, ForeignKey, Index, Integer, LargeBinary, String, Boolean, Float, Text, UniqueConstraint
 from database import Base
+from sqlalchemy import literal_column, text
 from sqlalchemy.orm import relationship, backref
 
+# length of the listing preview kept next to the book metadata
+PREVIEW_LENGTH = 200
+
 
 class BookTable(Base):
     __tablename__ = "books"
@@ -10,11 +14,38 @@ class BookTable(Base):
     title = Column(String, index=True)
     author = Column(String)
     theme = Column(String, nullable=True) 
-    content = Column(String)
     price = Column(Float, default=0.0)
     is_premium = Column(Boolean, default=False)
     status = Column(String, default="pending")
     creator_id = Column(String)
+    preview = Column(String, nullable=True)
+    # bumped by every UPDATE of the row, set-based ones included; drives the
+    # book's ETag (see http_cache.py)
+    revision = Column(Integer, default=1, onupdate=literal_column("COALESCE(revision, 0) + 1"))
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # catalog listing filters on status and pages by id or (title, id)
+    __table_args__ = (
+        Index("ix_books_status_id", "status", "id"),
+        Index("ix_books_status_title_id", "status", "title", "id"),
+        # a creator's own listing (/user/my-books)
+        Index("ix_books_creator_id", "creator_id", "id"),
+    )
+
+class BookPageTable(Base):
+    __tablename__ = "book_pages"
+    id = Column(Integer, primary_key=True)
+    book_id = Column(Integer, ForeignKey("books.id"), nullable=False)
+    page_no = Column(Integer, nullable=False)
+    # character offsets of this page within the book text, end exclusive
+    start_offset = Column(Integer, nullable=False)
+    end_offset = Column(Integer, nullable=False)
+    # the page text itself, compressed (see storage.py)
+    codec = Column(String, default="zlib")
+    raw_size = Column(Integer, default=0)
+    data = Column(LargeBinary)
+
+    __table_args__ = (UniqueConstraint("book_id", "page_no", name="uq_book_pages_book_page"),)
 
 class UserTable(Base):
     __tablename__ = "users"
@@ -26,6 +57,26 @@ class UserTable(Base):
     password = Column(String)
     role = Column(String, default="user")
 
+    # admin user list: keyset by id within a role; the lower(name) and
+    # lower(email) indexes for prefix search are created in migrations.py
+    __table_args__ = (
+        Index("ix_users_role_id", "role", "id"),
+    )
+
+# Sessions for TOKEN_STORE=sqlite; only a hash of the token is stored
+class AuthTokenTable(Base):
+    __tablename__ = "auth_tokens"
+    token_hash = Column(String, primary_key=True)
+    username = Column(String, nullable=False, index=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+# Running totals for the admin and creator summaries (see counters.py)
+class CounterTable(Base):
+    __tablename__ = "counters"
+    name = Column(String, primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
+
+# "read" markers; purchases live in their own table
 class UserProgressTable(Base):
     __tablename__ = "user_progress"
     id = Column(Integer, primary_key=True, index=True)
@@ -33,6 +84,23 @@ class UserProgressTable(Base):
     book_id = Column(Integer)
     action_type = Column(String)
 
+    __table_args__ = (
+        Index("uq_user_progress_username_action_book", "username", "action_type", "book_id", unique=True),
+    )
+
+# Entitlements: one row per bought book (see entitlements.py)
+class PurchaseTable(Base):
+    __tablename__ = "purchases"
+    id = Column(Integer, primary_key=True)
+    username = Column(String, nullable=False)
+    book_id = Column(Integer, nullable=False, index=True)
+    price = Column(Float, default=0.0)  # what was paid
+    purchased_at = Column(DateTime, default=datetime.utcnow)  # NULL for purchases migrated from user_progress
+
+    __table_args__ = (
+        UniqueConstraint("username", "book_id", name="uq_purchases_username_book"),
+    )
+
 class ReadingSessionTable(Base):
     __tablename__ = "reading_sessions"
     id = Column(Integer, primary_key=True, index=True)
@@ -41,6 +109,79 @@ class ReadingSessionTable(Base):
     started_at = Column(DateTime, default=datetime.utcnow)  # pass function [web:380]
     ended_at = Column(DateTime, nullable=True)
     duration_seconds = Column(Integer, default=0)
+    # last heartbeat, written in batches (see session_events.py)
+    last_seen_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # covers the dashboard's per-user date-range sums and recent-activity scan
+        Index("ix_reading_sessions_username_started", "username", "started_at", "duration_seconds"),
+        # open sessions only: stop/heartbeat lookups and the stale-session sweep
+        Index(
+            "ix_reading_sessions_open", "username", "book_id", "started_at",
+            sqlite_where=text("ended_at IS NULL"), postgresql_where=text("ended_at IS NULL"),
+        ),
+    )
+
+# Rollups of finished reading sessions, maintained by stop_reading (see stats.py)
+class ReadingStatDailyTable(Base):
+    __tablename__ = "reading_stats_daily"
+    id = Column(Integer, primary_key=True)
+    username = Column(String, nullable=False)
+    day = Column(Date, nullable=False)
+    book_id = Column(Integer, nullable=False)
+    total_seconds = Column(Integer, default=0)
+    sessions = Column(Integer, default=0)
+
+    __table_args__ = (UniqueConstraint("username", "day", "book_id", name="uq_reading_stats_daily"),)
+
+class ReadingStatTotalTable(Base):
+    __tablename__ = "reading_stats_total"
+    username = Column(String, primary_key=True)
+    total_seconds = Column(Integer, default=0)
+    sessions = Column(Integer, default=0)
+
+# Per-book activity counted in hourly and daily buckets (see trending.py)
+class BookActivityTable(Base):
+    __tablename__ = "book_activity"
+    id = Column(Integer, primary_key=True)
+    book_id = Column(Integer, nullable=False)
+    granularity = Column(String, nullable=False)  # hour | day
+    bucket_start = Column(DateTime, nullable=False)
+    reads = Column(Integer, default=0)
+    purchases = Column(Integer, default=0)
+    comments = Column(Integer, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("book_id", "granularity", "bucket_start", name="uq_book_activity_bucket"),
+        # trending scans only the recent buckets of one granularity
+        Index("ix_book_activity_granularity_bucket", "granularity", "bucket_start"),
+    )
+
+# Precomputed recommendations (see recommendations.py): the top-K most
+# similar approved books per book, and the top-K books per user. Rows under
+# username "*" are the most-read books, for users without history.
+class BookSimilarityTable(Base):
+    __tablename__ = "book_similarities"
+    id = Column(Integer, primary_key=True)
+    book_id = Column(Integer, nullable=False)
+    similar_book_id = Column(Integer, nullable=False)
+    score = Column(Float, nullable=False)
+    rank = Column(Integer, nullable=False)
+    computed_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (Index("ix_book_similarities_book_rank", "book_id", "rank"),)
+
+class UserRecommendationTable(Base):
+    __tablename__ = "user_recommendations"
+    id = Column(Integer, primary_key=True)
+    username = Column(String, nullable=False)
+    book_id = Column(Integer, nullable=False)
+    score = Column(Float, nullable=False)
+    rank = Column(Integer, nullable=False)
+    computed_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (Index("ix_user_recommendations_username_rank", "username", "rank"),)
+
 
 
 class CommentTable(Base):
@@ -59,4 +200,10 @@ class CommentTable(Base):
     # keeping prev comments
     replies = relationship("CommentTable", backref=backref('parent', remote_side=[id]))
 
+    # top-level page of a book's thread, and the walk down to replies
+    __table_args__ = (
+        Index("ix_comments_book_parent_created", "book_id", "parent_id", "created_at", "id"),
+        Index("ix_comments_parent_id", "parent_id"),
+    )
+
 
@@ -0,0 +1,71 @@
+import itertools
+import os
+import sys
+import tempfile
+
+# The backend imports its modules flat and reads config.py at import time,
+# so the temporary database is configured before anything is imported.
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+TMP = tempfile.mkdtemp(prefix="library-tests-")
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(TMP, "library.db")
+os.environ["SQLITE_PROFILE"] = "default"
+os.environ["SESSION_WRITE_MODE"] = "direct"
+os.environ["SESSION_EVENT_LOG"] = ""
+os.environ["TOKEN_STORE"] = "memory"
+os.environ["AUTH_TOKEN_MODE"] = "opaque"
+
+import pytest
+from fastapi.testclient import TestClient
+
+_ids = itertools.count(1)
+
+@pytest.fixture(scope="session")
+def client():
+    from main import app
+    with TestClient(app) as c:
+        yield c
+
+@pytest.fixture
+def db(client):
+    from database import SessionLocal
+    with SessionLocal() as session:
+        yield session
+
+@pytest.fixture
+def login(client):
+    def login(username, password=None):
+        r = client.post("/auth/login", data={"username": username, "password": password or username})
+        assert r.status_code == 200, r.text
+        return {"Authorization": "Bearer " + r.json()["access_token"]}
+    return login
+
+@pytest.fixture
+def make_user(db):
+    from tables import UserTable
+    def make_user(name=None, role="user", email=None):
+        n = next(_ids)
+        user = UserTable(
+            user_id=f"TEST{n:04d}", name=name or f"reader{n}", email=email or f"reader{n}@example.com",
+            phone_number="0000000000", password="secret", role=role,
+        )
+        db.add(user)
+        db.commit()
+        return user.user_id
+    return make_user
+
+@pytest.fixture
+def make_book(client, login):
+    # created by the default creator account and approved by admin
+    def make_book(title=None, content="Once upon a time. " * 50, theme="fiction", price=0.0, is_premium=False):
+        n = next(_ids)
+        r = client.post("/user/books/", headers=login("creator"), json={
+            "title": title or f"Book {n}", "author": "Author", "content": content,
+            "theme": theme, "price": price, "is_premium": is_premium,
+        })
+        assert r.status_code == 200, r.text
+        book_id = r.json()["id"]
+        r = client.post(f"/admin/books/{book_id}/approve", headers=login("admin"))
+        assert r.status_code == 200, r.text
+        return book_id
+    return make_book
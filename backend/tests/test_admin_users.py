@@ -0,0 +1,43 @@
+def test_pages_cover_every_user_once(client, login, make_user):
+    for _ in range(5):
+        make_user()
+    admin = login("admin")
+    first = client.get("/admin/users", params={"limit": 200}, headers=admin).json()
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        page = client.get("/admin/users", params=params, headers=admin).json()
+        seen += [u["user_id"] for u in page["users"]]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert seen == [u["user_id"] for u in first["users"]]
+    assert first["total"] == len(seen) and not first["total_is_estimate"]
+
+def test_role_filter_and_prefix_search(client, login, make_user):
+    creator = make_user(name="Zelda Creator", role="creator")
+    reader = make_user(name="zeno", email="ZENO.reader@example.com")
+    admin = login("admin")
+
+    page = client.get("/admin/users", params={"role": "creator"}, headers=admin).json()
+    assert creator in [u["user_id"] for u in page["users"]]
+    assert {u["role"] for u in page["users"]} == {"creator"}
+
+    page = client.get("/admin/users", params={"q": "ZE"}, headers=admin).json()
+    assert {creator, reader} <= {u["user_id"] for u in page["users"]}
+    assert page["total_is_estimate"]
+    page = client.get("/admin/users", params={"q": "zeno.r"}, headers=admin).json()
+    assert [u["user_id"] for u in page["users"]] == [reader]
+    page = client.get("/admin/users", params={"role": "creator", "q": "zeno"}, headers=admin).json()
+    assert page["users"] == [] and page["total"] == 0
+
+def test_non_ascii_prefix(client, login, make_user):
+    user = make_user(name="Éric")
+    page = client.get("/admin/users", params={"q": "Ér"}, headers=login("admin")).json()
+    assert [u["user_id"] for u in page["users"]] == [user]
+
+def test_rejects_bad_input(client, login):
+    admin = login("admin")
+    assert client.get("/admin/users", params={"cursor": "nope"}, headers=admin).status_code == 400
+    assert client.get("/admin/users", params={"role": "owner"}, headers=admin).status_code == 422
+    assert client.get("/admin/users", headers=login("user")).status_code == 403
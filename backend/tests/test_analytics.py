@@ -0,0 +1,81 @@
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import insert
+
+import analytics
+from session_events import Event, apply_events
+from tables import BookTable, CommentTable, PurchaseTable, ReadingSessionTable
+
+TODAY = date(2026, 3, 10)
+
+def add_book(db, creator, price=4.0):
+    book = BookTable(title="Analytics", author="A", price=price, status="approved", creator_id=creator)
+    db.add(book)
+    db.commit()
+    return book.id
+
+def read(db, username, book_id, start, seconds):
+    apply_events(db, [Event("start", username, book_id, start), Event("stop", username, book_id, start + timedelta(seconds=seconds))])
+    db.commit()
+
+def by_id(result):
+    return {row["book_id"]: row for row in result["books"]}
+
+def test_median_session_length_per_book(db, make_user):
+    creator = make_user(role="creator")
+    odd, even, none = add_book(db, creator), add_book(db, creator), add_book(db, creator)
+    for n, seconds in enumerate([90, 10, 20]):
+        read(db, f"odd{n}", odd, datetime(2026, 3, 9, 9), seconds)
+    for n, seconds in enumerate([40, 10, 30, 100]):
+        read(db, f"even{n}", even, datetime(2026, 3, 9, 9), seconds)
+    # an open session doesn't count
+    db.add(ReadingSessionTable(username="open", book_id=odd, duration_seconds=0))
+    db.commit()
+    rows = by_id(analytics.compute(db, creator, 30, TODAY))
+    assert rows[odd]["median_session_seconds"] == 20.0
+    assert rows[even]["median_session_seconds"] == 35.0
+    assert rows[none]["median_session_seconds"] == 0.0
+
+def test_revenue_falls_back_to_the_book_price(db, make_user):
+    creator = make_user(role="creator")
+    book_id = add_book(db, creator, price=4.0)
+    db.add(PurchaseTable(username="paid", book_id=book_id, price=2.5, purchased_at=datetime(2026, 3, 9, 12)))
+    # purchases migrated from user_progress can have no price (the ORM would apply the default)
+    db.execute(insert(PurchaseTable).values(username="migrated", book_id=book_id, price=None, purchased_at=None))
+    db.commit()
+    result = analytics.compute(db, creator, 30, TODAY)
+    row = by_id(result)[book_id]
+    assert row["purchases"] == 2 and row["revenue"] == 6.5
+    assert result["totals"]["revenue"] == 6.5
+
+def test_daily_series_covers_the_window_only(db, make_user):
+    creator = make_user(role="creator")
+    book_id = add_book(db, creator)
+    read(db, "a", book_id, datetime(2026, 3, 9, 9), 60)
+    read(db, "b", book_id, datetime(2026, 3, 9, 10), 30)
+    read(db, "a", book_id, datetime(2026, 3, 1, 9), 100)
+    db.add(PurchaseTable(username="a", book_id=book_id, price=1.0, purchased_at=datetime(2026, 3, 10, 8)))
+    db.commit()
+    result = analytics.compute(db, creator, 7, TODAY)
+    assert result["since"] == "2026-03-04"
+    row = by_id(result)[book_id]
+    assert row["daily"] == [
+        {"day": "2026-03-09", "readers": 2, "seconds": 90, "purchases": 0},
+        {"day": "2026-03-10", "readers": 0, "seconds": 0, "purchases": 1},
+    ]
+    # the totals are all-time
+    assert row["readers"] == 2 and row["reading_seconds"] == 190 and row["sessions"] == 3
+    assert result["totals"]["readers"] == 2
+
+def test_cached_until_new_activity(db, make_user):
+    creator = make_user(role="creator")
+    book_id = add_book(db, creator)
+    first = analytics.creator_analytics(db, creator, 30)
+    assert analytics.creator_analytics(db, creator, 30) is first
+    db.add(CommentTable(book_id=book_id, user_id=creator, content="new"))
+    db.commit()
+    second = analytics.creator_analytics(db, creator, 30)
+    assert second is not first and by_id(second)[book_id]["comments"] == 1
+    db.add(PurchaseTable(username="buyer", book_id=book_id, price=4.0))
+    db.commit()
+    assert by_id(analytics.creator_analytics(db, creator, 30))[book_id]["purchases"] == 1
@@ -0,0 +1,93 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+import config
+import database
+import http_cache
+from conftest import BACKEND
+from tables import CommentTable
+
+# DB_MODE is read at import, so the async routers are mounted on their own
+# app here, over an aiosqlite session on the same test database.
+
+@pytest.fixture
+def async_client(client, monkeypatch):
+    import async_routes
+    engine = database.create_db_engine(config._async_url(config.DATABASE_URL), profile="default", create=create_async_engine)
+    monkeypatch.setattr(database, "AsyncSessionLocal", async_sessionmaker(engine, autoflush=False, expire_on_commit=False))
+    app = FastAPI()
+    app.include_router(async_routes.user_router, prefix="/user")
+    app.include_router(async_routes.comments_router, prefix="/comments")
+    with TestClient(app) as c:
+        yield c
+        c.portal.call(engine.dispose)
+
+def both(client, async_client, path, headers=None):
+    http_cache.response_cache.clear()
+    sync = client.get(path, headers=headers)
+    http_cache.response_cache.clear()
+    native = async_client.get(path, headers=headers)
+    assert native.status_code == sync.status_code
+    return sync, native
+
+def test_hot_reads_answer_like_sync_mode(client, async_client, db, login, make_user, make_book):
+    book_id = make_book(content="Page text. " * 800)
+    first = CommentTable(book_id=book_id, user_id="creator", content="first")
+    db.add(first)
+    db.flush()
+    db.add(CommentTable(book_id=book_id, user_id="creator", content="reply", parent_id=first.id))
+    db.commit()
+    reader = login(make_user(), "secret")
+    client.post(f"/user/books/{book_id}/start", headers=reader)
+    client.post(f"/user/books/{book_id}/stop", headers=reader, json={})
+
+    for path in ["/user/dashboard", "/user/books?limit=2", "/user/books?sort=title&include_preview=true",
+                 f"/user/books/{book_id}/pages/2", f"/comments/{book_id}"]:
+        sync, native = both(client, async_client, path, reader)
+        assert sync.status_code == 200, path
+        assert native.json() == sync.json(), path
+        assert native.headers.get("etag") == sync.headers.get("etag"), path
+
+def test_async_catalog_cursor_and_revalidation(client, async_client, login, make_book):
+    for _ in range(3):
+        make_book()
+    headers = login("user")
+    first = async_client.get("/user/books?limit=1", headers=headers)
+    cursor = first.json()["next_cursor"]
+    second = async_client.get(f"/user/books?limit=1&cursor={cursor}", headers=headers).json()
+    assert second["books"][0]["id"] > first.json()["books"][0]["id"]
+    again = async_client.get("/user/books?limit=1", headers={**headers, "If-None-Match": first.headers["etag"]})
+    assert again.status_code == 304
+
+def test_async_page_checks_paywall_and_token(client, async_client, login, make_book):
+    book_id = make_book(price=5.0, is_premium=True)
+    headers = login("user")
+    assert async_client.get(f"/user/books/{book_id}/pages/1").status_code == 401
+    assert async_client.get(f"/user/books/{book_id}/pages/1", headers=headers).status_code == 402
+    assert client.post(f"/user/books/{book_id}/pay", headers=headers, json={"amount": 5.0}).status_code == 200
+    assert async_client.get(f"/user/books/{book_id}/pages/1", headers=headers).status_code == 200
+    assert async_client.get(f"/user/books/{book_id}/pages/99", headers=headers).status_code == 404
+    assert async_client.get("/user/books/999999/pages/1", headers=headers).status_code == 404
+
+def test_main_serves_the_async_handlers(tmp_path):
+    # once logged in, the sync session factory is taken away: the hot reads
+    # must not need it
+    script = (
+        "from fastapi.testclient import TestClient\n"
+        "import database, main\n"
+        "with TestClient(main.app) as c:\n"
+        "    token = c.post('/auth/login', data={'username': 'user', 'password': 'user'}).json()['access_token']\n"
+        "    database.SessionLocal = None\n"
+        "    for path in ['/user/books', '/user/books/1/pages/1', '/comments/1']:\n"
+        "        r = c.get(path, headers={'Authorization': 'Bearer ' + token})\n"
+        "        assert r.status_code in (200, 404), (path, r.text)\n"
+    )
+    env = {**os.environ, "DB_MODE": "async", "DATABASE_URL": f"sqlite:///{tmp_path / 'library.db'}"}
+    result = subprocess.run([sys.executable, "-c", script], cwd=BACKEND, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
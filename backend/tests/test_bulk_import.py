@@ -0,0 +1,50 @@
+import json
+from sqlalchemy import event
+
+def test_import_reports_failures_and_indexes_books(client, login):
+    rows = [
+        {"title": "Quasar Nights", "author": "A", "content": "A story about a quasar. " * 10, "price": 0},
+        {"title": "No content", "author": "B"},
+    ]
+    body = "\n".join(json.dumps(r) for r in rows).encode()
+    r = client.post("/user/books/import", headers=login("creator"),
+                    files={"file": ("books.ndjson", body, "application/x-ndjson")})
+    assert r.status_code == 200, r.text
+    result = r.json()
+    assert result["imported"] == 1 and [f["record"] for f in result["failures"]] == [2]
+
+    books = client.get("/admin/books/pending", params={"limit": 200}, headers=login("admin")).json()["books"]
+    assert "Quasar Nights" in [b["title"] for b in books]
+
+def test_users_cannot_import(client, login):
+    r = client.post("/user/books/import", headers=login("user"), files={"file": ("b.ndjson", b"{}", "application/x-ndjson")})
+    assert r.status_code == 403
+
+def test_a_batch_writes_pages_and_index_in_one_statement_each(db, make_user):
+    import bulk_import
+    from database import engine
+    from tables import PREVIEW_LENGTH, BookPageTable, BookTable
+
+    statements = []
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(" ".join(statement.split()).upper())
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        records = [(n, {"title": f"Batch {n}", "author": "A", "content": f"Batch book {n}. " * 400}) for n in (1, 2, 3)]
+        summary = bulk_import.import_books(db, records, make_user(role="creator"))
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    assert summary["imported"] == 3
+
+    def count(prefix):
+        return sum(s.startswith(prefix) for s in statements)
+    # SQLite returns generated ids one INSERT ... RETURNING at a time
+    assert count("INSERT INTO BOOKS ") == 3
+    assert count("INSERT INTO BOOK_PAGES") == 1
+    assert count("INSERT INTO BOOKS_FTS ") == 1 and count("INSERT INTO BOOKS_FTS_DOCS") == 1
+    assert count("UPDATE BOOKS") == 0 and count("DELETE FROM BOOKS_FTS") == 0
+
+    books = db.query(BookTable).filter(BookTable.title.in_(["Batch 1", "Batch 2", "Batch 3"])).all()
+    assert [b.revision for b in books] == [1, 1, 1]
+    assert all(b.preview == ("Batch book %d. " % n * 20)[:PREVIEW_LENGTH] for n, b in zip((1, 2, 3), sorted(books, key=lambda b: b.title)))
+    assert db.query(BookPageTable).filter(BookPageTable.book_id == books[0].id).count() == 2
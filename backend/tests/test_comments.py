@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from routers.comments import comment_tree
+from tables import CommentTable
+
+T0 = datetime(2026, 3, 2, 9, 0)
+
+def comment(db, book_id, user_id, content, minutes, parent=None):
+    row = CommentTable(book_id=book_id, user_id=user_id, content=content,
+                       created_at=T0 + timedelta(minutes=minutes), parent_id=parent.id if parent else None)
+    db.add(row)
+    db.commit()
+    return row
+
+def contents(nodes):
+    return [(n["content"], contents(n["replies"])) for n in nodes]
+
+def test_thread_is_one_tree_newest_first(client, db, make_user, make_book):
+    book_id = make_book()
+    author = make_user(name="Ann")
+    first = comment(db, book_id, author, "first", 0)
+    reply = comment(db, book_id, author, "reply", 5, first)
+    comment(db, book_id, author, "nested", 6, reply)
+    comment(db, book_id, "nobody", "second", 10)
+    comment(db, make_book(), author, "other book", 1)
+
+    r = client.get(f"/comments/{book_id}")
+    assert r.status_code == 200 and "x-next-cursor" not in r.headers
+    assert contents(r.json()) == [("second", []), ("first", [("reply", [("nested", [])])])]
+    assert [c["user_name"] for c in r.json()] == ["Unknown", "Ann"]
+
+def test_pages_of_threads_follow_the_cursor(client, db, make_book):
+    book_id = make_book()
+    for n in range(5):
+        parent = comment(db, book_id, "creator", f"thread {n}", n)
+        comment(db, book_id, "creator", f"reply {n}", 10 + n, parent)
+
+    seen, cursor = [], None
+    while True:
+        r = client.get(f"/comments/{book_id}", params={"limit": 2, **({"cursor": cursor} if cursor else {})})
+        assert r.status_code == 200
+        page = contents(r.json())
+        assert len(page) <= 2 and all(len(replies) == 1 for _, replies in page)
+        seen += [content for content, _ in page]
+        cursor = r.headers.get("x-next-cursor")
+        if not cursor:
+            break
+    assert seen == [f"thread {n}" for n in (4, 3, 2, 1, 0)]
+
+def test_max_depth_cuts_the_tree(client, db, make_book):
+    book_id = make_book()
+    parent = comment(db, book_id, "creator", "depth 0", 0)
+    for depth in range(1, 4):
+        parent = comment(db, book_id, "creator", f"depth {depth}", depth, parent)
+    r = client.get(f"/comments/{book_id}", params={"max_depth": 1})
+    assert contents(r.json()) == [("depth 0", [("depth 1", [])])]
+    assert contents(client.get(f"/comments/{book_id}", params={"max_depth": 0}).json()) == [("depth 0", [])]
+
+def test_a_reply_without_its_parent_is_left_out():
+    row = lambda id, parent_id, depth: SimpleNamespace(id=id, parent_id=parent_id, depth=depth, name="A",
+                                                       content=str(id), created_at=T0)
+    roots, _ = comment_tree([row(1, None, 0), row(2, 99, 1)], None)
+    assert contents(roots) == [("1", [])]
@@ -0,0 +1,65 @@
+import gzip
+import json
+
+import pytest
+
+import compression
+import config
+from pagination import encode_cursor
+
+def raw_get(client, path, headers, encoding):
+    # read the body as sent, before httpx decodes it
+    with client.stream("GET", path, headers={**headers, "Accept-Encoding": encoding}) as r:
+        return r, b"".join(r.iter_raw())
+
+def test_large_responses_are_gzipped(client, login, make_book):
+    text = "Repetitive book text. " * 2000
+    book_id = make_book(content=text)
+    headers = login("user")
+    for path in (f"/user/books/{book_id}", f"/user/books/{book_id}/content"):
+        r, body = raw_get(client, path, headers, "gzip")
+        assert r.headers["content-encoding"] == "gzip" and "accept-encoding" in r.headers["vary"].lower()
+        assert len(body) < len(text) / 10
+        assert text in gzip.decompress(body).decode()
+    plain, body = raw_get(client, f"/user/books/{book_id}", headers, "identity")
+    assert "content-encoding" not in plain.headers and json.loads(body)["content"] == text
+
+def test_small_responses_are_sent_as_is(client, login):
+    r, body = raw_get(client, "/user/books/search?q=nothingmatchesthis", login("user"), "gzip")
+    assert len(body) < config.COMPRESSION_MINIMUM_SIZE
+    assert "content-encoding" not in r.headers
+
+def test_brotli_only_when_accepted_and_installed(client, login, make_book, monkeypatch):
+    assert compression._accepts("gzip, br", "br")
+    assert not compression._accepts("gzip, br;q=0", "br")
+    assert not compression._accepts("gzip", "br")
+    book_id = make_book(content="Repetitive book text. " * 2000)
+    monkeypatch.setattr(compression, "brotli", None)
+    r, _ = raw_get(client, f"/user/books/{book_id}", login("user"), "br, gzip")
+    assert r.headers["content-encoding"] == "gzip"
+
+def test_brotli_responses_decode(client, login, make_book):
+    brotli = pytest.importorskip("brotli")
+    text = "Repetitive book text. " * 2000
+    book_id = make_book(content=text)
+    r, body = raw_get(client, f"/user/books/{book_id}", login("user"), "br")
+    assert r.headers["content-encoding"] == "br"
+    assert json.loads(brotli.decompress(body))["content"] == text
+
+def catalog_row(client, headers, book_id, **params):
+    # the catalog is keyset-paged by id, so start just before the book
+    books = client.get("/user/books", params={"limit": 1, "cursor": encode_cursor(book_id - 1), **params},
+                       headers=headers).json()["books"]
+    assert books[0]["id"] == book_id
+    return books[0]
+
+def test_catalog_rows_follow_the_response_model(client, login, make_book):
+    book_id = make_book(title="Modelled", content="Model text. " * 100)
+    headers = login("user")
+    row = catalog_row(client, headers, book_id)
+    assert set(row) == {"id", "title", "author", "theme", "price", "is_premium", "preview"}
+    assert row["preview"] is None
+    assert catalog_row(client, headers, book_id, include_preview="true")["preview"].startswith("Model text.")
+    detail = client.get(f"/user/books/{book_id}", headers=headers).json()
+    assert set(detail) == {"id", "title", "author", "theme", "price", "is_premium", "preview",
+                           "status", "creator_id", "content"}
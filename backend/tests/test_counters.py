@@ -0,0 +1,35 @@
+from sqlalchemy.dialects import postgresql
+
+import counters
+from database import dialect_insert
+from tables import CounterTable
+
+def test_add_inserts_then_accumulates(db):
+    conn = db.connection()
+    counters.add(conn, {"test:a": 2, "test:b": -1, "test:zero": 0})
+    counters.add(conn, {"test:a": 3})
+    assert counters.get_many(db, ["test:a", "test:b", "test:zero"]) == {"test:a": 5, "test:b": -1, "test:zero": 0}
+    assert db.query(CounterTable).filter(CounterTable.name == "test:zero").first() is None
+    db.rollback()
+
+def test_add_is_a_single_upsert_on_postgresql():
+    class Pg:
+        dialect = postgresql.dialect()
+    stmt = dialect_insert(Pg, CounterTable)
+    stmt = stmt.on_conflict_do_update(index_elements=["name"], set_={"value": stmt.table.c.value + stmt.excluded.value})
+    sql = str(stmt.compile(dialect=postgresql.dialect()))
+    assert "ON CONFLICT (name) DO UPDATE SET value = (counters.value + excluded.value)" in sql
+
+def test_summaries_match_a_rebuild(client, login, make_book, make_user, db):
+    make_user()
+    ids = [make_book() for _ in range(3)]
+    admin = login("admin")
+    assert client.post("/admin/books/batch", headers=admin, json={"action": "reject", "ids": ids[:2]}).status_code == 200
+    assert client.post("/admin/books/batch", headers=admin, json={"action": "delete", "ids": ids[2:]}).status_code == 200
+
+    summary = client.get("/admin/summary", headers=admin).json()["stats"]
+    mine = client.get("/user/summary", headers=login("creator")).json()
+    counters.rebuild(db)
+    db.commit()
+    assert client.get("/admin/summary", headers=admin).json()["stats"] == summary
+    assert client.get("/user/summary", headers=login("creator")).json() == mine
@@ -0,0 +1,37 @@
+def test_book_etag_304_and_invalidation(client, login, make_book):
+    book_id = make_book(content="First version. " * 20)
+    headers = login("user")
+    first = client.get(f"/user/books/{book_id}", headers=headers)
+    tag = first.headers["etag"]
+    assert tag.startswith('W/"')
+    assert first.headers["cache-control"].startswith("private, max-age=")
+    assert "Authorization" in first.headers["vary"]
+
+    again = client.get(f"/user/books/{book_id}", headers={**headers, "If-None-Match": tag})
+    assert again.status_code == 304 and again.content == b""
+    since = client.get(f"/user/books/{book_id}", headers={**headers, "If-Modified-Since": first.headers["last-modified"]})
+    assert since.status_code == 304
+
+    r = client.put(f"/user/books/{book_id}", headers=login("creator"), json={
+        "title": "Edited", "author": "Author", "content": "Second version. " * 20, "price": 0.0, "is_premium": False,
+    })
+    assert r.status_code == 200, r.text
+    changed = client.get(f"/user/books/{book_id}", headers={**headers, "If-None-Match": tag})
+    assert changed.status_code == 200 and changed.json()["content"].startswith("Second version.")
+    assert changed.headers["etag"] != tag
+
+def test_catalog_etag_changes_with_any_book_write(client, login, make_book):
+    headers = login("user")
+    tag = client.get("/user/books", headers=headers).headers["etag"]
+    assert client.get("/user/books", headers={**headers, "If-None-Match": tag}).status_code == 304
+    make_book()
+    assert client.get("/user/books", headers={**headers, "If-None-Match": tag}).status_code == 200
+
+def test_premium_book_is_revalidated_and_checked_before_304(client, login, make_book, make_user):
+    book_id = make_book(price=2.0, is_premium=True)
+    owner = login("admin")
+    r = client.get(f"/user/books/{book_id}", headers=owner)
+    assert r.headers["cache-control"] == "private, no-cache"
+    stranger = login(make_user(), "secret")
+    r = client.get(f"/user/books/{book_id}", headers={**stranger, "If-None-Match": r.headers["etag"]})
+    assert r.status_code == 402
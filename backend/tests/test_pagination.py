@@ -0,0 +1,29 @@
+import pytest
+
+from pagination import encode_cursor
+
+@pytest.mark.parametrize("sort, values", [
+    ("id", ["x"]),
+    ("id", [True]),
+    ("id", [1.5]),
+    ("title", [1, 2]),
+    ("title", ["Book", "2"]),
+    ("id", [1, 2]),
+])
+def test_catalog_cursor_values_must_match_the_sort_key(client, login, sort, values, make_book):
+    make_book()
+    r = client.get("/user/books", params={"sort": sort, "cursor": encode_cursor(*values)}, headers=login("user"))
+    assert r.status_code == 400 and r.json()["detail"] == "Invalid cursor"
+
+def test_catalog_cursor_round_trip(client, login, make_book):
+    for _ in range(2):
+        make_book()
+    headers = login("user")
+    for sort in ("id", "title"):
+        first = client.get("/user/books", params={"sort": sort, "limit": 1}, headers=headers).json()
+        r = client.get("/user/books", params={"sort": sort, "limit": 1, "cursor": first["next_cursor"]}, headers=headers)
+        assert r.status_code == 200 and r.json()["books"] != first["books"]
+
+@pytest.mark.parametrize("cursor", [encode_cursor("yesterday", 1), encode_cursor(1, 1), "not base64!"])
+def test_comment_cursor_is_checked_too(client, cursor):
+    assert client.get("/comments/1", params={"limit": 1, "cursor": cursor}).status_code == 400
@@ -0,0 +1,46 @@
+from sqlalchemy import event
+
+from database import engine
+from routers.auth import principal_cache
+from tables import UserTable
+
+def role_lookups(client, path, headers):
+    statements = []
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("SELECT users.role"):
+            statements.append(statement)
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        assert client.get(path, headers=headers).status_code == 200
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+    return len(statements)
+
+def test_repeat_requests_skip_the_user_lookup(client, login, make_user):
+    username = make_user()
+    headers = login(username, "secret")
+    principal_cache.pop(username)
+    before = principal_cache.stats()
+    assert role_lookups(client, "/user/books", headers) == 1
+    assert role_lookups(client, "/user/books", headers) == 0
+    after = principal_cache.stats()
+    assert after["hits"] > before["hits"] and after["misses"] > before["misses"]
+    assert client.get("/admin/cache", headers=login("admin")).json()["principals"]["hits"] >= after["hits"]
+
+def test_role_change_applies_at_once(client, db, login, make_user):
+    username = make_user()
+    headers = login(username, "secret")
+    assert client.get("/admin/summary", headers=headers).status_code == 403
+    user = db.query(UserTable).filter(UserTable.user_id == username).one()
+    user.role = "admin"
+    db.commit()
+    assert client.get("/admin/summary", headers=headers).status_code == 200
+
+def test_deleted_account_is_refused(client, db, login, make_user):
+    username = make_user()
+    headers = login(username, "secret")
+    assert client.get("/user/books", headers=headers).status_code == 200
+    db.delete(db.query(UserTable).filter(UserTable.user_id == username).one())
+    db.commit()
+    r = client.get("/user/books", headers=headers)
+    assert r.status_code == 401 and r.json()["detail"] == "User not found"
@@ -0,0 +1,45 @@
+from datetime import datetime
+
+from sqlalchemy import text
+
+import session_events
+from database import Base, create_db_engine
+from migrations import move_purchases
+from tables import UserProgressTable
+
+def test_paying_twice_records_one_purchase(client, login, make_user, make_book):
+    book_id = make_book(price=4.5, is_premium=True)
+    headers = login(make_user(), "secret")
+    assert client.get(f"/user/books/{book_id}", headers=headers).status_code == 402
+    pay = lambda: client.post(f"/user/books/{book_id}/pay", headers=headers, json={"amount": 4.5}).json()["message"]
+    assert pay() == "Payment successful"
+    assert pay() == "Already purchased"
+    assert client.get(f"/user/books/{book_id}", headers=headers).status_code == 200
+
+def test_read_progress_is_written_once(db, make_user, make_book):
+    username, book_id = make_user(), make_book()
+    start = session_events.Event("start", username, book_id, datetime(2026, 3, 2, 9))
+    session_events.apply_events(db, [start, start])
+    session_events.apply_events(db, [start])  # a concurrent request got there first
+    db.commit()
+    rows = db.query(UserProgressTable).filter_by(username=username, book_id=book_id, action_type="read").count()
+    assert rows == 1
+
+def test_move_purchases_migrates_buy_rows(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'old.db'}", profile="default")
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        # the schema before purchases existed: duplicate progress rows, "buy" markers
+        conn.execute(text("DROP INDEX uq_user_progress_username_action_book"))
+        conn.execute(text("INSERT INTO books (id, title, price) VALUES (1, 'A', 3.0), (2, 'B', 5.0)"))
+        conn.execute(text(
+            "INSERT INTO user_progress (username, book_id, action_type) VALUES "
+            "('ann', 1, 'buy'), ('ann', 1, 'buy'), ('ann', 1, 'read'), ('ann', 1, 'read'), ('bob', 2, 'buy')"
+        ))
+    move_purchases(engine)
+    with engine.connect() as conn:
+        purchases = conn.execute(text("SELECT username, book_id, price FROM purchases ORDER BY username")).all()
+        progress = conn.execute(text("SELECT username, book_id, action_type FROM user_progress")).all()
+    assert [tuple(p) for p in purchases] == [("ann", 1, 3.0), ("bob", 2, 5.0)]
+    assert [tuple(p) for p in progress] == [("ann", 1, "read")]
+    engine.dispose()
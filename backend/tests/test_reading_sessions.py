@@ -0,0 +1,48 @@
+from datetime import datetime, timedelta
+
+import config
+from session_events import Event, apply_events, session_duration, sweep_stale_sessions
+from tables import ReadingSessionTable, ReadingStatTotalTable
+
+T0 = datetime(2026, 3, 2, 9, 0)
+IDLE = timedelta(seconds=config.READING_IDLE_TIMEOUT_SECONDS)
+
+def seconds(n):
+    return T0 + timedelta(seconds=n)
+
+def test_duration_stops_counting_after_the_idle_timeout():
+    assert session_duration(T0, T0, seconds(60)) == 60
+    assert session_duration(T0, seconds(600), seconds(610)) == 610
+    # no heartbeat for an hour: counts until IDLE after the last one
+    assert session_duration(T0, seconds(300), seconds(3600)) == 300 + IDLE.seconds
+    assert session_duration(T0, None, seconds(3600)) == IDLE.seconds
+
+def test_start_heartbeat_stop_through_the_api(client, login, make_user, make_book, db):
+    username, book_id = make_user(), make_book()
+    headers = login(username, "secret")
+    assert client.post(f"/user/books/{book_id}/start", headers=headers).status_code == 200
+    assert client.post(f"/user/books/{book_id}/heartbeat", headers=headers).status_code == 200
+    assert client.post(f"/user/books/{book_id}/stop", headers=headers).json()["message"] == "Session saved"
+    assert client.post(f"/user/books/{book_id}/stop", headers=headers).json()["message"] == "No active session found"
+    [row] = db.query(ReadingSessionTable).filter_by(username=username).all()
+    assert row.ended_at is not None and row.duration_seconds >= 0
+
+def test_sweeper_closes_silent_sessions_at_their_last_heartbeat(db, make_user, make_book):
+    stale, alive, book_id = make_user(), make_user(), make_book()
+    apply_events(db, [
+        Event("start", stale, book_id, T0), Event("beat", stale, book_id, seconds(90)),
+        Event("start", alive, book_id, T0), Event("beat", alive, book_id, seconds(3000)),
+    ])
+    db.commit()
+    sweep_stale_sessions(db, now=seconds(3000) + IDLE / 2)
+    db.commit()
+
+    rows = {r.username: r for r in db.query(ReadingSessionTable).filter(ReadingSessionTable.username.in_([stale, alive]))}
+    assert rows[stale].ended_at == seconds(90) and rows[stale].duration_seconds == 90
+    assert rows[alive].ended_at is None
+    assert db.get(ReadingStatTotalTable, stale).total_seconds == 90
+    # a late stop for the swept session finds nothing open
+    apply_events(db, [Event("stop", stale, book_id, seconds(4000))])
+    db.commit()
+    db.expire_all()
+    assert db.get(ReadingStatTotalTable, stale).sessions == 1
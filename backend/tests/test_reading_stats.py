@@ -0,0 +1,46 @@
+from datetime import datetime, timedelta
+
+import stats
+from session_events import Event, apply_events
+from tables import ReadingStatTotalTable
+
+T0 = datetime(2026, 3, 2, 9, 0)
+
+def read(db, username, book_id, start, seconds):
+    apply_events(db, [Event("start", username, book_id, start), Event("stop", username, book_id, start + timedelta(seconds=seconds))])
+
+def test_rollups_add_up_per_day_and_user(db, make_user, make_book):
+    username, book_id = make_user(), make_book()
+    read(db, username, book_id, T0, 60)
+    read(db, username, book_id, T0 + timedelta(hours=1), 30)
+    read(db, username, book_id, T0 + timedelta(days=1), 45)
+    db.commit()
+
+    total = db.get(ReadingStatTotalTable, username)
+    assert (total.total_seconds, total.sessions) == (135, 3)
+    daily = stats.reading_summary(db, username, (T0 + timedelta(days=1)).date())
+    assert daily["total"] == 135 and daily["today"] == 45
+    assert stats.check_reading_stats(db) == []
+
+def test_one_batch_with_many_sessions_of_one_key(db, make_user, make_book):
+    username, book_id = make_user(), make_book()
+    events = []
+    for n in range(3):
+        start = T0 + timedelta(minutes=10 * n)
+        events += [Event("start", username, book_id, start), Event("stop", username, book_id, start + timedelta(seconds=20))]
+    apply_events(db, events)
+    db.commit()
+    total = db.get(ReadingStatTotalTable, username)
+    assert (total.total_seconds, total.sessions) == (60, 3)
+    assert stats.check_reading_stats(db) == []
+
+def test_rebuild_matches_incremental_rollups(db, make_user, make_book):
+    username, book_id = make_user(), make_book()
+    read(db, username, book_id, T0, 50)
+    db.commit()
+    before = db.get(ReadingStatTotalTable, username).total_seconds
+    stats.rebuild_reading_stats(db)
+    db.commit()
+    db.expire_all()
+    assert db.get(ReadingStatTotalTable, username).total_seconds == before
+    assert stats.check_reading_stats(db) == []
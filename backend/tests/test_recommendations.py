@@ -0,0 +1,53 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+import recommendations
+from session_events import Event, apply_events
+
+def sample(seed=7, users=60, books=40):
+    rng = random.Random(seed)
+    themes = ["fiction", "history", "science", ""]
+    catalog = {b: (rng.choice(themes), rng.random() > 0.1) for b in range(1, books + 1)}
+    weights = {}
+    for u in range(users):
+        for b in rng.sample(sorted(catalog), rng.randint(1, 8)):
+            # repeated values produce ties, which both engines break by id
+            weights[(f"u{u}", b)] = rng.choice([0.5, 1.0, 1.5, 2.0])
+    popularity = {}
+    for (_, b), w in weights.items():
+        popularity[b] = popularity.get(b, 0.0) + w
+    return weights, catalog, recommendations.theme_candidates(catalog, popularity, 6)
+
+def test_numpy_and_python_engines_rank_the_same():
+    pytest.importorskip("scipy")
+    weights, catalog, by_theme = sample()
+    sources = sorted(catalog)
+    python = recommendations._neighbours_python(weights, catalog, sources, 5, 0.3, by_theme)
+    vector = recommendations._neighbours_numpy(weights, catalog, sources, 5, 0.3, by_theme)
+    for book_id in sources:
+        assert [j for j, _ in python[book_id]] == [j for j, _ in vector[book_id]]
+        assert [s for _, s in python[book_id]] == pytest.approx([s for _, s in vector[book_id]])
+
+def test_recommend_for_user_skips_books_already_read():
+    neighbours = {1: [(2, 0.9), (3, 0.5)], 2: [(1, 0.9), (3, 0.8)]}
+    assert recommendations.recommend_for_user({1: 1.0, 2: 1.0}, neighbours, 5) == [(3, 1.3)]
+
+def test_incremental_refresh_matches_a_full_one(db, make_user, make_book):
+    books = [make_book(theme="poetry") for _ in range(3)]
+    readers = [make_user() for _ in range(3)]
+    at = datetime.utcnow().replace(second=0, microsecond=0)
+    def read(username, book_id):
+        apply_events(db, [Event("start", username, book_id, at), Event("stop", username, book_id, at + timedelta(minutes=5))])
+    read(readers[0], books[0]); read(readers[0], books[1]); read(readers[1], books[0])
+    db.commit()
+    recommendations.refresh(db, full=True)
+
+    read(readers[1], books[2]); read(readers[2], books[1])
+    db.commit()
+    assert recommendations.refresh(db)["mode"] == "incremental"
+    incremental = {u: recommendations.get_recommendations(db, u, 10) for u in readers}
+    recommendations.refresh(db, full=True)
+    assert {u: recommendations.get_recommendations(db, u, 10) for u in readers} == incremental
+    assert books[1] in [b["id"] for b in incremental[readers[1]]["books"]]
@@ -0,0 +1,76 @@
+from sqlalchemy import create_engine, text
+
+import search
+
+def find(client, headers, q):
+    r = client.get("/user/books/search", params={"q": q}, headers=headers)
+    assert r.status_code == 200, r.text
+    return r.json()["results"]
+
+def test_index_follows_edits_and_deletes(client, db, login, make_book):
+    book_id = make_book(title="Indexed", content="Zephyrine winds. " * 50)
+    headers = login("user")
+    assert [b["id"] for b in find(client, headers, "zephyrine")] == [book_id]
+
+    r = client.put(f"/user/books/{book_id}", headers=login("creator"), json={
+        "title": "Reindexed", "author": "Author", "content": "Quillwort marsh. " * 50, "price": 0.0, "is_premium": False,
+    })
+    assert r.status_code == 200, r.text
+    client.post(f"/admin/books/{book_id}/approve", headers=login("admin"))
+    assert find(client, headers, "zephyrine") == [] and find(client, headers, "indexed") == []
+    assert [b["id"] for b in find(client, headers, "quillwort reindexed")] == [book_id]
+
+    assert client.delete(f"/admin/books/{book_id}", headers=login("admin")).status_code == 200
+    assert find(client, headers, "quillwort") == []
+    db.execute(text("INSERT INTO books_fts (books_fts, rank) VALUES ('integrity-check', 1)"))
+
+def test_snippet_is_quoted_from_the_pages(client, login, make_book):
+    book_id = make_book(title="Deep Hit", content="Filler words here. " * 400 + "The glimmerfish surfaced. " + "Tail. " * 50)
+    hit = find(client, login("user"), "glimmer")[0]
+    assert hit["id"] == book_id and hit["title_highlight"] == "Deep Hit"
+    assert "<mark>glimmerfish</mark> surfaced" in hit["snippet"]
+    assert hit["snippet"].startswith("...") and hit["snippet"].endswith("...")
+    assert len(hit["snippet"].replace("<mark>", "").replace("</mark>", "").strip(".").split()) == search.SNIPPET_TOKENS
+
+def test_an_index_with_a_text_copy_is_rebuilt(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        conn.execute(text("CREATE VIRTUAL TABLE books_fts USING fts5(title, author, theme, content)"))
+    assert search.create_search_index(engine) is True
+    with engine.connect() as conn:
+        sql = conn.execute(text("SELECT sql FROM sqlite_master WHERE name = 'books_fts'")).scalar()
+        assert "content = ''" in sql
+    assert search.create_search_index(engine) is False
+
+def test_title_hits_rank_above_content_hits(client, login, make_book):
+    in_content = make_book(title="Plain", content="A tale of the marigoldia flower. " + "Other words here. " * 30)
+    in_title = make_book(title="Marigoldia", content="Nothing to see. " * 30)
+    hits = find(client, login("user"), "marigold")
+    assert [h["id"] for h in hits] == [in_title, in_content]
+    assert hits[0]["title_highlight"] == "<mark>Marigoldia</mark>"
+    assert hits[0]["score"] < hits[1]["score"]  # bm25: lower is better
+    assert "<mark>marigoldia</mark>" in hits[1]["snippet"]
+
+def test_only_approved_books_and_no_premium_quotes(client, login, make_book):
+    headers = login("user")
+    r = client.post("/user/books/", headers=login("creator"), json={
+        "title": "Pending Tamarisk", "author": "Author", "content": "Tamarisk shade. " * 30, "price": 0.0, "is_premium": False,
+    })
+    assert r.status_code == 200
+    assert find(client, headers, "tamarisk") == []
+    premium = make_book(title="Paid Tamarisk", content="Tamarisk secrets. " * 30, price=3.0, is_premium=True)
+    hits = find(client, headers, "tamarisk")
+    assert [h["id"] for h in hits] == [premium] and hits[0]["snippet"] is None and hits[0]["is_premium"] is True
+
+def test_search_pages_and_quotes_user_input(client, login, make_book):
+    ids = {make_book(title=f"Lanternfish {n}") for n in range(3)}
+    headers = login("user")
+    first = client.get("/user/books/search", params={"q": "lanternfish", "limit": 2}, headers=headers).json()
+    assert len(first["results"]) == 2 and first["next_offset"] == 2
+    rest = client.get("/user/books/search", params={"q": "lanternfish", "limit": 2, "offset": 2}, headers=headers).json()
+    assert rest["next_offset"] is None
+    assert {h["id"] for h in first["results"] + rest["results"]} == ids
+    # FTS5 operators in the query are searched as words, never parsed
+    assert client.get("/user/books/search", params={"q": 'lantern" OR NEAR(*'}, headers=headers).status_code == 200
+    assert find(client, headers, "!!!") == []
+    assert client.get("/user/books/search", params={"q": "lanternfish"}).status_code == 401
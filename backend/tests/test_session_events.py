@@ -0,0 +1,144 @@
+import json
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+import session_events
+from session_events import Event, SessionEventQueue
+from tables import ReadingSessionTable
+
+T0 = datetime(2026, 3, 2, 9, 0)
+
+@pytest.fixture
+def queue(tmp_path):
+    queues = []
+    def make(**kwargs):
+        q = SessionEventQueue(60000, 1000, **kwargs)  # flushed by hand
+        queues.append(q)
+        return q
+    yield make
+    for q in queues:
+        q.stop()
+
+def sessions(db, username):
+    db.expire_all()
+    return db.query(ReadingSessionTable).filter_by(username=username).order_by(ReadingSessionTable.id).all()
+
+def test_batch_coalesces_heartbeats_and_closes_sessions(db, queue, make_user, make_book):
+    q, username, book_id = queue(), make_user(), make_book()
+    for kind, seconds in (("start", 0), ("beat", 30), ("beat", 60), ("beat", 90), ("stop", 100)):
+        q.submit(Event(kind, username, book_id, T0 + timedelta(seconds=seconds)))
+    assert q.queued_balance(username, book_id) == 0
+    assert q.flush() == 3  # the three heartbeats became one
+    [row] = sessions(db, username)
+    assert row.ended_at == T0 + timedelta(seconds=100) and row.duration_seconds == 100
+    assert q.stats()["coalesced"] == 2
+
+def test_log_is_replayed_after_a_crash(db, queue, tmp_path, make_user, make_book):
+    log = str(tmp_path / "events.log")
+    username, book_id = make_user(), make_book()
+    crashed = queue(log_path=log)
+    crashed.submit(Event("start", username, book_id, T0))
+    crashed.submit(Event("stop", username, book_id, T0 + timedelta(seconds=40)))
+    crashed._events = []  # the process died before flushing
+
+    restarted = queue(log_path=log)
+    restarted.start()
+    restarted.flush()
+    [row] = sessions(db, username)
+    assert row.duration_seconds == 40
+    assert open(log).read() == ""
+
+def test_failing_event_is_dead_lettered_after_retries(db, queue, tmp_path, monkeypatch, make_user, make_book):
+    dead = tmp_path / "dead.log"
+    q = queue(max_retries=2, dead_letter_path=str(dead))
+    good, book_id = make_user(), make_book()
+    apply_events = session_events.apply_events
+    def flaky(db, events):
+        if any(e.username == "poison" for e in events):
+            raise IntegrityError("INSERT", {}, Exception("constraint failed"))
+        apply_events(db, events)
+    monkeypatch.setattr(session_events, "apply_events", flaky)
+
+    q.submit(Event("start", good, book_id, T0))
+    q.submit(Event("start", "poison", book_id, T0))
+    q.submit(Event("stop", good, book_id, T0 + timedelta(seconds=10)))
+    with pytest.raises(IntegrityError):
+        q.flush()
+    assert q.stats()["queued"] == 3 and sessions(db, good) == []
+
+    q.flush()  # second failure in a row: bisect
+    assert q.stats()["queued"] == 0
+    [row] = sessions(db, good)
+    assert row.duration_seconds == 10
+    assert [json.loads(line)[:2] for line in dead.read_text().splitlines()] == [["start", "poison"]]
+    assert q.stats()["dead_lettered"] == 1 and q.stats()["errors"] == 2
+
+    q.submit(Event("start", good, book_id, T0 + timedelta(minutes=5)))
+    assert q.flush() == 1  # later events are not held up
+
+def locked(*args):
+    raise OperationalError("UPDATE", {}, Exception("database is locked"))
+
+def test_outage_is_retried_with_backoff_and_never_dead_lettered(db, queue, tmp_path, monkeypatch, make_user, make_book):
+    dead = tmp_path / "dead.log"
+    q = queue(max_retries=2, dead_letter_path=str(dead), max_backoff_ms=4000)
+    q.interval = 0.5
+    username, book_id = make_user(), make_book()
+    q.submit(Event("start", username, book_id, T0))
+    q.submit(Event("stop", username, book_id, T0 + timedelta(seconds=20)))
+
+    monkeypatch.setattr(session_events, "apply_events", locked)
+    backoffs = []
+    for _ in range(6):
+        with pytest.raises(OperationalError):
+            q.flush()
+        backoffs.append(q.backoff())
+    assert backoffs == [0.5, 1, 2, 4, 4, 4]
+    assert q.stats()["queued"] == 2 and q.stats()["dead_lettered"] == 0 and not dead.exists()
+
+    monkeypatch.undo()
+    assert q.flush() == 2
+    [row] = sessions(db, username)
+    assert row.duration_seconds == 20
+
+def test_outage_while_bisecting_requeues_the_rest(db, queue, tmp_path, monkeypatch, make_user, make_book):
+    q = queue(max_retries=1, dead_letter_path=str(tmp_path / "dead.log"))
+    good, book_id = make_user(), make_book()
+    apply_events = session_events.apply_events
+    calls = []
+    def failing(db, events):
+        calls.append(len(events))
+        if len(calls) == 5:  # the database goes away in the middle
+            locked()
+        if any(e.username == "poison" for e in events):
+            raise IntegrityError("INSERT", {}, Exception("constraint failed"))
+        apply_events(db, events)
+    monkeypatch.setattr(session_events, "apply_events", failing)
+
+    q.submit(Event("start", "poison", book_id, T0))
+    q.submit(Event("start", good, book_id, T0))
+    q.submit(Event("stop", good, book_id, T0 + timedelta(seconds=10)))
+    q.submit(Event("start", good, book_id, T0 + timedelta(minutes=1)))
+    with pytest.raises(OperationalError):
+        q.flush()  # batch, batch again, first half, "poison" alone, then the outage
+    assert calls == [4, 4, 2, 1, 1]
+    assert q.stats()["dead_lettered"] == 1
+    assert q.stats()["queued"] == 3  # everything after "poison" is retried
+
+    monkeypatch.setattr(session_events, "apply_events", apply_events)
+    assert q.flush() == 3
+    assert [row.duration_seconds for row in sessions(db, good)] == [10, 0]
+
+def test_sweep_errors_are_counted(queue, monkeypatch):
+    q = queue()
+    monkeypatch.setattr(session_events, "sweep_stale_sessions", locked)
+    q._next_sweep = 0
+    q.interval = 0.01
+    q.start()
+    deadline = datetime.now() + timedelta(seconds=5)
+    while q.stats()["sweep_errors"] == 0 and datetime.now() < deadline:
+        time.sleep(0.01)
+    assert q.stats()["sweep_errors"] >= 1
@@ -0,0 +1,79 @@
+import hashlib
+import hmac
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import config
+import signed_tokens
+from conftest import BACKEND
+from token_store import create_token_store
+
+@pytest.fixture
+def signed(monkeypatch):
+    monkeypatch.setattr(config, "AUTH_TOKEN_MODE", "signed")
+    monkeypatch.setattr(config, "TOKEN_SECRET", "test-secret")
+
+def test_signed_mode_refuses_to_start_without_a_secret(tmp_path):
+    env = {**os.environ, "AUTH_TOKEN_MODE": "signed", "TOKEN_SECRET": "",
+           "DATABASE_URL": f"sqlite:///{tmp_path / 'library.db'}"}
+    result = subprocess.run([sys.executable, "-c", "import main"], cwd=BACKEND, env=env, capture_output=True, text=True)
+    assert result.returncode != 0
+    assert "needs TOKEN_SECRET" in result.stderr
+
+def test_tokens_are_only_valid_under_the_shared_secret(client, signed):
+    tokens = client.post("/auth/login", data={"username": "user", "password": "user"}).json()
+    assert tokens["access_token"].count(".") == 2 and tokens["refresh_token"]
+    headers = {"Authorization": "Bearer " + tokens["access_token"]}
+    assert client.get("/user/books", headers=headers).status_code == 200
+    config.TOKEN_SECRET = "another-secret"  # a worker with a different key
+    assert client.get("/user/books", headers=headers).status_code == 401
+
+def test_refresh_rotates_and_is_single_use(client, signed):
+    tokens = client.post("/auth/login", data={"username": "user", "password": "user"}).json()
+    body = {"refresh_token": tokens["refresh_token"]}
+    first = client.post("/auth/refresh", json=body)
+    assert first.status_code == 200 and first.json()["refresh_token"] != tokens["refresh_token"]
+    assert client.post("/auth/refresh", json=body).status_code == 401
+
+@pytest.mark.parametrize("kind", ["memory", "sqlite", "redis-local"])
+def test_concurrent_consume_redeems_once(client, kind):
+    store = create_token_store(kind)
+    store.issue("refresh:abc", "user")
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(lambda _: store.consume("refresh:abc"), range(8)))
+    assert results.count("user") == 1 and results.count(None) == 7
+    assert store.get("refresh:abc") is None
+
+def test_logout_is_seen_by_every_worker(client, signed, monkeypatch):
+    monkeypatch.setattr(signed_tokens, "token_store", create_token_store("sqlite"))
+    tokens = client.post("/auth/login", data={"username": "user", "password": "user"}).json()
+    headers = {"Authorization": "Bearer " + tokens["access_token"]}
+    assert client.post("/auth/logout", headers=headers).status_code == 200
+
+    monkeypatch.setattr(signed_tokens, "token_store", create_token_store("sqlite"))  # another worker
+    assert client.get("/user/books", headers=headers).status_code == 401
+
+def _forge(claims, secret=""):
+    signing_input = signed_tokens.HEADER + "." + signed_tokens._b64(json.dumps(claims).encode())
+    signature = hmac.new(secret.encode(), signing_input.encode(), hashlib.sha256).digest()
+    return signing_input + "." + signed_tokens._b64(signature)
+
+@pytest.mark.parametrize("secret", ["", "test-secret"])
+def test_signed_tokens_are_refused_in_opaque_mode(client, monkeypatch, secret):
+    monkeypatch.setattr(config, "TOKEN_SECRET", secret)
+    token = _forge({"sub": "admin", "role": "admin", "exp": time.time() + 600, "jti": "x"}, secret)
+    headers = {"Authorization": "Bearer " + token}
+    assert client.get("/admin/summary", headers=headers).status_code == 401
+    assert client.get("/admin/export/users", headers=headers).status_code == 401
+
+def test_an_empty_secret_never_verifies(monkeypatch):
+    monkeypatch.setattr(config, "AUTH_TOKEN_MODE", "signed")
+    monkeypatch.setattr(config, "TOKEN_SECRET", "")
+    token = _forge({"sub": "admin", "role": "admin", "exp": time.time() + 600, "jti": "x"})
+    assert signed_tokens.verify_access_token(token) is None
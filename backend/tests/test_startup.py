@@ -0,0 +1,18 @@
+from sqlalchemy import inspect, text
+
+from database import Base, create_db_engine
+from migrations import run_migrations
+
+def test_app_starts_and_serves(client, login):
+    assert client.get("/user/books", headers=login("user")).status_code == 200
+
+def test_migrations_are_idempotent(tmp_path):
+    engine = create_db_engine(f"sqlite:///{tmp_path / 'library.db'}", profile="default")
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    run_migrations(engine)  # every later start
+    with engine.connect() as conn:
+        indexes = {name for (name,) in conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'"))}
+    assert {"ix_users_name_lower", "ix_users_email_lower", "ix_users_role_id"} <= indexes
+    assert inspect(engine).has_table("counters")
+    engine.dispose()
@@ -0,0 +1,32 @@
+import storage
+
+def test_pages_round_trip_compressed(client, login, make_book):
+    text = "Chapter one. " * 2000
+    book_id = make_book(content=text)
+    r = client.get(f"/user/books/{book_id}", headers=login("user"))
+    assert r.json()["content"] == text
+
+def test_search_index_keeps_no_copy_of_the_text(db, make_book):
+    before = storage.content_report(db)["search_index"]["text_copy_bytes"]
+    make_book(title="Copyless", content="Compressible text. " * 2000, theme="essay")
+    report = storage.content_report(db)
+    assert report["ratio"] > 1
+    fts = report["search_index"]
+    # only the indexed title, author and theme are kept, for removing entries
+    assert fts["text_copy_bytes"] - before == len("Copyless" + "Author" + "essay")
+    assert report["stored_bytes_with_search_index"] == report["stored_bytes"] + fts["text_copy_bytes"] + fts["index_bytes"]
+
+def test_content_stream_page_range(client, login, make_book):
+    text = "Page text. " * 800
+    book_id = make_book(content=text)
+    headers = login("user")
+    url = f"/user/books/{book_id}/content"
+    whole = client.get(url, headers=headers)
+    assert whole.text == text
+    pages = int(whole.headers["x-page-count"])
+    assert pages > 1
+    first = client.get(url, params={"end_page": 1}, headers=headers).text
+    assert first + client.get(url, params={"start_page": 2}, headers=headers).text == text
+    past = client.get(url, params={"start_page": pages + 1}, headers=headers)
+    assert past.status_code == 404 and past.headers["x-page-count"] == str(pages)
+    assert client.get(url, params={"start_page": 2, "end_page": 1}, headers=headers).status_code == 416
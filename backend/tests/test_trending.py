@@ -0,0 +1,27 @@
+from datetime import datetime, timedelta
+
+import trending
+from tables import BookActivityTable
+
+def test_record_accumulates_into_hour_and_day_buckets(db, make_book):
+    book_id = make_book()
+    at = datetime(2026, 3, 2, 9, 15)
+    trending.record(db.connection(), [(book_id, at, "reads"), (book_id, at, "purchases")])
+    trending.record(db.connection(), [(book_id, at + timedelta(minutes=30), "reads")])
+    buckets = {
+        (row.granularity, row.bucket_start): (row.reads, row.purchases, row.comments)
+        for row in db.query(BookActivityTable).filter(BookActivityTable.book_id == book_id)
+    }
+    assert buckets == {
+        ("hour", datetime(2026, 3, 2, 9)): (2, 1, 0),
+        ("day", datetime(2026, 3, 2)): (2, 1, 0),
+    }
+    db.rollback()
+
+def test_ranking_orders_by_weighted_activity(db, make_book):
+    quiet, busy = make_book(), make_book()
+    now = datetime.utcnow()
+    trending.record(db.connection(), [(quiet, now, "reads"), (busy, now, "purchases")])
+    ranking = [book_id for book_id, _ in trending.compute_ranking(db, "day", now)["global"]]
+    assert ranking.index(busy) < ranking.index(quiet)
+    db.rollback()
@@ -0,0 +1,159 @@
+import hashlib
+import time
+from datetime import datetime, timedelta
+
+import config
+from cache import TTLCache
+from database import SessionLocal
+from tables import AuthTokenTable
+
+try:
+    import redis
+except ImportError:  # only needed for TOKEN_STORE=redis
+    redis = None
+
+# --- LOGIN SESSION STORES ---
+# Map bearer token -> username with a sliding TTL. Every backend offers
+# issue / get / revoke, and consume (get and revoke in one atomic step, so
+# a single-use token is redeemed at most once); pick one with TOKEN_STORE
+# (see config.py). The sqlite and redis stores are shared by all uvicorn
+# workers.
+
+def _hash(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+class MemoryTokenStore:
+    # per-process: fine for a single worker and for tests
+    def __init__(self, ttl: int, maxsize: int):
+        self.ttl = ttl
+        self.tokens = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def issue(self, token: str, username: str):
+        self.tokens.set(token, username)
+
+    def get(self, token: str):
+        return self.tokens.get(token, touch=True)
+
+    def revoke(self, token: str):
+        self.tokens.pop(token)
+
+    def consume(self, token: str):
+        # only one caller gets the entry out of pop()
+        if self.tokens.get(token) is None:
+            return None
+        return self.tokens.pop(token)
+
+class SQLiteTokenStore:
+    def __init__(self, ttl: int, session_factory=SessionLocal):
+        self.ttl = ttl
+        self.session_factory = session_factory
+
+    def issue(self, token: str, username: str):
+        now = datetime.utcnow()
+        with self.session_factory() as db:
+            db.query(AuthTokenTable).filter(AuthTokenTable.expires_at <= now).delete()
+            db.add(AuthTokenTable(token_hash=_hash(token), username=username,
+                                  expires_at=now + timedelta(seconds=self.ttl)))
+            db.commit()
+
+    def get(self, token: str):
+        now = datetime.utcnow()
+        with self.session_factory() as db:
+            row = db.get(AuthTokenTable, _hash(token))
+            if not row or row.expires_at <= now:
+                return None
+            # slide the expiry, but only write once half the TTL has been used
+            if row.expires_at - now < timedelta(seconds=self.ttl / 2):
+                row.expires_at = now + timedelta(seconds=self.ttl)
+                db.commit()
+            return row.username
+
+    def revoke(self, token: str):
+        with self.session_factory() as db:
+            db.query(AuthTokenTable).filter(AuthTokenTable.token_hash == _hash(token)).delete()
+            db.commit()
+
+    def consume(self, token: str):
+        # whoever deletes the row owns it; a concurrent caller deletes nothing
+        with self.session_factory() as db:
+            row = db.get(AuthTokenTable, _hash(token))
+            if not row or row.expires_at <= datetime.utcnow():
+                return None
+            deleted = db.query(AuthTokenTable).filter(AuthTokenTable.token_hash == row.token_hash).delete()
+            db.commit()
+            return row.username if deleted else None
+
+class RedisTokenStore:
+    # works with redis.Redis or anything exposing get/set(ex=)/expire/delete
+    def __init__(self, ttl: int, client):
+        self.ttl = ttl
+        self.client = client
+
+    def _key(self, token: str):
+        return f"auth:token:{_hash(token)}"
+
+    def issue(self, token: str, username: str):
+        self.client.set(self._key(token), username, ex=self.ttl)
+
+    def get(self, token: str):
+        key = self._key(token)
+        username = self.client.get(key)
+        if username is None:
+            return None
+        self.client.expire(key, self.ttl)
+        return username.decode() if isinstance(username, bytes) else username
+
+    def revoke(self, token: str):
+        self.client.delete(self._key(token))
+
+    def consume(self, token: str):
+        username = self.client.getdel(self._key(token))  # GETDEL, Redis >= 6.2
+        return username.decode() if isinstance(username, bytes) else username
+
+class LocalRedis:
+    # in-process stand-in for the few redis commands RedisTokenStore uses
+    def __init__(self):
+        self.data = {}
+
+    def _alive(self, key):
+        item = self.data.get(key)
+        if item and item[0] is not None and item[0] <= time.monotonic():
+            del self.data[key]
+            return None
+        return item
+
+    def get(self, key):
+        item = self._alive(key)
+        return item[1] if item else None
+
+    def set(self, key, value, ex=None):
+        self.data[key] = (time.monotonic() + ex if ex else None, value)
+        return True
+
+    def expire(self, key, seconds):
+        item = self._alive(key)
+        if not item:
+            return False
+        self.data[key] = (time.monotonic() + seconds, item[1])
+        return True
+
+    def delete(self, key):
+        return 1 if self.data.pop(key, None) else 0
+
+    def getdel(self, key):
+        value = self.get(key)
+        self.data.pop(key, None)
+        return value
+
+def create_token_store(kind: str = config.TOKEN_STORE):
+    if kind == "sqlite":
+        return SQLiteTokenStore(config.TOKEN_TTL_SECONDS)
+    if kind == "redis":
+        if redis is None:
+            raise RuntimeError("TOKEN_STORE=redis needs the 'redis' package")
+        return RedisTokenStore(config.TOKEN_TTL_SECONDS, redis.Redis.from_url(config.REDIS_URL))
+    if kind == "redis-local":
+        return RedisTokenStore(config.TOKEN_TTL_SECONDS, LocalRedis())
+    return MemoryTokenStore(config.TOKEN_TTL_SECONDS, config.TOKEN_STORE_MAX_ENTRIES)
+
+token_store = create_token_store()
@@ -0,0 +1,166 @@
+import math
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, event, insert
+from sqlalchemy.orm import Session
+
+import config
+from cache import TTLCache
+from database import add_to_rows
+from tables import BookActivityTable, BookTable, CommentTable, PurchaseTable, ReadingSessionTable
+
+# --- TRENDING BOOKS ---
+# book_activity counts reads (session starts), purchases and comments per
+# book in hourly and daily buckets. Every event adds 1 to its hour and day
+# bucket in the writing transaction:
+#   reads      session_events.apply_events (one update per bucket per batch)
+#   purchases  PurchaseTable insert hook below
+#   comments   CommentTable insert hook below
+# A ranking sums the buckets of its window with exponential decay by age
+# and event weight. It is computed once per TRENDING_CACHE_SECONDS into
+# sorted lists (global and per theme) that the endpoints slice.
+# rebuild() repopulates the buckets from reading_sessions, purchases and
+# comments and drops buckets older than the retention
+# (python manage.py rebuild-trending).
+
+WEIGHTS = {"reads": 1.0, "purchases": 3.0, "comments": 2.0}
+GRANULARITIES = {"hour": timedelta(hours=1), "day": timedelta(days=1)}
+# window -> (bucket granularity, span, half-life)
+WINDOWS = {
+    "day": ("hour", timedelta(hours=24), timedelta(hours=6)),
+    "week": ("day", timedelta(days=7), timedelta(days=2)),
+    "month": ("day", timedelta(days=30), timedelta(days=7)),
+}
+
+ranking_cache = TTLCache(len(WINDOWS), config.TRENDING_CACHE_SECONDS)
+
+def bucket_start(at: datetime, granularity: str) -> datetime:
+    at = at.replace(minute=0, second=0, microsecond=0)
+    return at.replace(hour=0) if granularity == "day" else at
+
+def activity_deltas(events):
+    # events: (book_id, at, kind) with kind in WEIGHTS -> Counter keyed by bucket
+    deltas = Counter()
+    for book_id, at, kind in events:
+        for granularity in GRANULARITIES:
+            deltas[(book_id, granularity, bucket_start(at, granularity), kind)] += 1
+    return deltas
+
+def _buckets(deltas):
+    buckets = defaultdict(dict)
+    for (book_id, granularity, start, kind), n in deltas.items():
+        buckets[(book_id, granularity, start)][kind] = n
+    return buckets
+
+def add(connection, deltas):
+    # one upsert for all buckets, like counters.add
+    add_to_rows(connection, BookActivityTable, ["book_id", "granularity", "bucket_start"], [
+        {"book_id": book_id, "granularity": granularity, "bucket_start": start,
+         **{kind: counts.get(kind, 0) for kind in WEIGHTS}}
+        for (book_id, granularity, start), counts in _buckets(deltas).items()
+    ])
+
+def record(connection, events):
+    add(connection, activity_deltas(events))
+
+# --- RANKINGS ---
+def compute_ranking(db: Session, window: str, now: datetime = None):
+    # -> {"global": [(book_id, score)], "themes": {theme: [(book_id, score)]}}, best first
+    granularity, span, half_life = WINDOWS[window]
+    now = now or datetime.utcnow()
+    A = BookActivityTable
+    rows = db.query(A.book_id, A.bucket_start, A.reads, A.purchases, A.comments, BookTable.theme)\
+        .join(BookTable, BookTable.id == A.book_id)\
+        .filter(A.granularity == granularity, A.bucket_start >= bucket_start(now - span, granularity),
+                BookTable.status == "approved")
+    scores, themes = defaultdict(float), {}
+    middle = GRANULARITIES[granularity] / 2
+    for row in rows:
+        age = max((now - (row.bucket_start + middle)).total_seconds(), 0.0)
+        decay = math.pow(0.5, age / half_life.total_seconds())
+        scores[row.book_id] += decay * (WEIGHTS["reads"] * (row.reads or 0)
+                                        + WEIGHTS["purchases"] * (row.purchases or 0)
+                                        + WEIGHTS["comments"] * (row.comments or 0))
+        themes[row.book_id] = (row.theme or "").strip().lower()
+    ranked = sorted(scores.items(), key=lambda kv: (-kv[1], kv[0]))
+    by_theme = defaultdict(list)
+    for book_id, score in ranked:
+        if themes[book_id]:
+            by_theme[themes[book_id]].append((book_id, score))
+    return {"global": ranked, "themes": dict(by_theme)}
+
+def get_ranking(db: Session, window: str):
+    ranking = ranking_cache.get(window)
+    if ranking is None:
+        ranking = compute_ranking(db, window)
+        ranking_cache.set(window, ranking)
+    return ranking
+
+def trending_books(db: Session, window: str, limit: int, theme: str = None):
+    ranking = get_ranking(db, window)
+    top = ranking["themes"].get(theme.strip().lower(), []) if theme else ranking["global"]
+    top = top[:limit]
+    if not top:
+        return []
+    books = {
+        b.id: b for b in db.query(
+            BookTable.id, BookTable.title, BookTable.author, BookTable.theme,
+            BookTable.price, BookTable.is_premium,
+        ).filter(BookTable.id.in_([book_id for book_id, _ in top]))
+    }
+    return [{**books[book_id]._mapping, "score": round(score, 4)} for book_id, score in top if book_id in books]
+
+# --- REBUILD ---
+def rebuild(db: Session, now: datetime = None):
+    now = now or datetime.utcnow()
+    since = {
+        "hour": bucket_start(now - timedelta(hours=config.TRENDING_HOURLY_RETENTION_HOURS), "hour"),
+        "day": bucket_start(now - timedelta(days=config.TRENDING_DAILY_RETENTION_DAYS), "day"),
+    }
+    oldest = min(since.values())
+    sources = [
+        (db.query(ReadingSessionTable.book_id, ReadingSessionTable.started_at)
+         .filter(ReadingSessionTable.started_at >= oldest), "reads"),
+        (db.query(PurchaseTable.book_id, PurchaseTable.purchased_at)
+         .filter(PurchaseTable.purchased_at >= oldest), "purchases"),
+        (db.query(CommentTable.book_id, CommentTable.created_at)
+         .filter(CommentTable.created_at >= oldest), "comments"),
+    ]
+    deltas = Counter()
+    for query, kind in sources:
+        for book_id, at in query.yield_per(1000):
+            for granularity in GRANULARITIES:
+                if at >= since[granularity]:
+                    deltas[(book_id, granularity, bucket_start(at, granularity), kind)] += 1
+    rows = [
+        {"book_id": book_id, "granularity": granularity, "bucket_start": start,
+         **{kind: counts.get(kind, 0) for kind in WEIGHTS}}
+        for (book_id, granularity, start), counts in _buckets(deltas).items()
+    ]
+    db.execute(delete(BookActivityTable))
+    if rows:
+        db.execute(insert(BookActivityTable), rows)
+    ranking_cache.clear()
+    return len(rows)
+
+def prune(db: Session, now: datetime = None):
+    # drop buckets past the retention
+    now = now or datetime.utcnow()
+    A = BookActivityTable
+    removed = 0
+    for granularity, keep in (("hour", timedelta(hours=config.TRENDING_HOURLY_RETENTION_HOURS)),
+                              ("day", timedelta(days=config.TRENDING_DAILY_RETENTION_DAYS))):
+        removed += db.execute(delete(A).where(
+            A.granularity == granularity, A.bucket_start < bucket_start(now - keep, granularity),
+        )).rowcount
+    return removed
+
+# --- ORM HOOKS ---
+@event.listens_for(PurchaseTable, "after_insert")
+def _purchase_inserted(mapper, connection, purchase):
+    record(connection, [(purchase.book_id, purchase.purchased_at or datetime.utcnow(), "purchases")])
+
+@event.listens_for(CommentTable, "after_insert")
+def _comment_inserted(mapper, connection, comment):
+    record(connection, [(comment.book_id, comment.created_at or datetime.utcnow(), "comments")])
@@ -21,24 +21,48 @@ export async function apiLogin(username, password) {
   return parseJson(res);
 }
 
-export async function apiGet(path, token) {
-  const headers = {};
-  if (token) headers.Authorization = `Bearer ${token}`;
+// Signed-token mode: access tokens are short-lived. On a 401, trade the
+// refresh token for a new access token once and retry the request.
+async function refreshAccessToken() {
+  const raw = localStorage.getItem("auth");
+  const auth = raw ? JSON.parse(raw) : null;
+  if (!auth?.refresh_token) return null;
+
+  const res = await fetch(`${API_URL}/auth/refresh`, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ refresh_token: auth.refresh_token }),
+  });
+  if (!res.ok) return null;
+  const data = await res.json();
+  localStorage.setItem("auth", JSON.stringify({ ...auth, ...data }));
+  return data.access_token;
+}
+
+async function fetchWithRefresh(url, options, token) {
+  const withToken = (t) => ({ ...options, headers: { ...options.headers, ...(t ? { Authorization: `Bearer ${t}` } : {}) } });
+  let res = await fetch(url, withToken(token));
+  if (res.status === 401 && token) {
+    const fresh = await refreshAccessToken();
+    if (fresh) res = await fetch(url, withToken(fresh));
+  }
+  return res;
+}
 
-  const res = await fetch(`${API_URL}${path}`, { headers });
+export async function apiGet(path, token) {
+  const res = await fetchWithRefresh(`${API_URL}${path}`, { headers: {} }, token);
   return parseJson(res);
 }
 
 // ✅ UPDATED POST FUNCTION
 export async function apiPost(endpoint, body, token) {
   const headers = { "Content-Type": "application/json" };
-  if (token) headers["Authorization"] = `Bearer ${token}`;
 
-  const res = await fetch(`${API_URL}${endpoint}`, {
+  const res = await fetchWithRefresh(`${API_URL}${endpoint}`, {
     method: "POST",   // <--- THIS LINE IS CRITICAL. MUST BE "POST"
     headers,
     body: JSON.stringify(body),
-  });
+  }, token);
 
   return parseJson(res);
 }
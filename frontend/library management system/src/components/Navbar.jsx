@@ -1,11 +1,14 @@
 import { Link, useNavigate } from "react-router-dom";
 import { getAuth, clearAuth } from "../auth";
+import { apiPost } from "../api";
 
 export default function Navbar() {
   const auth = getAuth(); // { name, role, ... }
   const nav = useNavigate();
 
   function logout() {
+    // revoke the session server-side; log out locally even if that fails
+    apiPost("/auth/logout", { refresh_token: auth?.refresh_token }, auth?.access_token).catch(() => {});
     clearAuth();
     nav("/login");
   }
@@ -22,22 +22,46 @@ export default function Admin() {
   const [books, setBooks] = useState([]);
   const [activeTab, setActiveTab] = useState("books"); // 'books' or 'users'
   const [msg, setMsg] = useState(null);
+  const [selected, setSelected] = useState([]); // book ids for bulk moderation
   
   // Single Filter State
   const [searchTerm, setSearchTerm] = useState("");
 
+  // Users are paged on the server: role filter + name/email prefix
+  const [userRole, setUserRole] = useState("");
+  const [userQuery, setUserQuery] = useState("");
+  const [usersTotal, setUsersTotal] = useState(null);
+  const [usersCursor, setUsersCursor] = useState(null);
+
   useEffect(() => {
     loadAll();
   }, []);
 
+  useEffect(() => {
+    const t = setTimeout(() => loadUsers(), 300);
+    return () => clearTimeout(t);
+  }, [userRole, userQuery]);
+
+  async function loadUsers(cursor = null) {
+    try {
+      const params = new URLSearchParams({ limit: "50" });
+      if (userRole) params.set("role", userRole);
+      if (userQuery.trim()) params.set("q", userQuery.trim());
+      if (cursor) params.set("cursor", cursor);
+      const page = await apiGet(`/admin/users?${params}`, auth?.access_token);
+      setUsers(prev => (cursor ? [...prev, ...page.users] : page.users));
+      setUsersCursor(page.next_cursor);
+      setUsersTotal(page.total_is_estimate ? `~${page.total}` : page.total);
+    } catch (e) {
+      console.error(e);
+    }
+  }
+
   async function loadAll() {
     try {
       const s = await apiGet("/admin/summary", auth?.access_token);
       setStats(s.stats);
 
-      const u = await apiGet("/admin/users", auth?.access_token);
-      setUsers(u);
-
       const b = await apiGet("/admin/books", auth?.access_token);
       // Sort: Pending first, then by ID
       b.sort((x, y) => (x.status === "pending" ? -1 : 1));
@@ -65,6 +89,33 @@ export default function Admin() {
     }
   }
 
+  // One request for the whole selection; failures are listed per book
+  async function handleBulkAction(action) {
+    if (selected.length === 0) return;
+    if (action === "delete" && !confirm(`Permanently delete ${selected.length} books?`)) return;
+    setMsg(null);
+    try {
+      let updated = 0;
+      const failed = [];
+      for (let i = 0; i < selected.length; i += 500) { // the endpoint takes 500 ids per call
+        const res = await apiPost("/admin/books/batch", { action, ids: selected.slice(i, i + 500) }, auth?.access_token);
+        updated += res.updated;
+        failed.push(...res.results.filter(r => !r.ok));
+      }
+      setMsg(failed.length
+        ? { type: "error", text: `${updated} books ${action}d, failed: ${failed.map(r => `#${r.id} (${r.error})`).join(", ")}` }
+        : { type: "success", text: `${updated} books ${action}d.` });
+      setSelected([]);
+      loadAll();
+    } catch (e) {
+      setMsg({ type: "error", text: e.message });
+    }
+  }
+
+  function toggleSelected(bookId) {
+    setSelected(prev => (prev.includes(bookId) ? prev.filter(id => id !== bookId) : [...prev, bookId]));
+  }
+
   // Filter Logic: Single Search Term
   const filteredBooks = books.filter(book => {
     if (!searchTerm) return true;
@@ -137,9 +188,26 @@ export default function Admin() {
                  />
               </div>
 
+              {selected.length > 0 && (
+                <div style={styles.bulkBar}>
+                  <span>{selected.length} selected</span>
+                  <button style={styles.btnBulkApprove} onClick={() => handleBulkAction("approve")}>✓ Approve</button>
+                  <button style={styles.btnBulkReject} onClick={() => handleBulkAction("reject")}>✗ Reject</button>
+                  <button style={styles.btnBulkDelete} onClick={() => handleBulkAction("delete")}>🗑 Delete</button>
+                  <button style={styles.btnBulkClear} onClick={() => setSelected([])}>Clear</button>
+                </div>
+              )}
+
               <table style={styles.table}>
                 <thead>
                   <tr style={styles.trHead}>
+                    <th style={styles.th}>
+                      <input
+                        type="checkbox"
+                        checked={filteredBooks.length > 0 && filteredBooks.every(b => selected.includes(b.id))}
+                        onChange={e => setSelected(e.target.checked ? filteredBooks.map(b => b.id) : [])}
+                      />
+                    </th>
                     <th style={styles.th}>ID</th>
                     <th style={styles.th}>Title</th>
                     <th style={styles.th}>Author</th>
@@ -152,6 +220,9 @@ export default function Admin() {
                 <tbody>
                   {filteredBooks.map(book => (
                     <tr key={book.id} style={styles.tr}>
+                      <td style={styles.td}>
+                        <input type="checkbox" checked={selected.includes(book.id)} onChange={() => toggleSelected(book.id)} />
+                      </td>
                       <td style={styles.td}>#{book.id}</td>
                       <td style={{...styles.td, fontWeight: "600"}}>{book.title}</td>
                       <td style={styles.td}>{book.author}</td>
@@ -174,7 +245,7 @@ export default function Admin() {
                     </tr>
                   ))}
                   {filteredBooks.length === 0 && (
-                    <tr><td colSpan="7" style={styles.emptyTd}>No matching books found.</td></tr>
+                    <tr><td colSpan="8" style={styles.emptyTd}>No matching books found.</td></tr>
                   )}
                 </tbody>
               </table>
@@ -183,6 +254,26 @@ export default function Admin() {
 
           {/* --- USERS TABLE --- */}
           {activeTab === "users" && (
+            <>
+              <div style={{padding: "20px 20px 0 20px", display: "flex", gap: "10px"}}>
+                <input
+                  style={styles.searchBar}
+                  placeholder="🔍 Name or email starts with..."
+                  value={userQuery}
+                  onChange={e => setUserQuery(e.target.value)}
+                />
+                <select style={{...styles.searchBar, width: "160px"}} value={userRole} onChange={e => setUserRole(e.target.value)}>
+                  <option value="">All roles</option>
+                  <option value="user">User</option>
+                  <option value="creator">Creator</option>
+                  <option value="admin">Admin</option>
+                </select>
+              </div>
+              {usersTotal !== null && (
+                <div style={{padding: "0 20px 10px 20px", color: "#64748b", fontSize: "13px"}}>
+                  Showing {users.length} of {usersTotal} users
+                </div>
+              )}
             <table style={styles.table}>
               <thead>
                 <tr style={styles.trHead}>
@@ -205,8 +296,17 @@ export default function Admin() {
                     </td>
                   </tr>
                 ))}
+                {users.length === 0 && (
+                  <tr><td colSpan="5" style={styles.emptyTd}>No matching users found.</td></tr>
+                )}
               </tbody>
             </table>
+              {usersCursor && (
+                <div style={{padding: "15px", textAlign: "center"}}>
+                  <button style={styles.btnBulkClear} onClick={() => loadUsers(usersCursor)}>Load more</button>
+                </div>
+              )}
+            </>
           )}
 
         </div>
@@ -278,5 +378,11 @@ const styles = {
   badgePremium: { background: "#e0f2fe", color: "#0284c7", padding: "2px 6px", borderRadius: "4px", fontSize: "11px", fontWeight: "bold" },
   roleBadge: { background: "#f3f4f6", color: "#4b5563", padding: "3px 8px", borderRadius: "4px", fontSize: "12px", textTransform: "capitalize" },
   
+  bulkBar: { display: "flex", alignItems: "center", gap: "10px", padding: "0 20px 15px 20px", fontSize: "14px", color: "#334155" },
+  btnBulkApprove: { background: "#22c55e", color: "white", border: "none", padding: "6px 12px", borderRadius: "6px", cursor: "pointer" },
+  btnBulkReject: { background: "#f59e0b", color: "white", border: "none", padding: "6px 12px", borderRadius: "6px", cursor: "pointer" },
+  btnBulkDelete: { background: "#ef4444", color: "white", border: "none", padding: "6px 12px", borderRadius: "6px", cursor: "pointer" },
+  btnBulkClear: { background: "#e2e8f0", color: "#475569", border: "none", padding: "6px 12px", borderRadius: "6px", cursor: "pointer" },
+
   msgBox: { padding: "10px", borderRadius: "6px", marginBottom: "20px", fontSize: "14px", fontWeight: "500", textAlign: "center" }
 };
@@ -19,6 +19,8 @@ export default function Creator() {
   const auth = getAuth();
   const [data, setData] = useState(null);
   const [books, setBooks] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [analytics, setAnalytics] = useState(null);
   
   const [isModalOpen, setIsModalOpen] = useState(false);
   const [editingBook, setEditingBook] = useState(null);
@@ -34,16 +36,30 @@ export default function Creator() {
     loadMyBooks();
   }, []);
 
-  async function loadMyBooks() {
+  // counts come from /summary, the books themselves are paged
+  async function loadMyBooks(cursor = null) {
     try {
-      const res = await apiGet("/user/summary", auth?.access_token);
-      setData(res);
-      setBooks(res.books || []);
+      if (!cursor) {
+        const res = await apiGet("/user/summary", auth?.access_token);
+        setData(res);
+        // per-book readers, reading time and sales for the last 30 days of series
+        apiGet("/user/analytics?days=30", auth?.access_token)
+          .then(setAnalytics)
+          .catch(() => setAnalytics(null));
+      }
+      const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : "";
+      const page = await apiGet(`/user/my-books${query}`, auth?.access_token);
+      setBooks(prev => (cursor ? [...prev, ...page.books] : page.books));
+      setNextCursor(page.next_cursor);
     } catch (e) {
       setMsg({ type: "error", text: e.message });
     }
   }
 
+  function statsFor(bookId) {
+    return analytics?.books.find(b => b.book_id === bookId);
+  }
+
   function openCreateModal() {
     setEditingBook(null);
     setFormData({ title: "", author: auth?.name || "", price: 0, is_premium: false, content: "" });
@@ -51,17 +67,24 @@ export default function Creator() {
     setIsModalOpen(true);
   }
 
-  function openEditModal(book) {
-    setEditingBook(book);
-    setFormData({
-      title: book.title,
-      author: book.author,
-      price: book.price,
-      is_premium: book.is_premium,
-      content: book.content
-    });
+  async function openEditModal(book) {
     setMsg({ type: "", text: "" });
-    setIsModalOpen(true);
+    try {
+      // listings only carry a preview; load the full text for editing
+      const full = await apiGet(`/user/books/${book.id}`, auth?.access_token);
+      setEditingBook(book);
+      setFormData({
+        title: full.title,
+        author: full.author,
+        price: full.price,
+        is_premium: full.is_premium,
+        content: full.content,
+        theme: full.theme || ""
+      });
+      setIsModalOpen(true);
+    } catch (e) {
+      setMsg({ type: "error", text: e.message });
+    }
   }
 
   async function handleSubmit(e) {
@@ -152,6 +175,12 @@ export default function Creator() {
             <StatCard label="Approved" value={data.stats.approved} color="#4caf50" />
             <StatCard label="Pending" value={data.stats.pending} color="#ff9800" />
             <StatCard label="Rejected" value={data.stats.rejected} color="#f44336" />
+            {analytics && (
+              <>
+                <StatCard label="Readers" value={analytics.totals.readers} color="#667eea" />
+                <StatCard label="Revenue" value={`₹${analytics.totals.revenue}`} color="#009688" />
+              </>
+            )}
           </div>
         )}
 
@@ -177,17 +206,26 @@ export default function Creator() {
                 <p style={styles.bookAuthor}>by {book.author}</p>
                 <div style={styles.bookMeta}>
                   <span>{book.is_premium ? `Premium (₹${book.price})` : "Free"}</span>
-                  <span>•</span>
-                  <span>{book.content.split(' ').length} words</span>
+                  {statsFor(book.id) && (
+                    <span>
+                      👥 {statsFor(book.id).readers} · ⏱️ {Math.round(statsFor(book.id).reading_seconds / 60)}m
+                      {book.is_premium ? ` · 💰 ${statsFor(book.id).purchases}` : ""} · 💬 {statsFor(book.id).comments}
+                    </span>
+                  )}
                 </div>
                 <p style={styles.preview}>
-                  {book.content.substring(0, 120)}...
+                  {(book.preview || "").substring(0, 120)}...
                 </p>
                 <div style={styles.cardHoverText}>✏️ Click to Edit</div>
               </div>
             ))}
           </div>
         )}
+        {nextCursor && (
+          <div style={{ textAlign: "center", marginTop: "20px" }}>
+            <button style={styles.createBtn} onClick={() => loadMyBooks(nextCursor)}>Load more</button>
+          </div>
+        )}
       </div>
 
       {/* CREATE / EDIT MODAL */}
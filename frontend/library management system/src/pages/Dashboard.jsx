@@ -7,6 +7,7 @@ export default function Dashboard() {
   const auth = getAuth();
   const [data, setData] = useState(null);
   const [err, setErr] = useState("");
+  const [recommended, setRecommended] = useState([]);
 
   useEffect(() => {
     loadDashboard();
@@ -29,6 +30,13 @@ export default function Dashboard() {
     } catch (e) {
       setErr(e.message);
     }
+    // suggestions are optional; the dashboard works without them
+    try {
+      const recs = await apiGet("/user/recommendations?limit=6", auth?.access_token);
+      setRecommended(recs.books || []);
+    } catch (e) {
+      setRecommended([]);
+    }
   }
 
   const formatDuration = (totalSeconds) => {
@@ -160,6 +168,26 @@ export default function Dashboard() {
               )}
             </div>
 
+            {/* --- RECOMMENDED --- */}
+            {recommended.length > 0 && (
+              <div style={styles.section}>
+                <h3 style={styles.sectionTitle}>✨ Recommended for You</h3>
+                <div style={styles.purchasedList}>
+                  {recommended.map((book) => (
+                    <div key={book.id} style={styles.miniBookCard}>
+                        <span style={{fontSize: "20px"}}>📘</span>
+                        <div>
+                            <div style={{fontWeight: "600", color: "#333"}}>{book.title}</div>
+                            <div style={{fontSize: "12px", color: "#666"}}>
+                              {book.author}{book.is_premium ? ` · ₹${book.price}` : " · Free"}
+                            </div>
+                        </div>
+                    </div>
+                  ))}
+                </div>
+              </div>
+            )}
+
              {/* --- PURCHASED BOOKS --- */}
              <div style={styles.section}>
               <h3 style={styles.sectionTitle}>💰 My Purchased Books</h3>
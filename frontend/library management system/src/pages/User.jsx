@@ -72,6 +72,7 @@ const CommentNode = ({ comment, activeReplyId, setActiveReplyId, onReplySubmit,
 export default function User() {
   const auth = getAuth();
   const [books, setBooks] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null); // keyset cursor for the next catalog page
   const [purchasedBookIds, setPurchasedBookIds] = useState([]); // Tracks what user owns
   const [readingBook, setReadingBook] = useState(null); 
   const [discussingBook, setDiscussingBook] = useState(null); 
@@ -80,6 +81,7 @@ export default function User() {
   
   // Single Filter State
   const [searchTerm, setSearchTerm] = useState("");
+  const [searchResults, setSearchResults] = useState(null);
 
   // Comment System
   const [comments, setComments] = useState([]);
@@ -91,6 +93,7 @@ export default function User() {
 
   // Timer
   const timerIdRef = useRef(null);
+  const heartbeatIdRef = useRef(null);
   const secondsRef = useRef(0);
   const [elapsedSeconds, setElapsedSeconds] = useState(0);
   const [reminderText, setReminderText] = useState("");
@@ -101,10 +104,12 @@ export default function User() {
     return () => stopTimer();
   }, []);
 
-  async function loadBooks() {
+  async function loadBooks(cursor = null) {
     try {
-      const data = await apiGet("/user/books", auth?.access_token);
-      setBooks(data);
+      const query = cursor ? `?cursor=${encodeURIComponent(cursor)}` : "";
+      const data = await apiGet(`/user/books${query}`, auth?.access_token);
+      setBooks(prev => (cursor ? [...prev, ...data.books] : data.books));
+      setNextCursor(data.next_cursor);
     } catch (e) {
       setError(e.message);
     }
@@ -123,16 +128,25 @@ export default function User() {
       }
   }
 
-  // --- FILTER LOGIC ---
-  const filteredBooks = books.filter(book => {
-    if (!searchTerm) return true;
-    const term = searchTerm.toLowerCase();
-    return (
-      book.title.toLowerCase().includes(term) ||
-      book.author.toLowerCase().includes(term) ||
-      (book.theme || "").toLowerCase().includes(term)
-    );
-  });
+  // --- SEARCH (server-side, ranked) ---
+  useEffect(() => {
+    const term = searchTerm.trim();
+    if (!term) {
+      setSearchResults(null);
+      return;
+    }
+    const timer = setTimeout(async () => {
+      try {
+        const data = await apiGet(`/user/books/search?q=${encodeURIComponent(term)}`, auth?.access_token);
+        setSearchResults(data.results);
+      } catch (e) {
+        setError(e.message);
+      }
+    }, 300);
+    return () => clearTimeout(timer);
+  }, [searchTerm]);
+
+  const filteredBooks = searchResults ?? books;
 
   // --- TIMER LOGIC ---
   function stopTimer() {
@@ -140,6 +154,17 @@ export default function User() {
       clearInterval(timerIdRef.current);
       timerIdRef.current = null;
     }
+    if (heartbeatIdRef.current) {
+      clearInterval(heartbeatIdRef.current);
+      heartbeatIdRef.current = null;
+    }
+  }
+
+  // The server measures reading time; it counts only while heartbeats arrive
+  function startHeartbeat(bookId, everySeconds) {
+    heartbeatIdRef.current = setInterval(() => {
+      apiPost(`/user/books/${bookId}/heartbeat`, {}, auth?.access_token).catch(() => {});
+    }, everySeconds * 1000);
   }
 
   function startTimer() {
@@ -167,14 +192,16 @@ export default function User() {
   async function openReader(bookId) {
     setError("");
     try {
-      const data = await apiGet(`/user/books/${bookId}`, auth?.access_token);
-      await apiPost(`/user/books/${bookId}/start`, {}, auth?.access_token);
-      setReadingBook({ ...data, id: bookId });
+      const page = await apiGet(`/user/books/${bookId}/pages/1`, auth?.access_token);
+      const session = await apiPost(`/user/books/${bookId}/start`, {}, auth?.access_token);
+      const book = filteredBooks.find((b) => b.id === bookId);
+      setReadingBook({ ...book, ...page, id: bookId });
       startTimer();
+      startHeartbeat(bookId, session.heartbeat_seconds || 30);
     } catch (e) {
       // If payment required (402), catch it here
       if (String(e.message).includes("Pay") || String(e.message).includes("Payment")) {
-        const book = books.find((b) => b.id === bookId);
+        const book = filteredBooks.find((b) => b.id === bookId);
         if (book) handleBuyClick(book); 
         else setError(e.message);
       } else {
@@ -183,6 +210,16 @@ export default function User() {
     }
   }
 
+  async function goToPage(pageNo) {
+    if (!readingBook || pageNo < 1 || pageNo > readingBook.page_count) return;
+    try {
+      const page = await apiGet(`/user/books/${readingBook.id}/pages/${pageNo}`, auth?.access_token);
+      setReadingBook(prev => ({ ...prev, ...page }));
+    } catch (e) {
+      setError(e.message);
+    }
+  }
+
   const handleBuyClick = (book) => {
       // Check local state first
       if (purchasedBookIds.includes(book.id)) {
@@ -202,7 +239,7 @@ export default function User() {
     stopTimer();
     const finalSeconds = secondsRef.current;
     try {
-      await apiPost(`/user/books/${readingBook.id}/stop`, { duration_seconds: finalSeconds }, auth?.access_token);
+      await apiPost(`/user/books/${readingBook.id}/stop`, {}, auth?.access_token);
       setPopupInfo({ title: "Reading Complete!", message: `Saved ${formatTime(finalSeconds)}. Opening discussion...`, icon: "✅", color: "#2e7d32" });
       
       const bookToDiscuss = readingBook;
@@ -337,6 +374,12 @@ export default function User() {
              </div>
           )}
         </div>
+
+        {nextCursor && !searchResults && (
+          <div style={{ textAlign: "center", marginTop: 24 }}>
+            <button style={styles.readBtn} onClick={() => loadBooks(nextCursor)}>Load more</button>
+          </div>
+        )}
       </div>
 
       {readingBook && (
@@ -350,6 +393,13 @@ export default function User() {
             <div style={styles.readerBody}>
               <p style={styles.content}>{readingBook.content}</p>
             </div>
+            {readingBook.page_count > 1 && (
+              <div style={styles.pager}>
+                <button style={styles.readBtn} disabled={readingBook.page_no <= 1} onClick={() => goToPage(readingBook.page_no - 1)}>‹ Prev</button>
+                <span>Page {readingBook.page_no} of {readingBook.page_count}</span>
+                <button style={styles.readBtn} disabled={readingBook.page_no >= readingBook.page_count} onClick={() => goToPage(readingBook.page_no + 1)}>Next ›</button>
+              </div>
+            )}
             <button style={styles.finishBtn} onClick={finishReading}>Finish Reading & Discuss</button>
           </div>
         </div>
@@ -453,6 +503,7 @@ const styles = {
   reminder: { marginTop: 12, background: "#fff3cd", color: "#6b5200", padding: 10, borderRadius: 8 },
   readerBody: { flex: 1, overflowY: "auto", border: "1px solid #eee", borderRadius: 10, padding: 20 },
   content: { whiteSpace: "pre-line", lineHeight: 1.8, color: "#222" },
+  pager: { display: "flex", justifyContent: "center", alignItems: "center", gap: 16, marginTop: 12 },
   finishBtn: { marginTop: 15, background: "#333", color: "white", border: "none", padding: 12, borderRadius: 8, cursor: "pointer", fontWeight: 800 },
   closeBtn: { background: "none", border: "none", fontSize: 16, cursor: "pointer", color: "#666" },
 